@@ -9,10 +9,26 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import folium
-from folium.plugins import HeatMap
+from folium.plugins import HeatMap, HeatMapWithTime, TimestampedGeoJson
 from streamlit_folium import st_folium
+import streamlit.components.v1 as components
 import plotly.graph_objects as go
-import math
+
+from simulation.pune import (
+    PUNE_CENTER, PMPML_STOPS, ALL_ROUTES, PUNE_EVENTS, WEATHER_MULT,
+)
+from simulation.engine import run_network_simulation
+from simulation.result import SimulationResult, StepSnapshot
+from simulation.timeaxis import SLOT_MINUTES
+from simulation.downsample import downsample_indices
+from simulation.journey import JourneyPlanner, MAX_TRANSFERS
+from simulation.spatial import StopIndex
+from simulation.topology import Topology
+from simulation.map_layers import (
+    route_geometry, stop_geometry, route_layer, stop_layer, vehicle_layer,
+    stop_timeline, heatmap_frames, HEATMAP_SCALE,
+)
+from simulation.monte_carlo import run_monte_carlo
 
 st.set_page_config(
     page_title="Coruscant Transit — Pune",
@@ -95,307 +111,189 @@ html, body, [class*="css"] { font-family: 'DM Sans', sans-serif; }
 """, unsafe_allow_html=True)
 
 # ══════════════════════════════════════════════════════════════════
-# PUNE CITY DATA — Real locations, real routes
+# SIMULATION
 # ══════════════════════════════════════════════════════════════════
 
-PUNE_CENTER = [18.5204, 73.8567]
-
-PMPML_STOPS = {
-    "Pune Railway Station":  [18.5280, 73.8742],
-    "Swargate":              [18.5018, 73.8580],
-    "Shivajinagar":          [18.5308, 73.8474],
-    "Deccan Gymkhana":       [18.5154, 73.8409],
-    "FC Road":               [18.5199, 73.8395],
-    "JM Road":               [18.5221, 73.8440],
-    "Nal Stop":              [18.5211, 73.8361],
-    "Kothrud Depot":         [18.5071, 73.8085],
-    "Hadapsar":              [18.5018, 73.9260],
-    "Magarpatta City":       [18.5105, 73.9278],
-    "Kharadi":               [18.5518, 73.9421],
-    "Viman Nagar":           [18.5672, 73.9143],
-    "Kalyani Nagar":         [18.5478, 73.9026],
-    "Koregaon Park":         [18.5362, 73.8929],
-    "Mundhwa":               [18.5200, 73.9270],
-    "Hinjewadi Phase 1":     [18.5915, 73.7389],
-    "Hinjewadi Phase 2":     [18.5966, 73.7205],
-    "Hinjewadi Phase 3":     [18.6010, 73.7082],
-    "Baner":                 [18.5590, 73.7870],
-    "Balewadi":              [18.5744, 73.7756],
-    "Aundh":                 [18.5580, 73.8081],
-    "Wakad":                 [18.5986, 73.7621],
-    "Pune Airport":          [18.5822, 73.9197],
-    "Vishrantwadi":          [18.5766, 73.8989],
-    "Yerwada":               [18.5535, 73.8929],
-    "Katraj":                [18.4535, 73.8647],
-    "Bibvewadi":             [18.4801, 73.8630],
-    "Warje":                 [18.4882, 73.8068],
-    "Dhankawadi":            [18.4666, 73.8503],
-    "Pimpri":                [18.6279, 73.8009],
-    "Chinchwad":             [18.6477, 73.7988],
-    "Akurdi":                [18.6504, 73.7730],
-    "PCMC":                  [18.6298, 73.8008],
-    "Nigdi":                 [18.6680, 73.7681],
+REBALANCER_LABELS = {
+    "greedy": "Greedy (reactive)",
+    "assignment": "Assignment (all routes)",
+    "lookahead": "Lookahead (next 60 min)",
 }
 
-PMPML_ROUTES = {
-    "PMPML-11": {
-        "name": "Swargate – Hinjewadi IT Park",
-        "stops": ["Swargate","Deccan Gymkhana","Shivajinagar","FC Road","Nal Stop","Baner","Balewadi","Wakad","Hinjewadi Phase 1","Hinjewadi Phase 2","Hinjewadi Phase 3"],
-        "color": "#3b82f6", "buses": 12, "type": "bus", "frequency_min": 8,
-    },
-    "PMPML-50": {
-        "name": "Pune Station – Hadapsar",
-        "stops": ["Pune Railway Station","Koregaon Park","Kalyani Nagar","Mundhwa","Magarpatta City","Hadapsar"],
-        "color": "#f59e0b", "buses": 9, "type": "bus", "frequency_min": 10,
-    },
-    "PMPML-152": {
-        "name": "Katraj – Vishrantwadi via Station",
-        "stops": ["Katraj","Dhankawadi","Bibvewadi","Swargate","Pune Railway Station","Yerwada","Vishrantwadi"],
-        "color": "#10b981", "buses": 8, "type": "bus", "frequency_min": 12,
-    },
-    "PMPML-72": {
-        "name": "Kothrud – Kharadi via Shivajinagar",
-        "stops": ["Kothrud Depot","Nal Stop","JM Road","Shivajinagar","Pune Railway Station","Kalyani Nagar","Kharadi"],
-        "color": "#8b5cf6", "buses": 7, "type": "bus", "frequency_min": 15,
-    },
-    "PMPML-Airport": {
-        "name": "Swargate – Pune Airport Express",
-        "stops": ["Swargate","Pune Railway Station","Viman Nagar","Vishrantwadi","Pune Airport"],
-        "color": "#ef4444", "buses": 6, "type": "bus", "frequency_min": 20,
-    },
-    "PMPML-PCMC": {
-        "name": "Shivajinagar – Nigdi (PCMC Corridor)",
-        "stops": ["Shivajinagar","Aundh","Baner","Balewadi","PCMC","Pimpri","Chinchwad","Akurdi","Nigdi"],
-        "color": "#06b6d4", "buses": 10, "type": "bus", "frequency_min": 10,
-    },
-}
+@st.cache_resource
+def network_topology():
+    return Topology.from_network(PMPML_STOPS, ALL_ROUTES)
 
-METRO_ROUTES = {
-    "METRO-L1": {
-        "name": "Metro Line 1 — PCMC to Swargate",
-        "stops": ["Nigdi","Akurdi","Chinchwad","Pimpri","PCMC","Aundh","Shivajinagar","Deccan Gymkhana","Swargate"],
-        "color": "#dc2626", "trains": 8, "type": "metro", "frequency_min": 5,
-    },
-    "METRO-L2": {
-        "name": "Metro Line 2 — Kothrud to Kharadi",
-        "stops": ["Kothrud Depot","Warje","Deccan Gymkhana","JM Road","Shivajinagar","Pune Railway Station","Yerwada","Viman Nagar","Kharadi"],
-        "color": "#7c3aed", "trains": 6, "type": "metro", "frequency_min": 7,
-    },
-}
+TOPOLOGY = network_topology()
 
-ALL_ROUTES = {**PMPML_ROUTES, **METRO_ROUTES}
+@st.cache_resource
+def journey_planner():
+    return JourneyPlanner.from_network(PMPML_STOPS, ALL_ROUTES, TOPOLOGY)
 
-PUNE_EVENTS = [
-    {"name": "IT Rush — Hinjewadi",    "stops": ["Hinjewadi Phase 1","Hinjewadi Phase 2","Hinjewadi Phase 3","Wakad","Baner"], "peak_steps": list(range(28,34))+list(range(64,70)), "multiplier": 2.8},
-    {"name": "College Hours — FC/JM",  "stops": ["FC Road","JM Road","Deccan Gymkhana","Shivajinagar"],                        "peak_steps": list(range(34,40)),                     "multiplier": 2.2},
-    {"name": "Pune Station Rush",      "stops": ["Pune Railway Station","Swargate","Shivajinagar"],                            "peak_steps": list(range(28,32))+list(range(68,72)),  "multiplier": 2.5},
-    {"name": "Airport Evening Wave",   "stops": ["Pune Airport","Viman Nagar","Vishrantwadi"],                                 "peak_steps": list(range(64,70)),                     "multiplier": 2.0},
-    {"name": "Magarpatta Corp Hours",  "stops": ["Magarpatta City","Hadapsar","Mundhwa"],                                      "peak_steps": list(range(30,34))+list(range(64,68)),  "multiplier": 2.4},
-]
+JOURNEY_PLANNER = journey_planner()
 
-PUNE_WEATHER = (
-    ["☀️ Clear"]*16 + ["🌤️ Partly Cloudy"]*8 + ["☀️ Clear"]*20 +
-    ["⛅ Overcast"]*8 + ["🌦️ Pre-Monsoon"]*12 + ["⛈️ Thunderstorm"]*8 +
-    ["🌧️ Light Rain"]*12 + ["🌤️ Clearing"]*12
-)
-WEATHER_MULT = {"☀️ Clear":1.0,"🌤️ Partly Cloudy":1.05,"⛅ Overcast":1.1,
-                "🌦️ Pre-Monsoon":1.2,"⛈️ Thunderstorm":0.7,"🌧️ Light Rain":1.25,"🌤️ Clearing":1.1}
-
-def time_mult(step):
-    h = (step*15)//60
-    if h < 5:  return 0.08
-    if h < 7:  return 0.5
-    if h < 9:  return 1.9
-    if h < 11: return 1.3
-    if h < 13: return 1.0
-    if h < 15: return 0.9
-    if h < 17: return 1.1
-    if h < 20: return 1.85
-    if h < 22: return 1.1
-    return 0.4
-
-def step_to_time(step):
-    h, m = divmod(step*15, 60)
-    return f"{h:02d}:{m:02d}"
-
-def step_to_hour(step):
-    return step*15/60
+@st.cache_resource
+def stop_index():
+    return StopIndex.from_stops(PMPML_STOPS)
 
-# ══════════════════════════════════════════════════════════════════
-# SIMULATION
-# ══════════════════════════════════════════════════════════════════
+STOP_INDEX = stop_index()
+MAP_NEARBY_RADIUS_M = 5500   # other stops drawn on the commuter map
+ALT_STOP_RADIUS_M   = 4500   # alternatives offered by the AI tip
+
+@st.cache_resource
+def base_layers():
+    """Static route and stop GeoJSON shared by every rerun; per-step layers copy from it."""
+    return {"routes": route_geometry(PMPML_STOPS, ALL_ROUTES, TOPOLOGY),
+            "stops": stop_geometry(PMPML_STOPS)}
+
+BASE_LAYERS = base_layers()
 
 @st.cache_data(show_spinner=False)
-def run_simulation(seed=42):
-    rng = np.random.default_rng(seed)
-    bus_counts = {rid: d.get("buses", d.get("trains", 6)) for rid, d in ALL_ROUTES.items()}
-    history, rebalance_log, cooldown = [], [], {rid: 0 for rid in ALL_ROUTES}
-    stop_waits_all = {s: [] for s in PMPML_STOPS}
-
-    for step in range(96):
-        weather = PUNE_WEATHER[step]
-        wm = WEATHER_MULT[weather]
-        tm = time_mult(step)
-        active_events = [e for e in PUNE_EVENTS if step in e["peak_steps"]]
-
-        stop_demand = {}
-        for stop in PMPML_STOPS:
-            base = int(rng.integers(15, 60))
-            em = max((e["multiplier"] for e in active_events if stop in e["stops"]), default=1.0)
-            stop_demand[stop] = max(0, int(base * tm * wm * em * (1 + rng.normal(0, 0.08))))
-
-        route_demand, route_capacity = {}, {}
-        for rid, rd in ALL_ROUTES.items():
-            cap_v = 180 if rd["type"] == "metro" else 50
-            route_capacity[rid] = bus_counts[rid] * cap_v
-            route_demand[rid] = sum(stop_demand.get(s, 0) for s in rd["stops"])
-
-        # AI rebalancing
-        for rid in ALL_ROUTES:
-            cooldown[rid] = max(0, cooldown[rid]-1)
-        for _ in range(2):
-            util = {rid: route_demand[rid]/max(route_capacity[rid],1) for rid in ALL_ROUTES}
-            overloaded = sorted([(r,u) for r,u in util.items() if u>0.82 and cooldown[r]==0], key=lambda x:-x[1])
-            idle       = sorted([(r,u) for r,u in util.items() if u<0.25 and bus_counts[r]>2 and cooldown[r]==0], key=lambda x:x[1])
-            if not overloaded or not idle: break
-            tr, tu = overloaded[0]; dr, _ = idle[0]
-            if tr == dr: break
-            bus_counts[dr] -= 1; bus_counts[tr] += 1
-            cooldown[dr] = 4; cooldown[tr] = 2
-            route_capacity[tr] = bus_counts[tr] * (180 if ALL_ROUTES[tr]["type"]=="metro" else 50)
-            rebalance_log.append({
-                "step": step, "time": step_to_time(step), "hour": step_to_hour(step),
-                "from_route": dr, "from_name": ALL_ROUTES[dr]["name"],
-                "to_route": tr, "to_name": ALL_ROUTES[tr]["name"],
-                "reason": f"{ALL_ROUTES[tr]['name']} at {tu*100:.0f}% capacity",
-                "weather": weather, "events": [e["name"] for e in active_events],
-                "severity": "critical" if tu > 0.95 else "warning",
-            })
-
-        # Stop wait times
-        stop_wait = {}
-        for stop in PMPML_STOPS:
-            srvd = [rid for rid, rd in ALL_ROUTES.items() if stop in rd["stops"]]
-            if not srvd: stop_wait[stop] = None; continue
-            nv = sum(bus_counts[rid] for rid in srvd)
-            freq = min(ALL_ROUTES[rid]["frequency_min"] for rid in srvd)
-            headway = min(60/max(nv,1), freq*2)
-            d = stop_demand.get(stop,0)
-            cap = sum(route_capacity[rid] for rid in srvd)/max(len(srvd),1)
-            lf = min(d/max(cap,1), 1.5)
-            w = round(headway/2 * (1+lf*0.5), 1)
-            stop_wait[stop] = w
-            stop_waits_all[stop].append(w)
-
-        waits = [w for w in stop_wait.values() if w is not None]
-        history.append({
-            "step": step, "time": step_to_time(step), "hour": step_to_hour(step),
-            "weather": weather, "events": [e["name"] for e in active_events],
-            "stop_demand": stop_demand.copy(), "stop_wait": stop_wait.copy(),
-            "route_demand": route_demand.copy(), "route_capacity": route_capacity.copy(),
-            "bus_counts": bus_counts.copy(),
-            "avg_wait_min": round(np.mean(waits),2) if waits else 0,
-            "overcrowded_routes": sum(1 for r in ALL_ROUTES if route_demand[r]>route_capacity[r]*0.85),
-            "idle_routes": sum(1 for r in ALL_ROUTES if route_demand[r]<route_capacity[r]*0.2),
-            "total_demand": sum(route_demand.values()),
-            "total_capacity": sum(route_capacity.values()),
-            "utilization": round(sum(route_demand.values())/max(sum(route_capacity.values()),1),3),
-        })
+def run_simulation(seed=42, rebalancer="greedy"):
+    return run_network_simulation(seed, rebalancer=rebalancer, topology=TOPOLOGY)
 
-    avg_w = np.mean([h["avg_wait_min"] for h in history])
-    summary = {
-        "avg_wait_min": round(avg_w, 1),
-        "baseline_wait_min": round(avg_w*1.35, 1),
-        "total_rebalances": len(rebalance_log),
-        "total_demand_today": sum(h["total_demand"] for h in history),
-        "avg_utilization": round(np.mean([h["utilization"] for h in history])*100, 1),
-        "stop_avg_wait": {s: round(np.mean(v),1) for s,v in stop_waits_all.items() if v},
-    }
-    return history, rebalance_log, summary
+@st.cache_data(show_spinner=False)
+def run_uncertainty(n_runs=200, seed=42, rebalancer="greedy"):
+    return run_monte_carlo(n_runs, seed, rebalancer=rebalancer, topology=TOPOLOGY)
 
 # ══════════════════════════════════════════════════════════════════
 # MAP BUILDERS
 # ══════════════════════════════════════════════════════════════════
 
+def route_lines(layer, metro_weight=5, bus_weight=3, opacity=0.85, dashed=True, tooltip="tooltip"):
+    return folium.GeoJson(layer, tooltip=folium.GeoJsonTooltip(fields=[tooltip], labels=False),
+        style_function=lambda f: {
+            "color": f["properties"]["color"], "opacity": opacity,
+            "weight": metro_weight if f["properties"]["type"]=="metro" else bus_weight,
+            "dashArray": None if (f["properties"]["type"]=="metro" or not dashed) else "8 4"})
+
+def stop_markers(layer):
+    return folium.GeoJson(layer, marker=folium.CircleMarker(),
+        tooltip=folium.GeoJsonTooltip(fields=["tooltip"], labels=False),
+        style_function=lambda f: {
+            "radius": f["properties"]["radius"], "color": "white", "weight": f["properties"].get("weight", 1.5),
+            "fillColor": f["properties"]["color"], "fillOpacity": f["properties"].get("opacity", 0.9)})
+
 def build_operator_map(snapshot, route_filter=None):
     m = folium.Map(location=PUNE_CENTER, zoom_start=12, tiles="CartoDB positron", prefer_canvas=True)
-    for rid, rd in ALL_ROUTES.items():
-        if route_filter and rid != route_filter: continue
-        coords = [PMPML_STOPS[s] for s in rd["stops"] if s in PMPML_STOPS]
-        if len(coords) < 2: continue
-        util = snapshot["route_demand"].get(rid,0)/max(snapshot["route_capacity"].get(rid,1),1)
-        folium.PolyLine(coords, color=rd["color"],
-                        weight=5 if rd["type"]=="metro" else 3,
-                        opacity=0.85,
-                        dash_array=None if rd["type"]=="metro" else "8 4",
-                        tooltip=f"{rd['name']} — {util*100:.0f}% utilization").add_to(m)
-        n = snapshot["bus_counts"].get(rid, 2)
-        stops_list = [s for s in rd["stops"] if s in PMPML_STOPS]
-        interval = max(1, len(stops_list)//max(n,1))
-        icon_char = "🚇" if rd["type"]=="metro" else "🚌"
-        for i, stop in enumerate(stops_list):
-            if i % interval == interval//2:
-                folium.Marker(PMPML_STOPS[stop],
-                    icon=folium.DivIcon(html=f'<div style="font-size:14px">{icon_char}</div>',
-                                        icon_size=(20,20), icon_anchor=(10,10))).add_to(m)
-    for stop, coords in PMPML_STOPS.items():
-        wait = snapshot["stop_wait"].get(stop)
-        demand = snapshot["stop_demand"].get(stop, 0)
-        if wait is None: continue
-        if wait < 8:    color, status = "#10b981", "Good"
-        elif wait < 15: color, status = "#f59e0b", "Moderate"
-        elif wait < 20: color, status = "#f97316", "High"
-        else:           color, status = "#ef4444", "Critical"
-        folium.CircleMarker(coords, radius=6+min(demand//40,6),
-            color="white", weight=1.5, fill=True, fill_color=color, fill_opacity=0.9,
-            tooltip=f"<b>{stop}</b><br>Wait: {wait} min ({status})<br>Demand: {demand} pax").add_to(m)
+    routes = [route_filter] if route_filter else None
+    route_lines(route_layer(BASE_LAYERS["routes"], snapshot, routes)).add_to(m)
+    for vtype, icon_char in [("bus", "🚌"), ("metro", "🚇")]:
+        vehicles = vehicle_layer(PMPML_STOPS, ALL_ROUTES, TOPOLOGY, snapshot, vtype, routes)
+        if vehicles["features"]:
+            folium.GeoJson(vehicles, marker=folium.Marker(
+                icon=folium.DivIcon(html=f'<div style="font-size:14px">{icon_char}</div>',
+                                    icon_size=(20,20), icon_anchor=(10,10)))).add_to(m)
+    stop_markers(stop_layer(BASE_LAYERS["stops"], snapshot)).add_to(m)
     return m
 
 def build_heatmap(snapshot):
     m = folium.Map(location=PUNE_CENTER, zoom_start=12, tiles="CartoDB dark_matter", prefer_canvas=True)
-    heat_data = [[PMPML_STOPS[s][0], PMPML_STOPS[s][1], snapshot["stop_demand"].get(s,0)/300]
+    heat_data = [[PMPML_STOPS[s][0], PMPML_STOPS[s][1], snapshot["stop_demand"].get(s,0)/HEATMAP_SCALE]
                  for s in PMPML_STOPS if snapshot["stop_demand"].get(s,0)>0]
     HeatMap(heat_data, radius=30, blur=20, max_zoom=14,
             gradient={"0.2":"#3b82f6","0.5":"#f59e0b","0.8":"#ef4444","1.0":"#ffffff"}).add_to(m)
     return m
 
+@st.cache_data(show_spinner=False)
+def playback_operator_map(seed=42, rebalancer="greedy", route_filter=None):
+    """Whole-day stop markers in one TimestampedGeoJson, rendered once per run to HTML."""
+    history, _, _ = run_simulation(seed, rebalancer)
+    m = folium.Map(location=PUNE_CENTER, zoom_start=12, tiles="CartoDB positron", prefer_canvas=True)
+    routes = BASE_LAYERS["routes"]
+    if route_filter:
+        routes = {**routes, "features": [f for f in routes["features"] if f["id"] == route_filter]}
+    route_lines(routes, tooltip="name").add_to(m)
+    tick = history.axis.tick_minutes
+    TimestampedGeoJson(stop_timeline(PMPML_STOPS, history), period=f"PT{tick}M",
+                       duration=f"PT{tick*60-1}S", transition_time=150, auto_play=False,
+                       add_last_point=False, loop_button=True, time_slider_drag_update=True,
+                       date_options="HH:mm" if history.axis.days == 1 else "MM-DD HH:mm").add_to(m)
+    return m.get_root().render()
+
+@st.cache_data(show_spinner=False)
+def playback_heatmap(seed=42, rebalancer="greedy"):
+    """Whole-day demand heatmap in one HeatMapWithTime layer, rendered once per run to HTML."""
+    history, _, _ = run_simulation(seed, rebalancer)
+    m = folium.Map(location=PUNE_CENTER, zoom_start=12, tiles="CartoDB dark_matter", prefer_canvas=True)
+    frames, labels = heatmap_frames(PMPML_STOPS, history)
+    HeatMapWithTime(frames, index=labels, radius=30, min_opacity=0.2, max_opacity=0.8,
+                    gradient={0.2:"#3b82f6",0.5:"#f59e0b",0.8:"#ef4444",1.0:"#ffffff"},
+                    auto_play=False).add_to(m)
+    return m.get_root().render()
+
 def build_commuter_map(stop_name, snapshot):
     coords = PMPML_STOPS.get(stop_name, PUNE_CENTER)
     m = folium.Map(location=coords, zoom_start=14, tiles="CartoDB positron", prefer_canvas=True)
     folium.CircleMarker(coords, radius=14, color="#0f4c81", weight=3,
                         fill=True, fill_color="#3b82f6", fill_opacity=0.85,
                         tooltip=f"📍 {stop_name}").add_to(m)
-    for rid, rd in ALL_ROUTES.items():
-        if stop_name in rd["stops"]:
-            rcoords = [PMPML_STOPS[s] for s in rd["stops"] if s in PMPML_STOPS]
-            folium.PolyLine(rcoords, color=rd["color"], weight=4, opacity=0.8,
-                            tooltip=rd["name"]).add_to(m)
-    for s, c in PMPML_STOPS.items():
-        if s == stop_name: continue
-        dist = math.sqrt((c[0]-coords[0])**2+(c[1]-coords[1])**2)
-        if dist < 0.05:
-            w = snapshot["stop_wait"].get(s)
-            folium.CircleMarker(c, radius=5, color="white", weight=1,
-                                fill=True, fill_color="#64748b", fill_opacity=0.6,
-                                tooltip=f"{s} — {w} min wait" if w else s).add_to(m)
+    serving = TOPOLOGY.routes_at(stop_name)
+    if serving:
+        route_lines(route_layer(BASE_LAYERS["routes"], snapshot, serving),
+                    metro_weight=4, bus_weight=4, opacity=0.8, dashed=False, tooltip="name").add_to(m)
+    nearby = {s for s, _ in STOP_INDEX.within(tuple(coords), MAP_NEARBY_RADIUS_M)} - {stop_name}
+    features = []
+    for f in BASE_LAYERS["stops"]["features"]:
+        if f["id"] not in nearby: continue
+        w = snapshot["stop_wait"].get(f["id"])
+        features.append({**f, "properties": {
+            "radius": 5, "weight": 1, "color": "#64748b", "opacity": 0.6,
+            "tooltip": f"{f['id']} — {w} min wait" if w else f["id"]}})
+    if features:
+        stop_markers({"type": "FeatureCollection", "features": features}).add_to(m)
     return m
 
 # ══════════════════════════════════════════════════════════════════
 # CHARTS
 # ══════════════════════════════════════════════════════════════════
 
-def demand_chart(history):
-    hours   = [h["hour"] for h in history]
-    demand  = [h["total_demand"] for h in history]
-    cap     = [h["total_capacity"] for h in history]
+# Figures depend only on the run (and step), so they are built once per fingerprint
+CHART_POINT_BUDGET = 2000   # points per chart before switching to WebGL + LTTB downsampling
+FIGURE_CACHE = dict(max_entries=64, hash_funcs={
+    SimulationResult: lambda r: r.fingerprint,
+    StepSnapshot: lambda s: s.fingerprint,
+})
+
+def chart_series(hours, *series):
+    """Scatter class and (hours, *series) to draw, downsampled to CHART_POINT_BUDGET for long runs."""
+    if len(hours) <= CHART_POINT_BUDGET:
+        return go.Scatter, (hours, *series)
+    keep = downsample_indices(hours, series, CHART_POINT_BUDGET)
+    return go.Scattergl, (hours[keep], *(np.asarray(s)[keep] for s in series))
+
+def add_band(fig, hours, band, color, name, trace=go.Scatter):
+    """Shade the p10–p90 Monte Carlo band and draw the p50 line."""
+    fig.add_trace(trace(x=hours, y=band["p90"], line=dict(width=0), mode="lines",
+                        showlegend=False, hoverinfo="skip"))
+    fig.add_trace(trace(x=hours, y=band["p10"], line=dict(width=0), mode="lines",
+                        fill="tonexty", fillcolor=color, name=f"{name} p10–p90"))
+    fig.add_trace(trace(x=hours, y=band["p50"], name=f"{name} p50",
+                        line=dict(color=color.replace("0.18", "0.9"), width=1.5, dash="dot"), mode="lines"))
+
+def band_series(band):
+    return [band["p10"], band["p50"], band["p90"]]
+
+def band_at(values):
+    return dict(zip(["p10", "p50", "p90"], values))
+
+@st.cache_resource(**FIGURE_CACHE)
+def demand_chart(history, bands=None):
+    extra = band_series(bands["demand"]) if bands else []
+    trace, (hours, demand, cap, *band) = chart_series(
+        history.hours, history.total_demand, history.total_capacity, *extra)
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=hours, y=cap, name="Capacity", line=dict(color="#e2e8f0", width=2), mode="lines"))
-    fig.add_trace(go.Scatter(x=hours, y=demand, name="Demand",
+    fig.add_trace(trace(x=hours, y=cap, name="Capacity", line=dict(color="#e2e8f0", width=2), mode="lines"))
+    fig.add_trace(trace(x=hours, y=demand, name="Demand",
                              fill="tonexty", fillcolor="rgba(59,130,246,0.12)",
                              line=dict(color="#3b82f6", width=2.5), mode="lines"))
+    if bands:
+        add_band(fig, hours, band_at(band), "rgba(99,102,241,0.18)", "Demand", trace)
+    axis = history.axis
     for ev in PUNE_EVENTS:
-        if ev["peak_steps"]:
-            fig.add_vline(x=ev["peak_steps"][0]*15/60, line_dash="dot",
+        if not ev["peak_steps"]: continue
+        for day in range(axis.days):
+            fig.add_vline(x=axis.hour(day*axis.ticks_per_day) + ev["peak_steps"][0]*SLOT_MINUTES/60, line_dash="dot",
                           line_color="#f59e0b", annotation_text=ev["name"][:18], annotation_font_size=8)
     fig.update_layout(height=240, margin=dict(l=10,r=10,t=10,b=30), paper_bgcolor="white",
                       plot_bgcolor="#f8fafc", font_family="DM Sans",
@@ -404,15 +302,18 @@ def demand_chart(history):
                       legend=dict(orientation="h",y=1.12,font_size=11))
     return fig
 
-def wait_chart(history):
-    hours = [h["hour"] for h in history]
-    waits = [h["avg_wait_min"] for h in history]
+@st.cache_resource(**FIGURE_CACHE)
+def wait_chart(history, bands=None):
+    extra = band_series(bands["wait"]) if bands else []
+    trace, (hours, waits, *band) = chart_series(history.hours, history.avg_wait_min, *extra)
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=hours, y=waits, name="With AI",
+    fig.add_trace(trace(x=hours, y=waits, name="With AI",
                              fill="tozeroy", fillcolor="rgba(16,185,129,0.12)",
                              line=dict(color="#10b981", width=2.5), mode="lines"))
-    fig.add_trace(go.Scatter(x=hours, y=[w*1.35 for w in waits], name="Without AI",
+    fig.add_trace(trace(x=hours, y=waits*1.35, name="Without AI",
                              line=dict(color="#ef4444", width=1.5, dash="dash"), mode="lines"))
+    if bands:
+        add_band(fig, hours, band_at(band), "rgba(16,185,129,0.18)", "Wait", trace)
     fig.update_layout(height=200, margin=dict(l=10,r=10,t=10,b=30), paper_bgcolor="white",
                       plot_bgcolor="#f8fafc", font_family="DM Sans",
                       xaxis=dict(title="Hour",tickformat=".0f",gridcolor="#f1f5f9"),
@@ -420,6 +321,7 @@ def wait_chart(history):
                       legend=dict(orientation="h",y=1.15,font_size=11))
     return fig
 
+@st.cache_resource(**FIGURE_CACHE)
 def util_chart(snapshot):
     rids  = list(ALL_ROUTES.keys())
     names = [ALL_ROUTES[r]["name"][:28] for r in rids]
@@ -434,6 +336,7 @@ def util_chart(snapshot):
                       yaxis=dict(tickfont_size=11))
     return fig
 
+@st.cache_resource(**FIGURE_CACHE)
 def rebalance_timeline(rebalance_log):
     if not rebalance_log:
         fig = go.Figure()
@@ -463,7 +366,8 @@ def rebalance_timeline(rebalance_log):
 # ══════════════════════════════════════════════════════════════════
 
 with st.spinner("🤖 AI simulating 24-hour Pune transit..."):
-    history, rebalance_log, summary = run_simulation()
+    rebalancer = st.session_state.get("rebalancer", "greedy")
+    history, rebalance_log, summary = run_simulation(rebalancer=rebalancer)
 
 if "now_step" not in st.session_state:
     st.session_state["now_step"] = 34
@@ -495,14 +399,20 @@ with st.sidebar:
     st.markdown("---")
     view_mode = st.radio("**View Mode**", ["🏢 Operator Dashboard", "🧑‍💼 Commuter View"])
     st.markdown("---")
-    step_val = st.slider("**Simulate Time of Day**", 0, 95, now_step)
-    st.caption(f"🕐 Simulating: **{step_to_time(step_val)}**")
+    step_val = st.slider("**Simulate Time of Day**", 0, len(history) - 1, now_step)
+    st.caption(f"🕐 Simulating: **{history[step_val]['time']}**")
     st.session_state["now_step"] = step_val
     now_step = step_val; snapshot = history[now_step]
+    playback = st.toggle("**Playback mode**", key="playback",
+                         help="Send the whole day to the maps once and scrub or animate it in the browser")
     st.markdown("---")
     selected_route = st.selectbox("**Filter Route (map)**", ["All Routes"]+list(ALL_ROUTES.keys()),
         format_func=lambda r: r if r=="All Routes" else f"{r} — {ALL_ROUTES[r]['name'][:22]}")
     route_filter = None if selected_route=="All Routes" else selected_route
+    st.selectbox("**Rebalancer**", list(REBALANCER_LABELS), key="rebalancer",
+                 format_func=REBALANCER_LABELS.get)
+    show_bands = st.checkbox("**Monte Carlo bands**", help="Shade p10–p90 over many simulated days")
+    mc_runs = st.slider("Seeds", 50, 500, 200, step=50, disabled=not show_bands)
     st.markdown("---")
     wait_improvement = round((summary["baseline_wait_min"]-summary["avg_wait_min"])/summary["baseline_wait_min"]*100,1)
     st.markdown(f"""
@@ -527,6 +437,10 @@ with st.sidebar:
     """, unsafe_allow_html=True)
 
 snapshot = history[now_step]
+bands = None
+if show_bands:
+    with st.spinner(f"🎲 Simulating {mc_runs} Pune days..."):
+        bands = run_uncertainty(mc_runs, rebalancer=rebalancer)
 
 # ══════════════════════════════════════════════════════════════════
 # OPERATOR VIEW
@@ -584,11 +498,20 @@ if "Operator" in view_mode:
         tab1, tab2 = st.tabs(["🗺️ Live Fleet Map", "🔥 Demand Heatmap"])
         with tab1:
             st.markdown('<div class="section-header">📍 Real-Time Pune Transit Map</div>', unsafe_allow_html=True)
-            st_folium(build_operator_map(snapshot, route_filter), width=None, height=460, returned_objects=[])
-            st.caption("🟢 <8 min · 🟡 8–15 min · 🔴 >20 min wait · 🚌 = PMPML bus · 🚇 = Pune Metro · Dashed = bus route · Solid = metro")
+            if playback:
+                components.html(playback_operator_map(rebalancer=rebalancer, route_filter=route_filter), height=460)
+            else:
+                st_folium(build_operator_map(snapshot, route_filter), width=None, height=460, returned_objects=[])
+            if playback:
+                st.caption("▶ Playback · drag or play the time control at the bottom of the map · 🟢 <8 min · 🟡 8–15 min · 🔴 >20 min wait")
+            else:
+                st.caption("🟢 <8 min · 🟡 8–15 min · 🔴 >20 min wait · 🚌 = PMPML bus · 🚇 = Pune Metro · Dashed = bus route · Solid = metro")
         with tab2:
             st.markdown('<div class="section-header">🔥 Passenger Demand Heatmap — Pune</div>', unsafe_allow_html=True)
-            st_folium(build_heatmap(snapshot), width=None, height=460, returned_objects=[])
+            if playback:
+                components.html(playback_heatmap(rebalancer=rebalancer), height=460)
+            else:
+                st_folium(build_heatmap(snapshot), width=None, height=460, returned_objects=[])
             st.caption("Dark map · Blue→Yellow→Red = low→medium→very high demand zones")
 
     with col_side:
@@ -627,10 +550,10 @@ if "Operator" in view_mode:
     c1, c2 = st.columns(2)
     with c1:
         st.markdown('<div class="section-header">📈 24h Demand vs Capacity</div>', unsafe_allow_html=True)
-        st.plotly_chart(demand_chart(history), use_container_width=True, config={"displayModeBar":False})
+        st.plotly_chart(demand_chart(history, bands), use_container_width=True, config={"displayModeBar":False})
     with c2:
         st.markdown('<div class="section-header">⏱ Wait Time: AI vs No AI</div>', unsafe_allow_html=True)
-        st.plotly_chart(wait_chart(history), use_container_width=True, config={"displayModeBar":False})
+        st.plotly_chart(wait_chart(history, bands), use_container_width=True, config={"displayModeBar":False})
 
     c3, c4 = st.columns([2,1])
     with c3:
@@ -695,7 +618,7 @@ else:
         """, unsafe_allow_html=True)
 
         st.markdown('<div class="section-header">🚌 Buses From This Stop</div>', unsafe_allow_html=True)
-        serving = [(rid,rd) for rid,rd in ALL_ROUTES.items() if sel_stop in rd["stops"]]
+        serving = [(rid, ALL_ROUTES[rid]) for rid in TOPOLOGY.routes_at(sel_stop)]
         if serving:
             for rid, rd in serving:
                 n = snapshot["bus_counts"].get(rid,0)
@@ -720,10 +643,8 @@ else:
 
         # AI tip
         if wait and wait > 15:
-            nearby = [(s, snapshot["stop_wait"].get(s)) for s in PMPML_STOPS
-                      if s!=sel_stop and snapshot["stop_wait"].get(s) is not None
-                      and math.sqrt((PMPML_STOPS[s][0]-PMPML_STOPS[sel_stop][0])**2+
-                                    (PMPML_STOPS[s][1]-PMPML_STOPS[sel_stop][1])**2)<0.04]
+            nearby = [(s, snapshot["stop_wait"].get(s)) for s, _ in STOP_INDEX.within(sel_stop, ALT_STOP_RADIUS_M)
+                      if snapshot["stop_wait"].get(s) is not None]
             nearby.sort(key=lambda x: x[1])
             if nearby:
                 alt, alt_wait = nearby[0]
@@ -743,7 +664,7 @@ else:
         for stop in sorted(PMPML_STOPS.keys()):
             w = snapshot["stop_wait"].get(stop)
             d = snapshot["stop_demand"].get(stop,0)
-            srvd = [rid for rid,rd in ALL_ROUTES.items() if stop in rd["stops"]]
+            srvd = TOPOLOGY.routes_at(stop)
             if w is not None:
                 status = "🟢 Good" if w<8 else "🟡 Moderate" if w<15 else "🔴 High"
                 wait_rows.append({"Stop": stop, "Wait": f"{w} min", "Waiting Now": d,
@@ -761,38 +682,35 @@ else:
         st.markdown("<br>", unsafe_allow_html=True)
         st.button("🔍 Plan Route")
 
-    from_routes = {rid for rid,rd in ALL_ROUTES.items() if from_stop in rd["stops"]}
-    to_routes   = {rid for rid,rd in ALL_ROUTES.items() if to_stop   in rd["stops"]}
-    direct = from_routes & to_routes
-
-    if direct:
-        st.markdown("**✅ Direct routes found:**")
-        for rid in direct:
-            rd = ALL_ROUTES[rid]
-            stops_l = rd["stops"]
-            try:
-                fi, ti = stops_l.index(from_stop), stops_l.index(to_stop)
-                ns = abs(ti-fi)
+    itineraries = JOURNEY_PLANNER.plan(from_stop, to_stop, history.stop_wait[now_step])
+
+    if from_stop == to_stop:
+        st.info("Pick two different stops to plan a journey.")
+    elif itineraries:
+        st.markdown("**✅ Fastest journeys right now** (live waits included):")
+        for it in itineraries:
+            title = "Direct" if not it.transfers else f"{it.transfers} transfer{'s' if it.transfers>1 else ''}"
+            legs_html = ""
+            for leg in it.legs:
+                rd = ALL_ROUTES[leg.route_id]
                 icon = "🚇" if rd["type"]=="metro" else "🚌"
-                w_from = snapshot["stop_wait"].get(from_stop, "?")
-                st.markdown(f"""
-                <div class="stop-card" style="border-left:4px solid {rd['color']}">
-                  <b>{icon} {rid} — {rd['name']}</b>
-                  <div style="font-size:0.82rem;color:#475569;margin-top:6px">
-                    {from_stop} {"→" if ti>fi else "← (reverse)"} {to_stop}
-                    · <b>{ns} stops</b> · ~{ns*rd['frequency_min']} min journey<br>
-                    ⏱ Wait at {from_stop}: <b>{w_from} min</b>
-                  </div>
-                </div>
-                """, unsafe_allow_html=True)
-            except ValueError:
-                pass
+                legs_html += f"""
+                <div style="border-left:4px solid {rd['color']};padding-left:8px;margin-top:6px">
+                  <b>{icon} {leg.route_id} — {rd['name']}</b>{" (reverse)" if leg.reverse else ""}<br>
+                  {leg.board} → {leg.alight} · <b>{leg.n_stops} stops</b> · ~{leg.ride_min:.0f} min ride
+                  · ⏱ wait {leg.wait_min} min
+                </div>"""
+            st.markdown(f"""
+            <div class="stop-card">
+              <b>{title} · ~{it.total_min:.0f} min door to door</b>
+              <div style="font-size:0.82rem;color:#475569">{legs_html}</div>
+            </div>
+            """, unsafe_allow_html=True)
     else:
         st.markdown(f"""
         <div class="ai-explain">
-        🤖 No direct route from <b>{from_stop}</b> to <b>{to_stop}</b>.
-        Suggested interchange: <b>Shivajinagar</b> or <b>Pune Railway Station</b>
-        — both are major hubs connecting all parts of the city.
+        🤖 No journey from <b>{from_stop}</b> to <b>{to_stop}</b> within {MAX_TRANSFERS} transfers
+        on the current network.
         </div>
         """, unsafe_allow_html=True)
 
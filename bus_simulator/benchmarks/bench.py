@@ -0,0 +1,374 @@
+"""
+bench.py - Benchmark suite for the simulator's hot paths.
+
+Times every hot path and records its peak traced memory over a sweep of city
+sizes (synthetic cities from simulation.synthetic) and horizons (TimeAxis
+ticks, or days for training data), then writes a JSON report. Passing an
+earlier report as --baseline flags every case that got slower or hungrier
+than the threshold and exits non-zero, so two commits can be compared:
+
+    cd bus_simulator
+    python -m benchmarks.bench --preset quick --output bench_new.json --baseline bench_old.json
+
+Setup (city generation, model loading) and one warm-up run are never timed.
+Wall time is the median of --repeat runs; peak memory comes from one extra run under
+tracemalloc, which NumPy reports its buffers to.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from simulation.city import CityState
+from simulation.engine import run_network_simulation, simulate_network
+from simulation.synthetic import generate_city, to_network
+from simulation.timeaxis import TimeAxis
+from simulation.demand_generator import generate_demand, simulate_bus_service, event_index
+from simulation.metrics import compute_all_metrics
+from optimization.rebalance import FleetIndex, rebalance_fleet
+from ml.train_model import generate_training_data, ensure_artifacts
+from ml import predict
+
+REPORT_VERSION = 1
+DEFAULT_THRESHOLD = 0.25  # relative slow-down (or memory growth) flagged as a regression
+MIN_TIME_DELTA_S = 0.005  # smaller absolute changes are timer noise
+MIN_MEM_DELTA_MB = 1.0
+
+# name: (n_stops, n_routes, n_buses)
+CITY_SIZES = {
+    "S": (100, 10, 40),
+    "M": (1_000, 60, 300),
+    "L": (10_000, 500, 3_000),
+}
+# name: TimeAxis
+HORIZONS = {
+    "1d@15m": TimeAxis(15, 1),
+    "1d@5m": TimeAxis(5, 1),
+    "1d@1m": TimeAxis(1, 1),
+    "7d@15m": TimeAxis(15, 7),
+}
+PRESETS = {
+    # sizes swept at the first horizon, horizons swept at the sweep size
+    "quick": {"sizes": ["S", "M"], "horizons": ["1d@15m", "1d@5m"], "sweep_size": "S",
+              "training_days": [1, 3]},
+    "full": {"sizes": ["S", "M", "L"], "horizons": ["1d@15m", "1d@1m", "7d@15m"], "sweep_size": "M",
+             "training_days": [1, 7, 30]},
+}
+
+Case = Tuple[str, Dict, Callable[[], Callable[[], object]]]
+
+
+# ----------------------------
+# Fixtures
+# ----------------------------
+def _city(size: str, seed: int = 0) -> Dict:
+    n_stops, n_routes, n_buses = CITY_SIZES[size]
+    return generate_city(n_stops, n_routes, n_buses, seed=seed)
+
+
+def _snapshots(network: Dict, axis: TimeAxis) -> Tuple[List[Dict], Dict]:
+    """Engine run reshaped into the per-step snapshot dicts metrics.py consumes."""
+    sim = simulate_network(0, **network, axis=axis)
+    route_ids = sim["net"]["route_ids"]
+    demand, cap, buses = sim["route_demand"], sim["route_capacity"], sim["bus_counts"]
+    util = demand / np.maximum(cap, 1)
+    snapshots = [
+        {
+            "route_demand": dict(zip(route_ids, demand[t].tolist())),
+            "route_capacity": dict(zip(route_ids, cap[t].tolist())),
+            "route_num_buses": dict(zip(route_ids, buses[t].tolist())),
+            "route_utilization": dict(zip(route_ids, util[t].tolist())),
+        }
+        for t in range(axis.n_ticks)
+    ]
+    return snapshots, network["routes"]
+
+
+# ----------------------------
+# Cases: (bench, params, setup) where setup() returns the timed callable
+# ----------------------------
+def _run_simulation(size, axis):
+    def setup():
+        network = to_network(_city(size))
+        return lambda: run_network_simulation(1, **network, axis=axis)
+    return setup
+
+
+def _generate_demand(size, axis):
+    def setup():
+        state = CityState.from_city(_city(size))
+        event_index(state.num_stops, axis)
+        rng = np.random.default_rng(0)
+
+        def run():
+            for step in range(axis.n_ticks):
+                generate_demand(state, step, rng, axis)
+        return run
+    return setup
+
+
+def _simulate_bus_service(size, axis):
+    def setup():
+        state = CityState.from_city(_city(size))
+        rng = np.random.default_rng(0)
+        demand = [generate_demand(state, step, rng, axis) for step in range(axis.n_ticks)]
+
+        def run():
+            for step in range(axis.n_ticks):
+                state.stop_waiting += demand[step]
+                simulate_bus_service(state)
+        return run
+    return setup
+
+
+def _rebalance_fleet(size, axis):
+    def setup():
+        city = _city(size)
+        state = CityState.from_city(city)
+        rng = np.random.default_rng(0)
+        # Pressure that swings between routes over the day
+        per_step = [state.route_sum(generate_demand(state, step, rng, axis)) for step in range(axis.n_ticks)]
+        predicted = [dict(enumerate(d.tolist())) for d in per_step]
+
+        def run():
+            routes, buses = city["routes"], [SimpleNamespace(**vars(b)) for b in city["buses"]]
+            index, log = FleetIndex(buses), []
+            for step in range(axis.n_ticks):
+                rebalance_fleet(routes, buses, predicted[step], log,
+                                step, axis.label(step), index=index)
+        return run
+    return setup
+
+
+def _compute_all_metrics(size, axis):
+    def setup():
+        snapshots, routes = _snapshots(to_network(_city(size)), axis)
+        return lambda: compute_all_metrics(snapshots, routes)
+    return setup
+
+
+def _predict_demand_tensor(size, axis):
+    def setup():
+        ensure_artifacts()
+        predict.load_model()
+        n_routes = CITY_SIZES[size][1]
+        rng = np.random.default_rng(0)
+        shape = (axis.n_ticks, n_routes)
+        X = predict.build_feature_tensor(
+            axis.slot_of_day(), rng.integers(0, 4, axis.n_ticks), rng.integers(1, 6, shape),
+            rng.random(shape) < 0.1, rng.integers(0, 400, shape), rng.random(shape),
+        )
+        # The model only knows the trained routes; larger cities reuse the last one
+        X[..., 2] = np.minimum(X[..., 2], len(predict.ROUTE_LIST) - 1)
+        return lambda: predict.predict_demand_tensor(X)
+    return setup
+
+
+def _predict_route_demands(axis):
+    def setup():
+        ensure_artifacts()
+        predict.load_model()
+        rng = np.random.default_rng(0)
+        routes = {
+            rid: SimpleNamespace(num_buses=3, stop_indices=list(range(5 * i, 5 * i + 5)),
+                                 avg_utilization=0.6)
+            for i, rid in enumerate(predict.ROUTE_LIST)
+        }
+        slots = axis.slot_of_day().tolist()
+        prev = [dict(zip(predict.ROUTE_LIST, rng.integers(0, 400, len(routes)).tolist()))
+                for _ in range(axis.n_ticks)]
+
+        def run():
+            for step, slot in enumerate(slots):
+                predict.predict_route_demands(slot, routes, "sunny", [0, 7], prev[step])
+        return run
+    return setup
+
+
+def _generate_training_data(days):
+    def setup():
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                return generate_training_data(days, workers=1)
+        return run
+    return setup
+
+
+SIZED_BENCHES = {
+    "run_simulation": _run_simulation,
+    "generate_demand": _generate_demand,
+    "simulate_bus_service": _simulate_bus_service,
+    "rebalance_fleet": _rebalance_fleet,
+    "compute_all_metrics": _compute_all_metrics,
+    "predict_demand_tensor": _predict_demand_tensor,
+}
+MODEL_BENCHES = {"predict_demand_tensor", "predict_route_demands"}
+
+
+def iter_cases(preset: Dict) -> Iterator[Case]:
+    """Every (bench, params, setup) of a preset, sizes first, then horizons."""
+    first_horizon = preset["horizons"][0]
+    grid = [(size, first_horizon) for size in preset["sizes"]]
+    grid += [(preset["sweep_size"], h) for h in preset["horizons"][1:]]
+
+    for bench, factory in SIZED_BENCHES.items():
+        for size, horizon in grid:
+            axis = HORIZONS[horizon]
+            params = {"size": size, "stops": CITY_SIZES[size][0], "routes": CITY_SIZES[size][1],
+                      "buses": CITY_SIZES[size][2], "horizon": horizon, "ticks": axis.n_ticks}
+            yield bench, params, factory(size, axis)
+    for horizon in preset["horizons"]:
+        axis = HORIZONS[horizon]
+        yield "predict_route_demands", {"horizon": horizon, "ticks": axis.n_ticks}, _predict_route_demands(axis)
+    for days in preset["training_days"]:
+        yield "generate_training_data", {"days": days}, _generate_training_data(days)
+
+
+def case_key(bench: str, params: Dict) -> str:
+    return bench + "[" + ",".join(f"{k}={v}" for k, v in params.items()) + "]"
+
+
+# ----------------------------
+# Measurement
+# ----------------------------
+def measure(fn: Callable[[], object], repeat: int) -> Dict:
+    """Median / min wall time over `repeat` runs after one warm-up, plus peak traced memory of one more run."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "time_s": statistics.median(times),
+        "time_min_s": min(times),
+        "runs": repeat,
+        "peak_mem_mb": peak / 2**20,
+    }
+
+
+def run_suite(preset_name: str = "quick", repeat: int = 5, only: List[str] = None) -> Dict:
+    preset = PRESETS[preset_name]
+    has_model = predict.is_model_available()
+    results = []
+    for bench, params, setup in iter_cases(preset):
+        if only and bench not in only:
+            continue
+        key = case_key(bench, params)
+        if bench in MODEL_BENCHES and not has_model:
+            print(f"  skip {key} (no trained model; run python -m ml.train_model)")
+            continue
+        fn = setup()
+        result = {"bench": bench, "key": key, "params": params, **measure(fn, repeat)}
+        results.append(result)
+        print(f"  {key:<84} {result['time_s']*1000:10.1f} ms {result['peak_mem_mb']:9.1f} MB")
+    return {"version": REPORT_VERSION, "meta": _meta(preset_name, repeat), "results": results}
+
+
+def _meta(preset_name: str, repeat: int) -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "preset": preset_name,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+# ----------------------------
+# Comparison
+# ----------------------------
+def compare(report: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD,
+            mem_threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    Match cases by key and return one row per common case with time and memory
+    ratios (new / baseline); "regression" is set when either ratio exceeds
+    1 + threshold and the absolute change is above MIN_TIME_DELTA_S / MIN_MEM_DELTA_MB.
+    """
+    old = {r["key"]: r for r in baseline["results"]}
+    rows = []
+    for r in report["results"]:
+        b = old.get(r["key"])
+        if b is None:
+            continue
+        time_ratio = r["time_s"] / max(b["time_s"], 1e-9)
+        mem_ratio = r["peak_mem_mb"] / max(b["peak_mem_mb"], 1e-6)
+        slower = time_ratio > 1 + threshold and r["time_s"] - b["time_s"] > MIN_TIME_DELTA_S
+        bigger = mem_ratio > 1 + mem_threshold and r["peak_mem_mb"] - b["peak_mem_mb"] > MIN_MEM_DELTA_MB
+        rows.append({
+            "key": r["key"],
+            "time_ratio": time_ratio,
+            "mem_ratio": mem_ratio,
+            "regression": slower or bigger,
+        })
+    return rows
+
+
+def print_comparison(rows: List[Dict], baseline: Dict) -> None:
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'}:")
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"  {row['key']:<84} time x{row['time_ratio']:5.2f}  mem x{row['mem_ratio']:5.2f}  {flag}")
+    n_bad = sum(row["regression"] for row in rows)
+    print(f"{n_bad} regression(s) in {len(rows)} comparable case(s)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the simulator's hot paths.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (median is reported)")
+    parser.add_argument("--only", nargs="+", metavar="BENCH", help="run only these benches")
+    parser.add_argument("--output", default="benchmark_report.json", help="where to write the JSON report")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative time increase flagged as a regression")
+    parser.add_argument("--mem-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative peak-memory increase flagged as a regression")
+    args = parser.parse_args(argv)
+
+    print(f"Running preset '{args.preset}' ({args.repeat} runs per case)")
+    report = run_suite(args.preset, args.repeat, args.only)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold, args.mem_threshold)
+        print_comparison(rows, baseline)
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
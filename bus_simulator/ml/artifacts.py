@@ -0,0 +1,98 @@
+"""
+artifacts.py - Versioned publishing of the trained model files.
+
+A save writes a complete set (pickled model, flat forest, metadata) to fresh
+files with unique names, then publishes them by atomically replacing one small
+JSON manifest that names the set. Readers open only the files the manifest
+names, so they see the old set or the new one, never a new model next to an old
+forest. Concurrent writers never share a file: the last manifest written wins.
+
+Published files are left in place for one more generation, so a reader still
+holding the previous set (e.g. a FlatForest that loads its fallback lazily) can
+finish with it. Older sets are deleted; a set that was overwritten in a publish
+race is never named as "previous" and stays on disk until removed by hand.
+"""
+
+import json
+import os
+import tempfile
+from typing import Dict, Optional
+
+ML_DIR = os.path.dirname(__file__)       # default artifact directory
+MANIFEST_NAME = "artifacts.json"
+MANIFEST_PATH = os.path.join(ML_DIR, MANIFEST_NAME)
+
+# role → (file name prefix, suffix) of the versioned files
+ROLES = {
+    "model": ("demand_model-", ".pkl"),
+    "forest": ("demand_forest-", ".bin"),
+    "meta": ("feature_meta-", ".pkl"),
+}
+
+
+def default_mode() -> int:
+    """Permissions open() gives a new file under the current umask (mkstemp always uses 0600)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def new_file(role: str, directory: str = ML_DIR) -> str:
+    """Create an empty, uniquely named file for `role` and return its path."""
+    prefix, suffix = ROLES[role]
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=directory)
+    os.close(fd)
+    os.chmod(path, default_mode())
+    return path
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Replace `path` with `data` through a unique temp file in the same directory."""
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                    dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, default_mode())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def manifest_path(directory: str = ML_DIR) -> str:
+    return os.path.join(directory, MANIFEST_NAME)
+
+
+def read_manifest(directory: str = ML_DIR) -> Optional[Dict]:
+    """The manifest published in `directory`, with file names resolved to paths (None if there is none)."""
+    try:
+        with open(manifest_path(directory)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    manifest["paths"] = {role: os.path.join(directory, name) for role, name in manifest["files"].items()}
+    return manifest
+
+
+def publish(paths: Dict[str, str], directory: str = ML_DIR) -> int:
+    """
+    Make `paths` (role → file in `directory`) the current set there and
+    return its version. The previous set is kept; the one before it is deleted.
+    """
+    current = read_manifest(directory)
+    manifest = {
+        "version": current["version"] + 1 if current else 1,
+        "files": {role: os.path.basename(p) for role, p in paths.items()},
+        "previous": current["files"] if current else {},
+    }
+    write_atomic(manifest_path(directory), json.dumps(manifest, indent=2).encode())
+    if current:
+        keep = set(manifest["files"].values()) | set(manifest["previous"].values())
+        for name in current["previous"].values():
+            if name not in keep:
+                try:
+                    os.unlink(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+    return manifest["version"]
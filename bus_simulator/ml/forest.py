@@ -0,0 +1,137 @@
+"""
+forest.py - Flat, memory-mappable RandomForest format and a NumPy-only predictor.
+
+A trained RandomForestRegressor is flattened into contiguous node arrays in
+one file:
+
+    header | roots int64[n_trees] | threshold f8[n] | value f8[n] | feature i4[n] | left i4[n] | right i4[n]
+
+Child indices are global into the node arrays and leaves have left == -1.
+FlatForest maps the file read-only, so every process serving the dashboard
+shares one page-cached copy and nothing is unpickled at start-up. Its NumPy
+traversal wins on the small per-step batches the dashboard sends and stays
+within a few milliseconds of sklearn up to one scenario-day (96 steps × 8
+routes = 768 rows), so those never pay for unpickling. Batches above
+FLAT_MAX_ROWS (multi-scenario tensors) go to the pickled sklearn model when
+one is given, which is loaded on first use.
+"""
+
+import os
+import pickle
+import tempfile
+import numpy as np
+
+from ml.artifacts import default_mode
+
+MAGIC = b"TFFOREST"
+VERSION = 1
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"), ("version", "<u4"), ("n_features", "<u4"),
+    ("n_trees", "<u8"), ("n_nodes", "<u8"),
+])
+# (name, dtype) in file order; 8-byte fields first keeps every array aligned
+NODE_ARRAYS = [
+    ("threshold", "<f8"), ("value", "<f8"),
+    ("feature", "<i4"), ("left", "<i4"), ("right", "<i4"),
+]
+PREDICT_BLOCK_ROWS = 4096  # bounds predict temporaries to rows × trees of one block
+FLAT_MAX_ROWS = 1024       # one scenario-day fits; above this sklearn's compiled traversal is faster
+
+
+def export_forest(model, path: str) -> None:
+    """Write a fitted RandomForestRegressor to `path` in the flat format."""
+    trees = [est.tree_ for est in model.estimators_]
+    sizes = np.array([t.node_count for t in trees])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    def shifted(children, off):
+        return np.where(children >= 0, children + off, -1)
+
+    arrays = {
+        "threshold": np.concatenate([t.threshold for t in trees]),
+        "value": np.concatenate([t.value[:, 0, 0] for t in trees]),
+        "feature": np.concatenate([t.feature for t in trees]),
+        "left": np.concatenate([shifted(t.children_left, o) for t, o in zip(trees, offsets)]),
+        "right": np.concatenate([shifted(t.children_right, o) for t, o in zip(trees, offsets)]),
+    }
+    header = np.array([(MAGIC, VERSION, model.n_features_in_, len(trees), int(sizes.sum()))],
+                      dtype=HEADER_DTYPE)
+
+    # Unique temp file, so concurrent exports to the same path never share one
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                    dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header.tobytes())
+            f.write(offsets.astype("<i8").tobytes())
+            for name, dtype in NODE_ARRAYS:
+                f.write(arrays[name].astype(dtype).tobytes())
+        # Readable by other users like a plain open(), so every process can map it
+        os.chmod(tmp_path, default_mode())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class FlatForest:
+    """Read-only, memory-mapped forest with a batched `predict` matching sklearn's."""
+
+    def __init__(self, path: str, fallback_path: str = None):
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)[0]
+        if header["magic"] != MAGIC or header["version"] != VERSION:
+            raise ValueError(f"{path} is not a flat forest file (version {VERSION})")
+        self.path = path
+        self.fallback_path = fallback_path
+        self._fallback = None
+        self.n_features_in_ = int(header["n_features"])
+        n_trees, n_nodes = int(header["n_trees"]), int(header["n_nodes"])
+
+        offset = HEADER_DTYPE.itemsize
+        self.roots = np.memmap(path, dtype="<i8", mode="r", offset=offset, shape=(n_trees,))
+        offset += 8 * n_trees
+        for name, dtype in NODE_ARRAYS:
+            arr = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(n_nodes,))
+            setattr(self, name, arr)
+            offset += arr.nbytes
+        # Plain ndarray views of the same mapping: fancy indexing skips the memmap subclass
+        self._roots = np.asarray(self.roots)
+        for name, _ in NODE_ARRAYS:
+            setattr(self, f"_{name}", np.asarray(getattr(self, name)))
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def predict(self, X) -> np.ndarray:
+        """Mean leaf value over all trees for every row of X (n_samples × n_features)."""
+        # sklearn evaluates splits on float32 features
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features_in_)
+        if len(X) > FLAT_MAX_ROWS and self.fallback_path and os.path.exists(self.fallback_path):
+            if self._fallback is None:
+                with open(self.fallback_path, "rb") as f:
+                    self._fallback = pickle.load(f)
+            return self._fallback.predict(X)
+        out = np.empty(len(X))
+        for lo in range(0, len(X), PREDICT_BLOCK_ROWS):
+            out[lo:lo + PREDICT_BLOCK_ROWS] = self._predict_block(X[lo:lo + PREDICT_BLOCK_ROWS])
+        return out
+
+    def _predict_block(self, X: np.ndarray) -> np.ndarray:
+        """
+        Walk every (row, tree) path of one block in lockstep. Paths that reached
+        a leaf drop out of the active set, so each level only gathers for the
+        paths still descending and temporaries stay block × trees in size.
+        """
+        left, right = self._left, self._right
+        n = len(X)
+        idx = np.tile(self._roots, n)                  # (row, tree) flattened row-major
+        row = np.repeat(np.arange(n), self.n_trees)
+        active = np.flatnonzero(left[idx] >= 0)
+        while active.size:
+            node = idx[active]
+            go_left = X[row[active], self._feature[node]] <= self._threshold[node]
+            nxt = np.where(go_left, left[node], right[node])
+            idx[active] = nxt
+            active = active[left[nxt] >= 0]
+        return self._value[idx].reshape(n, self.n_trees).mean(axis=1)
@@ -5,10 +5,11 @@ predict.py - Load trained model and predict demand for each route at a given tim
 import numpy as np
 import pickle
 import os
-from typing import Dict, List
+from collections import OrderedDict
+from typing import Dict, List, Optional
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "demand_model.pkl")
-SCALER_PATH = os.path.join(os.path.dirname(__file__), "feature_meta.pkl")
+from ml import artifacts
+from ml.forest import FlatForest
 
 WEATHER_ENCODING = {"sunny": 0, "cloudy": 1, "rainy": 2, "stormy": 3}
 ROUTE_LIST = [
@@ -17,34 +18,204 @@ ROUTE_LIST = [
     "R7_Industrial_Ring", "R8_Old_Town_Lakeside"
 ]
 
+FEATURE_COLS = [
+    "step", "hour", "route_idx", "num_buses",
+    "weather_enc", "is_event", "is_peak",
+    "prev_demand", "avg_utilization"
+]
+
 _model = None
 _meta = None
+_model_stamp = None
+_cache = None
 
 
-def load_model():
-    """Load model from disk (cached after first call)."""
-    global _model, _meta
-    if _model is None:
-        if not os.path.exists(MODEL_PATH):
+class PredictionCache:
+    """
+    Bounded LRU cache of predictions keyed on a full feature row.
+
+    Every input except prev_demand and avg_utilization is already discrete, so
+    those two are snapped to bins of `demand_bin` passengers and `util_bin`
+    utilization before lookup; the model is run on the snapped row, so a cached
+    value is exactly what a miss would have returned.
+    """
+
+    def __init__(self, maxsize: int = 100_000, demand_bin: float = 2.0, util_bin: float = 0.02):
+        self.maxsize = maxsize
+        self.demand_bin = demand_bin
+        self.util_bin = util_bin
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, float]" = OrderedDict()
+
+    def quantize(self, X: np.ndarray) -> np.ndarray:
+        Q = np.array(X, dtype=float)
+        for col, width in (("prev_demand", self.demand_bin), ("avg_utilization", self.util_bin)):
+            j = FEATURE_COLS.index(col)
+            Q[:, j] = np.round(Q[:, j] / width) * width + 0.0  # + 0.0 folds -0.0 into the 0.0 key
+        return Q
+
+    def predict(self, model, X: np.ndarray) -> np.ndarray:
+        """Predict rows of X, running the model once on the distinct missing rows."""
+        Q = self.quantize(X)
+        keys = [row.tobytes() for row in Q]
+        out = np.empty(len(Q))
+        missing: Dict[bytes, List[int]] = {}
+
+        for i, key in enumerate(keys):
+            value = self._entries.get(key)
+            if value is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                self._entries.move_to_end(key)
+                out[i] = value
+        self.hits += len(keys) - sum(len(rows) for rows in missing.values())
+        self.misses += sum(len(rows) for rows in missing.values())
+
+        if missing:
+            first_rows = [rows[0] for rows in missing.values()]
+            values = model.predict(Q[first_rows])
+            for (key, rows), value in zip(missing.items(), values):
+                out[rows] = value
+                self._entries[key] = float(value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return out
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+
+def enable_prediction_cache(maxsize: int = 100_000, demand_bin: float = 2.0,
+                            util_bin: float = 0.02) -> PredictionCache:
+    """Route all predictions through a fresh LRU cache and return it."""
+    global _cache
+    _cache = PredictionCache(maxsize, demand_bin, util_bin)
+    return _cache
+
+
+def disable_prediction_cache() -> None:
+    global _cache
+    _cache = None
+
+
+def get_prediction_cache() -> Optional[PredictionCache]:
+    return _cache
+
+
+def _artifact_stamp(directory: str):
+    """Identity of the manifest in `directory`; changes whenever train_model publishes a new set."""
+    try:
+        st = os.stat(artifacts.manifest_path(directory))
+    except FileNotFoundError:
+        return None
+    return os.path.abspath(directory), st.st_ino, st.st_mtime_ns
+
+
+def load_model(directory: str = artifacts.ML_DIR):
+    """
+    Load the model set published in `directory` (cached until a new set is
+    published, or another directory is asked for). Serves from the
+    memory-mapped flat forest, which hands large batches to the pickled
+    sklearn model of the same set.
+    """
+    global _model, _meta, _model_stamp
+    stamp = _artifact_stamp(directory)
+    if _model is None or stamp != _model_stamp:
+        manifest = artifacts.read_manifest(directory)
+        if manifest is None:
             raise FileNotFoundError(
-                f"Model not found at {MODEL_PATH}. Run ml/train_model.py first."
+                f"No model published at {artifacts.manifest_path(directory)}. "
+                "Generate it with `python -m ml.train_model` "
+                "(ml.train_model.train_and_save_model); model files are build output, not checked in."
             )
-        with open(MODEL_PATH, "rb") as f:
-            _model = pickle.load(f)
-        with open(SCALER_PATH, "rb") as f:
+        if _cache is not None:
+            _cache.clear()
+        paths = manifest["paths"]
+        _model = FlatForest(paths["forest"], fallback_path=paths["model"])
+        with open(paths["meta"], "rb") as f:
             _meta = pickle.load(f)
+        _model_stamp = stamp
     return _model, _meta
 
 
+def build_feature_tensor(
+    steps,
+    weather_enc,
+    num_buses,
+    is_event,
+    prev_demand,
+    avg_utilization,
+) -> np.ndarray:
+    """
+    Build the (scenarios × steps × routes × features) model input with array ops.
+
+    Args:
+        steps: (T,) time steps
+        weather_enc: (T,) or (S, T) weather encoding per step
+        num_buses, is_event, prev_demand, avg_utilization: arrays broadcastable
+            to (S, T, R); e.g. (T, R) for values shared by every scenario
+
+    Columns follow the training order: step, hour, route_idx, num_buses,
+    weather_enc, is_event, is_peak, prev_demand, avg_utilization.
+    """
+    steps = np.asarray(steps)[:, None]
+    weather_enc = np.asarray(weather_enc)[..., None]
+    per_route = [np.asarray(a) for a in (num_buses, is_event, prev_demand, avg_utilization)]
+    shape = np.broadcast_shapes((1, 1, 1), steps.shape, weather_enc.shape,
+                                *(a.shape for a in per_route))
+
+    hour = (steps * 15) / 60.0
+    is_peak = ((6 <= hour) & (hour < 9)) | ((17 <= hour) & (hour < 20))
+
+    X = np.empty(shape + (len(FEATURE_COLS),))
+    X[..., 0] = steps
+    X[..., 1] = hour
+    X[..., 2] = np.arange(shape[2])
+    X[..., 3] = per_route[0]
+    X[..., 4] = weather_enc
+    X[..., 5] = per_route[1]
+    X[..., 6] = is_peak
+    X[..., 7] = per_route[2]
+    X[..., 8] = per_route[3]
+    return X
+
+
+def predict_demand_tensor(features: np.ndarray, directory: str = artifacts.ML_DIR) -> np.ndarray:
+    """
+    Predict demand for a whole feature tensor (..., features) in one model call
+    (through the prediction cache when enabled). Returns an array of the leading shape, e.g. (scenarios × steps × routes).
+
+    A single day (steps × routes) stays on the flat forest; tensors over
+    forest.FLAT_MAX_ROWS rows go to the pickled sklearn model of the same set.
+    """
+    model, meta = load_model(directory)
+    flat = features.reshape(-1, features.shape[-1])
+    predictions = _cache.predict(model, flat) if _cache is not None else model.predict(flat)
+    return np.maximum(0.0, predictions).reshape(features.shape[:-1])
+
+
 def predict_route_demands(
     step: int,
     routes: Dict,
     weather: str,
     active_event_stops: List[int],
     prev_demands: Dict[str, int],
+    directory: str = artifacts.ML_DIR,
 ) -> Dict[str, float]:
     """
     Predict demand for each route at the given time step.
+    Thin wrapper over predict_demand_tensor for a single step.
 
     Args:
         step: Current time step (0-95)
@@ -52,42 +223,29 @@ def predict_route_demands(
         weather: Current weather string
         active_event_stops: List of stop indices affected by events
         prev_demands: Dict of route_id -> demand from previous step
+        directory: Directory the model set is published in
 
     Returns:
         Dict of route_id -> predicted_demand (float)
     """
-    model, meta = load_model()
-
-    hour = (step * 15) / 60.0
-    weather_enc = WEATHER_ENCODING.get(weather, 0)
-    is_peak = 1 if (6 <= hour < 9 or 17 <= hour < 20) else 0
     event_stop_set = set(active_event_stops)
-
-    feature_rows = []
-    for r_idx, route_id in enumerate(ROUTE_LIST):
-        route = routes.get(route_id)
-        if route is None:
-            feature_rows.append([step, hour, r_idx, 2, weather_enc, 0, is_peak, 0, 0.5])
-            continue
-
-        is_event = 1 if any(s in event_stop_set for s in route.stop_indices) else 0
-        num_buses = route.num_buses
-        avg_util = route.avg_utilization
-        prev_demand = prev_demands.get(route_id, 0)
-
-        feature_rows.append([
-            step, hour, r_idx, num_buses,
-            weather_enc, is_event, is_peak,
-            prev_demand, avg_util
-        ])
-
-    X = np.array(feature_rows)
-    predictions = model.predict(X)
-
-    return {route_id: max(0.0, float(pred))
-            for route_id, pred in zip(ROUTE_LIST, predictions)}
-
-
-def is_model_available() -> bool:
-    """Check if trained model exists on disk."""
-    return os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH)
+    defaults = (2, 0, 0, 0.5)  # num_buses, is_event, prev_demand, avg_util of a missing route
+    per_route = np.array([
+        defaults if routes.get(route_id) is None else (
+            routes[route_id].num_buses,
+            any(s in event_stop_set for s in routes[route_id].stop_indices),
+            prev_demands.get(route_id, 0),
+            routes[route_id].avg_utilization,
+        )
+        for route_id in ROUTE_LIST
+    ], dtype=float)
+
+    X = build_feature_tensor([step], [WEATHER_ENCODING.get(weather, 0)], *per_route.T)
+    predictions = predict_demand_tensor(X, directory)[0, 0]
+
+    return dict(zip(ROUTE_LIST, predictions.tolist()))
+
+
+def is_model_available(directory: str = artifacts.ML_DIR) -> bool:
+    """Check if a trained model has been published in `directory`."""
+    return artifacts.read_manifest(directory) is not None
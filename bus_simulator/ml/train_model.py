@@ -8,23 +8,26 @@ import numpy as np
 import pandas as pd
 import pickle
 import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, r2_score
 
-from simulation.city import build_city, RANDOM_SEED, TIME_STEPS
+from ml import artifacts
+from ml.forest import export_forest
+from simulation.city import build_city_state, RANDOM_SEED, TIME_STEPS
 from simulation.demand_generator import (
     generate_demand,
     generate_route_demand,
     simulate_bus_service,
-    get_active_events,
+    event_index,
     WEATHER_SEQUENCE,
-    EVENTS
 )
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "demand_model.pkl")
-SCALER_PATH = os.path.join(os.path.dirname(__file__), "feature_meta.pkl")
+TRAINING_DATA_PATH = os.path.join(os.path.dirname(__file__), "training_data.npz")
 
 WEATHER_ENCODING = {
     "clear": 0,
@@ -35,90 +38,176 @@ WEATHER_ENCODING = {
 }
 
 
-def generate_training_data(num_days: int = 30) -> pd.DataFrame:
-    rows = []
-    np.random.seed(RANDOM_SEED)
-
-    for day in range(num_days):
-
-        city = build_city()
-        stops = city["stops"]
-        routes = city["routes"]
-        buses = city["buses"]
-
-        prev_route_demand = {r.route_id: 0 for r in routes}
-
-        for step in range(TIME_STEPS):
-
-            demand_map = generate_demand(stops, step)
-            route_demand = generate_route_demand(routes, demand_map)
-            simulate_bus_service(routes, buses, stops)
-
-            weather = WEATHER_SEQUENCE[step]
-            weather_enc = WEATHER_ENCODING[weather]
-
-            hour = (step * 15) / 60.0
-            is_peak = 1 if (6 <= hour < 9 or 17 <= hour < 20) else 0
-
-            for r_idx, route in enumerate(routes):
-
-                route_id = route.route_id
-
-                is_event = 0
-                for stop_id in route.stops:
-                    if any(
-                        e["start"] <= step < e["end"] and stop_id in e["stops"]
-                        for e in EVENTS
-                    ):
-                        is_event = 1
-                        break
-
-                num_buses = sum(1 for b in buses if b.route_id == route_id)
-
-                route_buses = [b for b in buses if b.route_id == route_id]
-                if route_buses:
-                    utilization = np.mean(
-                        [b.current_load / b.capacity for b in route_buses]
-                    )
-                else:
-                    utilization = 0
-
-                demand = route_demand.get(route_id, 0)
-
-                rows.append({
-                    "day": day,
-                    "step": step,
-                    "hour": hour,
-                    "route_idx": r_idx,
-                    "num_buses": num_buses,
-                    "weather_enc": weather_enc,
-                    "is_event": is_event,
-                    "is_peak": is_peak,
-                    "prev_demand": prev_route_demand[route_id],
-                    "avg_utilization": utilization,
-                    "demand": demand,
-                })
-
-                prev_route_demand[route_id] = demand
+FEATURE_COLS = [
+    "step", "hour", "route_idx", "num_buses",
+    "weather_enc", "is_event", "is_peak",
+    "prev_demand", "avg_utilization"
+]
+
+# One row per (day, step, route); columns are stored in these dtypes on disk
+COLUMN_DTYPES = {
+    "day": np.int32,
+    "step": np.int32,
+    "hour": np.float64,
+    "route_idx": np.int32,
+    "num_buses": np.int32,
+    "weather_enc": np.int8,
+    "is_event": np.int8,
+    "is_peak": np.int8,
+    "prev_demand": np.int64,
+    "avg_utilization": np.float64,
+    "demand": np.int64,
+}
 
-    df = pd.DataFrame(rows)
+CHUNK_ROWS = 65536
+
+
+def day_seed(day: int) -> np.random.SeedSequence:
+    """Seed of one simulated day: child `day` of SeedSequence(RANDOM_SEED)."""
+    return np.random.SeedSequence(RANDOM_SEED, spawn_key=(day,))
+
+
+def simulate_day(day: int) -> Dict[str, np.ndarray]:
+    """
+    Simulate one day and return its rows as NumPy columns (steps × routes rows).
+    Each day draws from its own RNG stream, so days can run in any order or process.
+    """
+    rng = np.random.default_rng(day_seed(day))
+    state = build_city_state()
+    events = event_index(state.num_stops)
+    n_routes = state.num_routes
+    cols = {c: np.empty(TIME_STEPS * n_routes, dtype=dt) for c, dt in COLUMN_DTYPES.items()}
+    cols["day"][:] = day
+    cols["route_idx"][:] = np.tile(np.arange(n_routes), TIME_STEPS)
+    prev_route_demand = np.zeros(n_routes, dtype=np.int64)
+
+    for step in range(TIME_STEPS):
+
+        demand = generate_demand(state, step, rng)
+        route_demand = generate_route_demand(state, demand)
+        simulate_bus_service(state)
+
+        hour = (step * 15) / 60.0
+
+        rows = slice(step * n_routes, (step + 1) * n_routes)
+        cols["step"][rows] = step
+        cols["hour"][rows] = hour
+        cols["num_buses"][rows] = state.route_num_buses()
+        cols["weather_enc"][rows] = WEATHER_ENCODING[WEATHER_SEQUENCE[step]]
+        cols["is_event"][rows] = state.route_sum(events.stop_mask(step)) > 0
+        cols["is_peak"][rows] = 1 if (6 <= hour < 9 or 17 <= hour < 20) else 0
+        cols["prev_demand"][rows] = prev_route_demand
+        cols["avg_utilization"][rows] = state.route_utilization()
+        cols["demand"][rows] = route_demand
+
+        prev_route_demand = route_demand
+
+    return cols
+
+
+def iter_days(num_days: int, workers: int = None):
+    """Yield simulate_day(0..num_days-1) in order, computed across a process pool."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        yield from map(simulate_day, range(num_days))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(simulate_day, range(num_days),
+                            chunksize=max(1, num_days // (workers * 4)))
+
+
+def iter_training_chunks(num_days: int = 30, chunk_rows: int = CHUNK_ROWS, workers: int = None):
+    """
+    Yield the training set as dicts of NumPy columns of `chunk_rows` rows
+    (the last chunk may be shorter). Days are copied into preallocated column
+    buffers, so memory stays bounded by one chunk plus the days in flight.
+    Output is bit-identical for any number of workers.
+    """
+    buf = {c: np.empty(chunk_rows, dtype=dt) for c, dt in COLUMN_DTYPES.items()}
+    fill = 0
+
+    for block in iter_days(num_days, workers):
+        n, start = len(block["day"]), 0
+        while start < n:
+            take = min(chunk_rows - fill, n - start)
+            for c in buf:
+                buf[c][fill:fill + take] = block[c][start:start + take]
+            fill += take
+            start += take
+            if fill == chunk_rows:
+                yield {c: b.copy() for c, b in buf.items()}
+                fill = 0
+
+    if fill:
+        yield {c: b[:fill].copy() for c, b in buf.items()}
+
+
+def write_training_data(num_days: int = 30, path: str = TRAINING_DATA_PATH,
+                        chunk_rows: int = CHUNK_ROWS, workers: int = None) -> int:
+    """
+    Stream the training set to an uncompressed .npz, one array per
+    (chunk, column) named "<chunk>/<column>". Returns the number of rows written.
+    """
+    n_rows = 0
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                    dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as out, zipfile.ZipFile(out, "w", allowZip64=True) as zf:
+            for i, chunk in enumerate(iter_training_chunks(num_days, chunk_rows, workers)):
+                for col, values in chunk.items():
+                    with zf.open(f"{i:05d}/{col}.npy", "w", force_zip64=True) as f:
+                        np.lib.format.write_array(f, values)
+                n_rows += len(chunk["day"])
+        os.chmod(tmp_path, artifacts.default_mode())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return n_rows
+
+
+def read_training_chunks(path: str = TRAINING_DATA_PATH, columns=None):
+    """Yield the chunks of a file written by write_training_data, one at a time."""
+    columns = columns or list(COLUMN_DTYPES)
+    with np.load(path) as data:
+        chunk_ids = sorted({name.split("/")[0] for name in data.files})
+        for cid in chunk_ids:
+            yield {c: data[f"{cid}/{c}"] for c in columns}
+
+
+def generate_training_data(num_days: int = 30, workers: int = None) -> pd.DataFrame:
+    chunks = list(iter_training_chunks(num_days, workers=workers))
+    df = pd.DataFrame({c: np.concatenate([chunk[c] for chunk in chunks]) for c in COLUMN_DTYPES})
     print("Generated rows:", len(df))
     return df
 
 
-def train_and_save_model(num_days: int = 30) -> Dict:
-    """Train RandomForest on simulated data and save to disk."""
+def load_training_arrays(path: str = TRAINING_DATA_PATH):
+    """Read a training file chunk by chunk into preallocated X (features) and y (demand)."""
+    with np.load(path) as data:
+        n_rows = sum(len(data[name]) for name in data.files if name.endswith("/demand"))
+    X = np.empty((n_rows, len(FEATURE_COLS)))
+    y = np.empty(n_rows)
+    pos = 0
+    for chunk in read_training_chunks(path, FEATURE_COLS + ["demand"]):
+        n = len(chunk["demand"])
+        for j, col in enumerate(FEATURE_COLS):
+            X[pos:pos + n, j] = chunk[col]
+        y[pos:pos + n] = chunk["demand"]
+        pos += n
+    return X, y
+
+
+def train_and_save_model(num_days: int = 30, data_path: str = TRAINING_DATA_PATH,
+                         workers: int = None, directory: str = artifacts.ML_DIR) -> Dict:
+    """Train RandomForest on simulated data and publish it in `directory`."""
     print(f"Generating {num_days} days of training data...")
-    df = generate_training_data(num_days)
-    print("Dataset shape:", df.shape)
+    n_rows = write_training_data(num_days, data_path, workers=workers)
+    print(f"Wrote {n_rows} rows to {data_path}")
 
-    feature_cols = [
-        "step", "hour", "route_idx", "num_buses",
-        "weather_enc", "is_event", "is_peak",
-        "prev_demand", "avg_utilization"
-    ]
-    X = df[feature_cols].values
-    y = df["demand"].values
+    feature_cols = FEATURE_COLS
+    X, y = load_training_arrays(data_path)
+    print("Dataset shape:", X.shape)
 
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=RANDOM_SEED
@@ -141,17 +230,85 @@ def train_and_save_model(num_days: int = 30) -> Dict:
     print(f"Model trained — MAE: {mae:.2f} | R²: {r2:.4f}")
 
     # Save model and metadata
-    with open(MODEL_PATH, "wb") as f:
-        pickle.dump(model, f)
-
     meta = {"feature_cols": feature_cols, "mae": mae, "r2": r2}
-    with open(SCALER_PATH, "wb") as f:
-        pickle.dump(meta, f)
+    version = save_artifacts(model, meta, directory)
 
-    print(f"Model saved to {MODEL_PATH}")
+    print(f"Model saved as version {version} (manifest: {artifacts.manifest_path(directory)})")
     return {"mae": mae, "r2": r2}
 
 
+def _write_pickle(obj, path: str) -> None:
+    with open(path, "wb") as f:
+        pickle.dump(obj, f)
+
+
+def save_artifacts(model, meta: Dict, directory: str = artifacts.ML_DIR) -> int:
+    """
+    Write model, flat forest and metadata to new, uniquely named files in
+    `directory` and publish them together through its artifacts manifest, so
+    a concurrent load_model sees the whole old set or the whole new one.
+    Returns the published version.
+    """
+    paths = {role: artifacts.new_file(role, directory) for role in artifacts.ROLES}
+    try:
+        _write_pickle(model, paths["model"])
+        export_forest(model, paths["forest"])
+        _write_pickle(meta, paths["meta"])
+    except BaseException:
+        for path in paths.values():
+            os.unlink(path)
+        raise
+    return artifacts.publish(paths, directory)
+
+
+def load_artifacts(directory: str = artifacts.ML_DIR):
+    """(sklearn model, meta) of the set published in `directory`."""
+    manifest = artifacts.read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"No model published at {artifacts.manifest_path(directory)}; "
+                                "run train_and_save_model first")
+    with open(manifest["paths"]["model"], "rb") as f:
+        model = pickle.load(f)
+    with open(manifest["paths"]["meta"], "rb") as f:
+        meta = pickle.load(f)
+    return model, meta
+
+
+def update_model(X_new: np.ndarray, y_new: np.ndarray, n_new_trees: int = 10,
+                 max_trees: int = 200, directory: str = artifacts.ML_DIR) -> Dict:
+    """
+    Incrementally refresh the saved model with a batch of observed
+    (features, demand) rows, e.g. from simulation snapshots.
+
+    The batch first scores the current model (test-then-train), then
+    `n_new_trees` trees are grown on it with warm_start. Beyond `max_trees`
+    the oldest trees are retired, so the forest tracks recent demand.
+    The new artifacts are published as one set; load_model picks them up.
+    Concurrent updates do not merge: each starts from the set published when
+    it began, and the last one to publish wins.
+    """
+    model, meta = load_artifacts(directory)
+
+    y_pred = model.predict(X_new)
+    mae = mean_absolute_error(y_new, y_pred)
+
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_new_trees)
+    model.fit(X_new, y_new)
+    if len(model.estimators_) > max_trees:
+        model.estimators_ = model.estimators_[-max_trees:]
+        model.set_params(n_estimators=max_trees)
+
+    meta = {**meta, "online_mae": mae, "updates": meta.get("updates", 0) + 1}
+    version = save_artifacts(model, meta, directory)
+    return {"mae_before_update": mae, "n_trees": len(model.estimators_), "version": version}
+
+
+def ensure_artifacts(num_days: int = 30, directory: str = artifacts.ML_DIR) -> None:
+    """Train and save the model if the generated artifacts are missing (they are not checked in)."""
+    if artifacts.read_manifest(directory) is None:
+        train_and_save_model(num_days=num_days, directory=directory)
+
+
 if __name__ == "__main__":
     results = train_and_save_model(num_days=30)
     print(results)
@@ -1,22 +1,67 @@
 """
 rebalance.py
 Simple dynamic fleet reallocation for list-based routes + buses architecture.
+
+Two strategies:
+  - rebalance_fleet: greedy, most idle route → most pressured route
+  - solve_reallocation / plan_lookahead: each step solved as an assignment
+    problem over all routes, on the current demand or discounted over the
+    next H steps of a forecast. These work on arrays; the engine's step loop
+    (simulation.engine) owns the fleet counts and cooldowns.
 """
 
-from typing import List, Dict
+import time
+from collections import defaultdict
+from typing import List, Dict, Optional, Tuple
 import numpy as np
+from scipy.optimize import linear_sum_assignment
 from simulation.city import Route, Bus, MIN_BUSES_PER_ROUTE
 
 CAPACITY_THRESHOLD_RATIO = 0.85
 MAX_REALLOCATIONS_PER_STEP = 2
 
+# Assignment rebalancer
+DONOR_UTIL_CEILING = 0.7     # donors keep this much headroom after giving a bus
+MOVE_COST = 5.0              # passengers of relief a move must buy to be worth it
+TIME_BUDGET_MS = 5.0          # for building the problem; see solve_reallocation
+LOOKAHEAD_DISCOUNT = 0.85    # weight of forecast step h is LOOKAHEAD_DISCOUNT ** h
+
+
+class FleetIndex:
+    """
+    Route → bus index with running capacity and bus count per route.
+    Moving a bus updates the index in O(1), so the rebalancer never rescans the fleet.
+    """
+
+    def __init__(self, buses: List[Bus]):
+        self.route_buses: Dict[int, Dict[int, Bus]] = defaultdict(dict)
+        self.capacity: Dict[int, int] = defaultdict(int)
+        self._position = {bus.bus_id: i for i, bus in enumerate(buses)}
+        for bus in buses:
+            self._add(bus)
+
+    def _add(self, bus: Bus) -> None:
+        self.route_buses[bus.route_id][bus.bus_id] = bus
+        self.capacity[bus.route_id] += bus.capacity
 
-def route_capacity(route: Route, buses: List[Bus]) -> int:
-    return sum(b.capacity for b in buses if b.route_id == route.route_id)
+    def num_buses(self, route_id: int) -> int:
+        return len(self.route_buses[route_id])
 
+    def first_bus(self, route_id: int) -> Optional[Bus]:
+        """The route's bus that comes first in the fleet list (what a scan of `buses` finds)."""
+        return min(self.route_buses[route_id].values(), key=lambda b: self._position[b.bus_id], default=None)
 
-def route_num_buses(route: Route, buses: List[Bus]) -> int:
-    return sum(1 for b in buses if b.route_id == route.route_id)
+    def move(self, bus: Bus, to_route: int) -> None:
+        del self.route_buses[bus.route_id][bus.bus_id]
+        self.capacity[bus.route_id] -= bus.capacity
+        bus.route_id = to_route
+        self._add(bus)
+
+
+def _route_ids(routes) -> List[int]:
+    if isinstance(routes, dict):
+        return list(routes)
+    return [r.route_id for r in routes]
 
 
 def rebalance_fleet(
@@ -26,26 +71,25 @@ def rebalance_fleet(
     reallocation_log: List[Dict],
     current_step: int,
     time_label: str,
+    index: Optional[FleetIndex] = None,
 ) -> List[Route]:
+    """
+    Move buses from the least to the most pressured routes (at most
+    MAX_REALLOCATIONS_PER_STEP). Pass a FleetIndex kept across steps to avoid
+    rebuilding it; it is updated in place together with the buses.
+    """
+    if index is None:
+        index = FleetIndex(buses)
+    route_ids = _route_ids(routes)
+
+    def utilization(rid):
+        capacity = index.capacity[rid]
+        return predicted_demands.get(rid, 0) / capacity if capacity > 0 else 1.0
 
     moves_made = 0
 
-    # Compute predicted utilization for each route
-    route_pressure = []
-
-    for rid, route in routes.items():
-        capacity = route_capacity(route, buses)
-        pred_demand = predicted_demands.get(rid, 0)
-
-        if capacity == 0:
-            util = 1.0
-        else:
-            util = pred_demand / capacity
-
-        route_pressure.append((util, rid))
-
-    # Sort highest pressure first
-    route_pressure.sort(reverse=True)
+    # Compute predicted utilization for each route, highest pressure first
+    route_pressure = sorted(((utilization(rid), rid) for rid in route_ids), reverse=True)
 
     for util, target_rid in route_pressure:
 
@@ -56,36 +100,22 @@ def rebalance_fleet(
             continue
 
         # Find donor route (lowest utilization)
-        donor_candidates = []
-
-        for route in routes:
-            rid = route.route_id
-            if rid == target_rid:
-                continue
-
-            num_b = route_num_buses(route, buses)
-            if num_b <= MIN_BUSES_PER_ROUTE:
-                continue
-
-            capacity = route_capacity(route, buses)
-            pred_demand = predicted_demands.get(rid, 0)
-            donor_util = pred_demand / capacity if capacity > 0 else 1.0
-
-            donor_candidates.append((donor_util, rid))
-
+        donor_candidates = [
+            (utilization(rid), rid) for rid in route_ids
+            if rid != target_rid and index.num_buses(rid) > MIN_BUSES_PER_ROUTE
+        ]
         if not donor_candidates:
             continue
 
-        donor_candidates.sort()  # lowest utilization first
-        donor_rid = donor_candidates[0][1]
+        donor_rid = min(donor_candidates)[1]
 
         # Select a bus from donor
-        donor_bus = next((b for b in buses if b.route_id == donor_rid), None)
+        donor_bus = index.first_bus(donor_rid)
         if donor_bus is None:
             continue
 
         # Transfer bus
-        donor_bus.route_id = target_rid
+        index.move(donor_bus, target_rid)
         donor_bus.current_load = 0
 
         moves_made += 1
@@ -102,24 +132,151 @@ def rebalance_fleet(
     return routes
 
 
-def get_fleet_summary(routes: List[Route], buses: List[Bus]) -> Dict[int, Dict]:
+def get_fleet_summary(routes: List[Route], buses: List[Bus],
+                      index: Optional[FleetIndex] = None) -> Dict[int, Dict]:
+
+    if index is None:
+        index = FleetIndex(buses)
 
     summary = {}
 
-    for route in routes:
-        rid = route.route_id
-        route_buses = [b for b in buses if b.route_id == rid]
+    for rid in _route_ids(routes):
+        route_buses = index.route_buses[rid].values()
 
-        total_capacity = sum(b.capacity for b in route_buses)
         avg_util = (
             np.mean([b.current_load / b.capacity for b in route_buses])
             if route_buses else 0
         )
 
         summary[rid] = {
-            "num_buses": len(route_buses),
-            "total_capacity": total_capacity,
+            "num_buses": index.num_buses(rid),
+            "total_capacity": index.capacity[rid],
             "avg_utilization": round(avg_util, 3)
         }
 
-    return summary
\ No newline at end of file
+    return summary
+
+
+# ----------------------------
+# Assignment rebalancer
+# ----------------------------
+def _overflow(demand: np.ndarray, limit: np.ndarray, vehicles: np.ndarray) -> np.ndarray:
+    """Passengers above `limit` × capacity when a route runs `vehicles` vehicles (..., routes, slots)."""
+    return np.maximum(demand[..., None] - limit[:, None] * vehicles, 0.0)
+
+
+def solve_reallocation(
+    demand,
+    counts,
+    vehicle_capacity,
+    ready=None,
+    min_fleet: int = MIN_BUSES_PER_ROUTE,
+    max_moves: int = MAX_REALLOCATIONS_PER_STEP,
+    target_util: float = CAPACITY_THRESHOLD_RATIO,
+    donor_util: float = DONOR_UTIL_CEILING,
+    move_cost=MOVE_COST,
+    time_budget_ms: float = TIME_BUDGET_MS,
+    weights=None,
+) -> List[Tuple[int, int]]:
+    """
+    One step of fleet reallocation as an assignment problem over all routes.
+
+    `demand` is (routes,) for the current step, or (steps × routes) for a
+    forecast window, in which case gains and losses are averaged over the
+    window with `weights` (uniform by default).
+
+    Adding the j-th extra vehicle to route t relieves gain[t, j] passengers of
+    overload (demand above target_util × capacity); taking the j-th vehicle
+    from route d adds loss[d, j] (demand above donor_util × capacity). Both are
+    computed for every route at once. Up to `max_moves` of the best target
+    slots are matched to the cheapest donor slots with linear_sum_assignment,
+    where a pair costs loss - gain + move_cost[d, t] and dummy rows/columns
+    let any slot stay unmatched. Only pairs with negative cost are kept.
+
+    Routes not `ready` (cooling down) neither give nor receive, a route
+    chosen as a target never donates in the same step, and no donor drops
+    below `min_fleet`. `move_cost` is a scalar or a (routes × routes)
+    matrix, e.g. for deadhead distance.
+
+    `time_budget_ms` is checked once, after the gains and losses are built and
+    before the solve: if it has run out, best gains are paired with cheapest
+    losses in order instead of calling linear_sum_assignment. It is not a
+    deadline on the solve itself. The solve is bounded by size instead, since
+    the padded matrix is at most 2·max_moves square.
+
+    Returns a list of (donor_idx, target_idx) moves, best first.
+    """
+    deadline = time.perf_counter() + time_budget_ms / 1000
+    demand = np.atleast_2d(np.asarray(demand, dtype=float))
+    counts = np.asarray(counts)
+    vehicle_capacity = np.asarray(vehicle_capacity, dtype=float)
+    n_routes = demand.shape[1]
+    weights = np.ones(len(demand)) if weights is None else np.asarray(weights, dtype=float)
+    weights = weights / weights.sum()
+    if max_moves <= 0 or n_routes < 2:
+        return []
+    if ready is None:
+        ready = np.ones(n_routes, dtype=bool)
+
+    slot = np.arange(1, max_moves + 1)
+    added = counts[:, None] + slot
+    removed = counts[:, None] - slot
+    target_limit = np.full(n_routes, target_util) * vehicle_capacity
+    donor_limit = np.full(n_routes, donor_util) * vehicle_capacity
+    w = weights[:, None, None]
+    gain = (w * (_overflow(demand, target_limit, added - 1) - _overflow(demand, target_limit, added))).sum(axis=0)
+    loss = (w * (_overflow(demand, donor_limit, removed) - _overflow(demand, donor_limit, removed + 1))).sum(axis=0)
+    gain[~ready] = 0.0
+    loss[~ready[:, None] | (removed < min_fleet)] = np.inf
+
+    # Best max_moves target slots and cheapest max_moves donor slots; a full
+    # vehicle's worth of relief ties often, so ties go to the most (least) loaded route
+    util = np.repeat(weights @ demand / np.maximum(counts * vehicle_capacity, 1), max_moves)
+    t_flat = np.flatnonzero(gain.ravel() > 0)
+    t_flat = t_flat[np.lexsort((-util[t_flat], -gain.ravel()[t_flat]))][:max_moves]
+    t_route = t_flat // max_moves
+    # A route picked as a target never donates in the same step (no churn)
+    d_flat = np.flatnonzero(np.isfinite(loss.ravel()))
+    d_flat = d_flat[~np.isin(d_flat // max_moves, t_route)]
+    d_flat = d_flat[np.lexsort((util[d_flat], loss.ravel()[d_flat]))][:max_moves]
+    if not t_flat.size or not d_flat.size:
+        return []
+    d_route = d_flat // max_moves
+    pair_cost = np.broadcast_to(np.asarray(move_cost, dtype=float), (n_routes, n_routes))
+
+    cost = (loss.ravel()[d_flat][:, None] - gain.ravel()[t_flat][None, :]
+            + pair_cost[d_route[:, None], t_route[None, :]])
+
+    if time.perf_counter() > deadline:
+        # Out of time: pair in order, best gain with cheapest loss
+        n = min(len(d_flat), len(t_flat))
+        diag = cost[np.arange(n), np.arange(n)]
+        pairs = [(i, i) for i in range(n) if diag[i] < 0]
+    else:
+        n_d, n_t = cost.shape
+        square = np.zeros((n_d + n_t, n_t + n_d))
+        square[:n_d, :n_t] = cost
+        rows, cols = linear_sum_assignment(square)
+        pairs = [(r, c) for r, c in zip(rows, cols) if r < n_d and c < n_t and cost[r, c] < 0]
+
+    pairs.sort(key=lambda rc: cost[rc])
+    return [(int(d_route[r]), int(t_route[c])) for r, c in pairs[:max_moves]]
+
+
+def plan_lookahead(
+    forecast,
+    counts,
+    vehicle_capacity,
+    ready=None,
+    discount: float = LOOKAHEAD_DISCOUNT,
+    **kwargs,
+) -> List[Tuple[int, int]]:
+    """
+    Receding-horizon step: choose this step's moves to minimize discounted
+    predicted overload over a (horizon × routes) forecast window. The window
+    is computed once by the caller and every candidate slot is scored against
+    it in one array pass; keyword arguments go to solve_reallocation.
+    """
+    forecast = np.atleast_2d(np.asarray(forecast, dtype=float))
+    weights = discount ** np.arange(len(forecast))
+    return solve_reallocation(forecast, counts, vehicle_capacity, ready, weights=weights, **kwargs)
@@ -86,6 +86,80 @@ def build_city():
     "buses": buses
 }
 
+@dataclass
+class CityState:
+    """
+    Struct-of-arrays view of a city for the vectorized kernels.
+    Stops, routes and buses are addressed by their integer ids; stop→route
+    membership is a CSR index (routes of stop s are
+    stop_route_idx[stop_route_ptr[s]:stop_route_ptr[s+1]]).
+    """
+    stop_names: List[str]
+    route_names: List[str]
+    stop_base_demand: np.ndarray
+    stop_demand: np.ndarray
+    stop_waiting: np.ndarray
+    stop_route_ptr: np.ndarray
+    stop_route_idx: np.ndarray
+    bus_route: np.ndarray
+    bus_capacity: np.ndarray
+    bus_load: np.ndarray
+
+    @property
+    def num_stops(self) -> int:
+        return len(self.stop_names)
+
+    @property
+    def num_routes(self) -> int:
+        return len(self.route_names)
+
+    @property
+    def pair_stop(self) -> np.ndarray:
+        """Stop id of every (stop, route) membership pair, aligned with stop_route_idx."""
+        return np.repeat(np.arange(self.num_stops), np.diff(self.stop_route_ptr))
+
+    def route_sum(self, stop_values: np.ndarray) -> np.ndarray:
+        """Sum a per-stop array over each route's stops."""
+        return np.bincount(self.stop_route_idx, weights=stop_values[self.pair_stop],
+                           minlength=self.num_routes)
+
+    def route_num_buses(self) -> np.ndarray:
+        return np.bincount(self.bus_route, minlength=self.num_routes)
+
+    def route_capacity(self) -> np.ndarray:
+        return np.bincount(self.bus_route, weights=self.bus_capacity, minlength=self.num_routes)
+
+    def route_utilization(self) -> np.ndarray:
+        """Mean bus load/capacity per route (0 for routes without buses)."""
+        load = np.bincount(self.bus_route, weights=self.bus_load / self.bus_capacity,
+                           minlength=self.num_routes)
+        return load / np.maximum(self.route_num_buses(), 1)
+
+    @classmethod
+    def from_city(cls, city) -> "CityState":
+        stops, routes, buses = city["stops"], city["routes"], city["buses"]
+        members = [[] for _ in stops]
+        for r in routes:
+            for s in r.stops:
+                members[s].append(r.route_id)
+        ptr = np.zeros(len(stops) + 1, dtype=np.int64)
+        ptr[1:] = np.cumsum([len(m) for m in members])
+        return cls(
+            stop_names=[s.name for s in stops],
+            route_names=[r.name for r in routes],
+            stop_base_demand=np.array([s.base_demand for s in stops]),
+            stop_demand=np.zeros(len(stops), dtype=np.int64),
+            stop_waiting=np.array([s.current_waiting for s in stops]),
+            stop_route_ptr=ptr,
+            stop_route_idx=np.array([rid for m in members for rid in m], dtype=np.int64),
+            bus_route=np.array([b.route_id for b in buses], dtype=np.int64),
+            bus_capacity=np.array([b.capacity for b in buses], dtype=np.int64),
+            bus_load=np.array([b.current_load for b in buses], dtype=np.int64),
+        )
+
+def build_city_state() -> CityState:
+    return CityState.from_city(build_city())
+
 WEATHER_CONDITIONS = ["clear","cloudy","rain","heavy_rain","storm"]
 WEATHER_MULTIPLIER = {"clear":1.0,"cloudy":1.05,"rain":1.3,"heavy_rain":1.55,"storm":1.8}
 
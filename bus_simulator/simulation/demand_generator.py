@@ -2,13 +2,18 @@
 demand_generator.py
 Generates passenger demand and aggregates to route level.
 Compatible with current city.py structure.
+
+Steps are ticks of a TimeAxis (DEFAULT_AXIS: 96 × 15 min). The time-of-day
+profile, weather and events are one-day calendars in 15-minute slots that are
+resampled onto the axis once; demand stays a rate per 15-minute slot, as in
+the engine. Steps past the end of the axis raise IndexError.
 """
 
 import numpy as np
-from typing import Dict, List
-from simulation.city import Stop, Route, Bus, TIME_STEPS, RANDOM_SEED
-
-np.random.seed(RANDOM_SEED)
+from functools import lru_cache
+from simulation.city import CityState, TIME_STEPS, NUM_STOPS
+from simulation.events import EventIndex
+from simulation.timeaxis import TimeAxis, DEFAULT_AXIS
 
 # Weather multipliers (must match your train_model encoding)
 WEATHER_CONDITIONS = {
@@ -19,32 +24,36 @@ WEATHER_CONDITIONS = {
     "storm": 0.7,
 }
 
+# One day of weather in 15-minute slots
 WEATHER_SEQUENCE = list(WEATHER_CONDITIONS.keys()) * (TIME_STEPS // 5 + 1)
 WEATHER_SEQUENCE = WEATHER_SEQUENCE[:TIME_STEPS]
 
 
+@lru_cache(maxsize=None)
+def weather_sequence(axis: TimeAxis = DEFAULT_AXIS) -> tuple:
+    """Weather condition of every tick of `axis`."""
+    return tuple(axis.from_slots(WEATHER_SEQUENCE))
+
+
 # ----------------------------
 # Time of day demand multiplier
 # ----------------------------
-def time_of_day_multiplier(step: int) -> float:
-    hour = (step * 15) / 60
-
-    if 0 <= hour < 6:
-        return 0.1
-    elif 6 <= hour < 9:
-        return 1.8
-    elif 9 <= hour < 12:
-        return 0.9
-    elif 12 <= hour < 14:
-        return 1.1
-    elif 14 <= hour < 17:
-        return 0.85
-    elif 17 <= hour < 20:
-        return 1.9
-    elif 20 <= hour < 22:
-        return 0.7
-    else:
-        return 0.2
+# Hour boundaries and multipliers of the time-of-day profile:
+# TIME_OF_DAY_VALUES[i] applies from TIME_OF_DAY_BOUNDS[i-1] to TIME_OF_DAY_BOUNDS[i]
+TIME_OF_DAY_BOUNDS = [6, 9, 12, 14, 17, 20, 22]
+TIME_OF_DAY_VALUES = [0.1, 1.8, 0.9, 1.1, 0.85, 1.9, 0.7, 0.2]
+
+
+@lru_cache(maxsize=None)
+def time_of_day_profile(axis: TimeAxis = DEFAULT_AXIS) -> np.ndarray:
+    """(ticks,) time-of-day multiplier of every tick of `axis`."""
+    profile = axis.hourly_profile(TIME_OF_DAY_BOUNDS, TIME_OF_DAY_VALUES)
+    profile.flags.writeable = False
+    return profile
+
+
+def time_of_day_multiplier(step: int, axis: TimeAxis = DEFAULT_AXIS) -> float:
+    return float(time_of_day_profile(axis)[step])
 
 
 # ----------------------------
@@ -56,103 +65,87 @@ EVENTS = [
 ]
 
 
-def event_multiplier(step: int, stop_idx: int) -> float:
-    mult = 1.0
-    for event in EVENTS:
-        if event["start"] <= step < event["end"] and stop_idx in event["stops"]:
-            mult = max(mult, event["multiplier"])
-    return mult
+@lru_cache(maxsize=None)
+def event_index(num_stops: int = NUM_STOPS, axis: TimeAxis = DEFAULT_AXIS) -> EventIndex:
+    """EVENTS compiled over stop ids 0..num_stops-1 and the ticks of `axis` (built once per pair)."""
+    return EventIndex(axis.rescale_events(EVENTS), range(num_stops), axis.n_ticks)
+
+
+def event_multiplier(step: int, stop_idx: int, axis: TimeAxis = DEFAULT_AXIS) -> float:
+    return float(event_index(axis=axis).stop_multipliers(step)[stop_idx])
 
 
-def get_active_events(step: int):
-    return [e for e in EVENTS if e["start"] <= step < e["end"]]
+def get_active_events(step: int, axis: TimeAxis = DEFAULT_AXIS):
+    return event_index(axis=axis).active(step)
 
 
 # ----------------------------
 # Demand Generation
 # ----------------------------
-def generate_demand(stops: List[Stop], step: int) -> Dict[int, int]:
-    weather = WEATHER_SEQUENCE[step]
+def generate_demand(state: CityState, step: int, rng: np.random.Generator,
+                    axis: TimeAxis = DEFAULT_AXIS) -> np.ndarray:
+    """Draw demand for tick `step` of `axis` at every stop from `rng` and add it to the waiting counts."""
+    if not 0 <= step < axis.n_ticks:
+        raise IndexError(f"step {step} outside the {axis.n_ticks}-tick axis")
+    weather = weather_sequence(axis)[step]
     weather_mult = WEATHER_CONDITIONS[weather]
-    time_mult = time_of_day_multiplier(step)
+    time_mult = time_of_day_multiplier(step, axis)
+    evt_mult = event_index(state.num_stops, axis).stop_multipliers(step)
 
-    demand_map = {}
+    raw = state.stop_base_demand * time_mult * weather_mult * evt_mult
+    noise = rng.normal(0, raw * 0.1)
+    demand = np.maximum(0, (raw + noise).astype(np.int64))
 
-    for stop in stops:
-        evt_mult = event_multiplier(step, stop.stop_id)
-        raw = stop.base_demand * time_mult * weather_mult * evt_mult
-        noise = np.random.normal(0, raw * 0.1)
-        demand = max(0, int(raw + noise))
-
-        demand_map[stop.stop_id] = demand
-        stop.current_waiting += demand
-
-    return demand_map
+    state.stop_demand = demand
+    state.stop_waiting += demand
+    return demand
 
 
 # ----------------------------
 # Route Aggregation
 # ----------------------------
-def generate_route_demand(routes, demand_map):
-    """
-    Aggregate stop-level demand to route-level demand.
-    Works for routes as dict {route_id: Route}
-    """
-    route_demand = {}
-
-    for route_id, route in routes.items():
-        total = sum(
-            demand_map.get(stop_id, 0)
-            for stop_id in route.stops
-        )
-        route_demand[route_id] = total
-
-    return route_demand
+def generate_route_demand(state: CityState, demand: np.ndarray) -> np.ndarray:
+    """Aggregate stop-level demand to route-level demand (indexed by route_id)."""
+    return state.route_sum(demand).astype(np.int64)
 
 
 # ----------------------------
 # Bus Simulation
 # ----------------------------
-def simulate_bus_service(routes, buses, stops):
-    """
-    Simulate buses serving passengers.
-    routes: dict {route_id: Route}
-    buses: list of Bus
-    stops: list of Stop
+def simulate_bus_service(state: CityState) -> None:
     """
+    Simulate buses serving passengers, for every route at once.
 
-    for route_id, route in routes.items():
-
-        route_buses = [b for b in buses if b.route_id == route_id]
-
-        if not route_buses:
-            continue
-
-        total_capacity = sum(b.capacity for b in route_buses)
-        total_waiting = sum(stops[s].current_waiting for s in route.stops)
-
-        served = min(total_capacity, total_waiting)
-
-        # distribute load evenly
-        for bus in route_buses:
-            share = int(served / len(route_buses))
-            bus.current_load = min(bus.capacity, share)
-
-        # reduce waiting passengers proportionally
-        if total_waiting > 0:
-            for stop_id in route.stops:
-                stop = stops[stop_id]
-                reduction = int(served * (stop.current_waiting / total_waiting))
-                stop.current_waiting = max(0, stop.current_waiting - reduction)
-
-        # simulate passengers alighting
-        for bus in route_buses:
-            alight = int(bus.current_load * 0.4)
-            bus.current_load = max(0, bus.current_load - alight)
-
-def step_to_time(step: int) -> str:
-    """Convert simulation step (0–95) to HH:MM format."""
-    minutes = step * 15
-    h = minutes // 60
-    m = minutes % 60
-    return f"{int(h):02d}:{int(m):02d}"
\ No newline at end of file
+    Each route boards min(capacity, waiting) passengers, spread evenly over its
+    buses and taken from its stops in proportion to who is waiting there; then
+    40% of each bus load alights. Passengers at a stop shared by several routes
+    are split evenly between them, so every route can be served independently.
+    """
+    pair_stop, pair_route = state.pair_stop, state.stop_route_idx
+    routes_per_stop = np.maximum(np.diff(state.stop_route_ptr), 1)
+    pair_waiting = (state.stop_waiting / routes_per_stop)[pair_stop]
+
+    n_buses = state.route_num_buses()
+    total_capacity = state.route_capacity()
+    total_waiting = np.bincount(pair_route, weights=pair_waiting, minlength=state.num_routes)
+    served = np.minimum(total_capacity, total_waiting)
+
+    # distribute load evenly
+    share = (served / np.maximum(n_buses, 1)).astype(np.int64)
+    state.bus_load = np.minimum(state.bus_capacity, share[state.bus_route])
+
+    # reduce waiting passengers proportionally
+    waiting_r = total_waiting[pair_route]
+    share_of_route = np.divide(pair_waiting, waiting_r,
+                               out=np.zeros(len(pair_route)), where=waiting_r > 0)
+    reduction = (served[pair_route] * share_of_route).astype(np.int64)
+    state.stop_waiting = np.maximum(
+        0, state.stop_waiting - np.bincount(pair_stop, weights=reduction, minlength=state.num_stops)
+    )
+
+    # simulate passengers alighting
+    state.bus_load = state.bus_load - (state.bus_load * 0.4).astype(np.int64)
+
+def step_to_time(step: int, axis: TimeAxis = DEFAULT_AXIS) -> str:
+    """Convert a simulation step to HH:MM format (prefixed with the day on multi-day axes)."""
+    return axis.label(step)
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""
+downsample.py - Largest-Triangle-Three-Buckets (LTTB) downsampling for charts.
+
+LTTB keeps the first and last points and, from each of the buckets in
+between, the point forming the largest triangle with the point kept before it
+and the mean of the next bucket. Peaks and dips survive, so a week of
+1-minute data drawn at a few thousand points looks the same as the full series.
+"""
+
+import numpy as np
+from typing import Sequence
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Sorted indices of the `n_out` points LTTB keeps (all indices if the series is short)."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:  # no buckets: the last point, then the first
+        return np.array([0, n - 1][2 - max(n_out, 0):], dtype=np.int64)
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i == n_out - 3:
+            cx, cy = x[-1], y[-1]
+        else:
+            cx, cy = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample_indices(x: np.ndarray, ys: Sequence[np.ndarray], budget: int) -> np.ndarray:
+    """
+    Shared indices for several series on one x-axis: the union of each series'
+    LTTB points, splitting `budget` between them. Traces drawn from the same
+    indices stay aligned, which stacked fills and bands rely on.
+    """
+    n = len(x)
+    if n <= budget:
+        return np.arange(n)
+    per_series = max(3, budget // max(len(ys), 1))
+    return np.unique(np.concatenate([lttb(x, y, per_series) for y in ys]))
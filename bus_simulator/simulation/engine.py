@@ -0,0 +1,342 @@
+"""
+engine.py - Array engine behind the Pune network simulation.
+
+The whole (steps × stops) demand matrix is drawn in one go, aggregated to
+routes through a stop–route incidence matrix, and stop waits are derived with
+array ops. Only the rebalancing decisions are taken step by step.
+
+Steps are the ticks of a TimeAxis (96 × 15 min by default). Demand is always
+a rate in passengers per 15-minute slot, so utilization and wait formulas mean
+the same thing at every resolution.
+"""
+
+import numpy as np
+from typing import Dict, List, Optional
+
+from simulation.events import EventIndex
+from simulation.pune import (
+    PMPML_STOPS, ALL_ROUTES, PUNE_EVENTS, PUNE_WEATHER,
+    time_mult_profile, weather_mult_profile,
+)
+from simulation.result import SimulationResult
+from simulation.timeaxis import TimeAxis, DEFAULT_AXIS, SLOT_MINUTES
+from simulation.topology import Topology
+from optimization.rebalance import solve_reallocation, plan_lookahead, MOVE_COST
+
+VEHICLE_CAPACITY = {"bus": 50, "metro": 180}
+DEFAULT_FLEET = 6
+
+OVERLOAD_THRESHOLD = 0.82
+IDLE_THRESHOLD = 0.25
+MIN_FLEET_PER_ROUTE = 2
+MAX_MOVES_PER_STEP = 2
+DONOR_COOLDOWN_MIN = 60
+TARGET_COOLDOWN_MIN = 30
+LOOKAHEAD_MIN = 60  # forecast window of the lookahead rebalancer
+DEADHEAD_COST_PER_KM = 1.0  # passengers of relief a move must buy per km driven empty
+KM_PER_DEG = 111.0
+
+
+def compile_network(stops: Dict, routes: Dict, topology: Optional[Topology] = None) -> Dict:
+    """
+    Turn the stop/route dicts into the index arrays used by the kernels.
+    Pass the network's `topology` when it is already built, e.g. across many runs.
+    """
+    topology = topology or Topology.from_network(stops, routes)
+    stop_names, route_ids = topology.stop_names, topology.route_ids
+
+    # incidence[s, r] = how many times route r visits stop s
+    incidence = topology.incidence()
+    served = incidence > 0
+
+    frequency = np.array([routes[r]["frequency_min"] for r in route_ids], dtype=float)
+    coords = np.array([stops[s] for s in stop_names], dtype=float).reshape(-1, 2)
+    route_center = (incidence.T @ coords) / np.maximum(incidence.sum(axis=0), 1)[:, None]
+    return {
+        "stop_names": stop_names,
+        "route_ids": route_ids,
+        "stop_pos": topology.stop_id,
+        "topology": topology,
+        "incidence": incidence,
+        "served": served,
+        "num_serving": topology.num_serving(),
+        "min_frequency": np.where(served, frequency, np.inf).min(axis=1),
+        "vehicle_capacity": np.array(
+            [VEHICLE_CAPACITY.get(routes[r]["type"], VEHICLE_CAPACITY["bus"]) for r in route_ids]
+        ),
+        "initial_fleet": np.array(
+            [routes[r].get("buses", routes[r].get("trains", DEFAULT_FLEET)) for r in route_ids]
+        ),
+        "route_center": route_center,
+    }
+
+
+def draw_stop_demand(rng, net: Dict, time_mult: np.ndarray, weather_mult: np.ndarray,
+                     event_mult: np.ndarray) -> np.ndarray:
+    """Draw the full (steps × stops) passenger demand matrix from per-step profiles."""
+    shape = (len(time_mult), len(net["stop_names"]))
+    base = rng.integers(15, 60, size=shape)
+    noise = rng.normal(0, 0.08, size=shape)
+    raw = base * time_mult[:, None] * weather_mult[:, None] * event_mult * (1 + noise)
+    return np.maximum(0, raw.astype(np.int64))
+
+
+def rebalance_greedy(route_demand: np.ndarray, net: Dict, on_move=None,
+                     tick_minutes: int = SLOT_MINUTES):
+    """
+    Sequential greedy rebalancing over a precomputed (steps × routes) demand matrix.
+    Each step moves up to MAX_MOVES_PER_STEP vehicles from the idlest route to the
+    most overloaded one, honouring cooldowns (in minutes) and the per-route fleet floor.
+
+    Returns (bus_counts, route_capacity) as (steps × routes) arrays.
+    """
+    n_steps, n_routes = route_demand.shape
+    cap_v = net["vehicle_capacity"]
+    counts = net["initial_fleet"].copy()
+    cooldown = np.zeros(n_routes, dtype=np.int64)
+    donor_cooldown = max(1, DONOR_COOLDOWN_MIN // tick_minutes)
+    target_cooldown = max(1, TARGET_COOLDOWN_MIN // tick_minutes)
+    bus_counts = np.empty((n_steps, n_routes), dtype=np.int64)
+    capacity = np.empty((n_steps, n_routes), dtype=np.int64)
+
+    for t in range(n_steps):
+        cap = counts * cap_v
+        cooldown = np.maximum(cooldown - 1, 0)
+        for _ in range(MAX_MOVES_PER_STEP):
+            util = route_demand[t] / np.maximum(cap, 1)
+            ready = cooldown == 0
+            overloaded = np.flatnonzero((util > OVERLOAD_THRESHOLD) & ready)
+            idle = np.flatnonzero((util < IDLE_THRESHOLD) & (counts > MIN_FLEET_PER_ROUTE) & ready)
+            if not overloaded.size or not idle.size:
+                break
+            tr = overloaded[np.argmax(util[overloaded])]
+            dr = idle[np.argmin(util[idle])]
+            counts[dr] -= 1
+            counts[tr] += 1
+            cooldown[dr] = donor_cooldown
+            cooldown[tr] = target_cooldown
+            cap[tr] = counts[tr] * cap_v[tr]
+            if on_move is not None:
+                on_move(t, dr, tr, util[tr])
+        bus_counts[t] = counts
+        capacity[t] = cap
+    return bus_counts, capacity
+
+
+def deadhead_km(net: Dict) -> np.ndarray:
+    """(routes × routes) approximate km between route centroids."""
+    center = net["route_center"]
+    scale = np.array([KM_PER_DEG, KM_PER_DEG * np.cos(np.radians(center[:, 0].mean() if len(center) else 0))])
+    diff = (center[:, None, :] - center[None, :, :]) * scale
+    return np.sqrt((diff ** 2).sum(axis=-1))
+
+
+def _rebalance_loop(route_demand: np.ndarray, net: Dict, plan_step, on_move=None,
+                    tick_minutes: int = SLOT_MINUTES):
+    """
+    Step loop shared by the array rebalancers: ticks cooldowns, asks
+    plan_step(t, counts, ready) for (donor, target) moves and applies them.
+    """
+    n_steps, n_routes = route_demand.shape
+    cap_v = net["vehicle_capacity"]
+    counts = net["initial_fleet"].copy()
+    cooldown = np.zeros(n_routes, dtype=np.int64)
+    donor_cooldown = max(1, DONOR_COOLDOWN_MIN // tick_minutes)
+    target_cooldown = max(1, TARGET_COOLDOWN_MIN // tick_minutes)
+    bus_counts = np.empty((n_steps, n_routes), dtype=np.int64)
+    capacity = np.empty((n_steps, n_routes), dtype=np.int64)
+
+    for t in range(n_steps):
+        cooldown = np.maximum(cooldown - 1, 0)
+        util = route_demand[t] / np.maximum(counts * cap_v, 1)
+        for dr, tr in plan_step(t, counts, cooldown == 0):
+            counts[dr] -= 1
+            counts[tr] += 1
+            cooldown[dr] = donor_cooldown
+            cooldown[tr] = target_cooldown
+            if on_move is not None:
+                on_move(t, dr, tr, util[tr])
+        bus_counts[t] = counts
+        capacity[t] = counts * cap_v
+    return bus_counts, capacity
+
+
+def rebalance_assignment(route_demand: np.ndarray, net: Dict, on_move=None,
+                         tick_minutes: int = SLOT_MINUTES):
+    """
+    Same contract as rebalance_greedy, but every step is solved over all routes
+    at once by solve_reallocation (assignment with cooldowns, the fleet floor,
+    MAX_MOVES_PER_STEP and a time budget); moves are priced by deadhead distance.
+    """
+    move_cost = MOVE_COST + DEADHEAD_COST_PER_KM * deadhead_km(net)
+
+    def plan_step(t, counts, ready):
+        return solve_reallocation(
+            route_demand[t], counts, net["vehicle_capacity"], ready,
+            min_fleet=MIN_FLEET_PER_ROUTE, max_moves=MAX_MOVES_PER_STEP,
+            target_util=OVERLOAD_THRESHOLD, move_cost=move_cost,
+        )
+    return _rebalance_loop(route_demand, net, plan_step, on_move, tick_minutes)
+
+
+def forecast_window(route_demand_now: np.ndarray, profile: np.ndarray, t: int, horizon: int) -> np.ndarray:
+    """
+    (≤ horizon × routes) demand forecast for steps t..t+horizon-1: the
+    observed demand at t carried forward along the expected route profile
+    (time of day × weather × event calendar), all routes in one batch.
+    """
+    window = profile[t:t + horizon]
+    return route_demand_now * window / np.maximum(profile[t], 1e-9)
+
+
+def rebalance_lookahead(route_demand: np.ndarray, net: Dict, on_move=None,
+                        tick_minutes: int = SLOT_MINUTES):
+    """
+    Rolling-horizon rebalancer: each step forecasts the next LOOKAHEAD_MIN
+    minutes once (forecast_window over net["demand_profile"]) and lets
+    plan_lookahead pick the moves that minimize discounted overload across
+    that window, so buses are in place before a peak instead of after it.
+    """
+    horizon = max(1, LOOKAHEAD_MIN // tick_minutes) + 1
+    move_cost = MOVE_COST + DEADHEAD_COST_PER_KM * deadhead_km(net)
+    profile = net["demand_profile"]
+
+    def plan_step(t, counts, ready):
+        window = forecast_window(route_demand[t], profile, t, horizon)
+        return plan_lookahead(
+            window, counts, net["vehicle_capacity"], ready,
+            min_fleet=MIN_FLEET_PER_ROUTE, max_moves=MAX_MOVES_PER_STEP,
+            target_util=OVERLOAD_THRESHOLD, move_cost=move_cost,
+        )
+    return _rebalance_loop(route_demand, net, plan_step, on_move, tick_minutes)
+
+
+REBALANCERS = {
+    "greedy": rebalance_greedy,
+    "assignment": rebalance_assignment,
+    "lookahead": rebalance_lookahead,
+}
+
+
+def stop_wait_matrix(stop_demand: np.ndarray, bus_counts: np.ndarray,
+                     route_capacity: np.ndarray, net: Dict) -> np.ndarray:
+    """(steps × stops) expected wait in minutes; NaN where no route serves the stop."""
+    served = net["served"].astype(float)
+    n_srv = net["num_serving"]
+    vehicles = bus_counts @ served.T
+    headway = np.minimum(60 / np.maximum(vehicles, 1), net["min_frequency"] * 2)
+    cap = (route_capacity @ served.T) / np.maximum(n_srv, 1)
+    lf = np.minimum(stop_demand / np.maximum(cap, 1), 1.5)
+    wait = np.round(headway / 2 * (1 + lf * 0.5), 1)
+    wait[:, n_srv == 0] = np.nan
+    return wait
+
+
+def simulate_network(seed=42, stops: Dict = PMPML_STOPS, routes: Dict = ALL_ROUTES,
+                     events: List[Dict] = PUNE_EVENTS, weather: List[str] = PUNE_WEATHER,
+                     axis: TimeAxis = DEFAULT_AXIS, rebalancer="greedy",
+                     topology: Optional[Topology] = None) -> Dict:
+    """
+    Run one realization of the network and return its raw arrays.
+    `seed` is anything np.random.default_rng accepts (int or SeedSequence);
+    `events` and `weather` are one-day calendars in 15-minute slots, repeated over the axis.
+    `rebalancer` is a REBALANCERS key or a function with rebalance_greedy's signature.
+    `topology` is the network's prebuilt Topology (built here if not given).
+    """
+    rebalance = REBALANCERS[rebalancer] if isinstance(rebalancer, str) else rebalancer
+    rng = np.random.default_rng(seed)
+    net = compile_network(stops, routes, topology)
+    topology = net["topology"]
+    calendar = EventIndex(axis.rescale_events(events), net["stop_names"], axis.n_ticks,
+                          route_stops=[topology.stops_on(rid) for rid in net["route_ids"]])
+    em = calendar.multiplier_matrix()
+
+    tm, wm = time_mult_profile(axis), weather_mult_profile(axis, weather)
+    stop_demand = draw_stop_demand(rng, net, tm, wm, em)
+    route_demand = stop_demand @ net["incidence"]
+    # Expected shape of route demand over the horizon (no noise), for forecasting
+    net["demand_profile"] = (tm * wm)[:, None] * (em @ net["incidence"])
+
+    moves = []
+    bus_counts, route_capacity = rebalance(
+        route_demand, net, on_move=lambda t, dr, tr, u: moves.append((t, dr, tr, u)),
+        tick_minutes=axis.tick_minutes,
+    )
+    stop_wait = stop_wait_matrix(stop_demand, bus_counts, route_capacity, net)
+
+    return {
+        "net": net,
+        "stop_demand": stop_demand,
+        "route_demand": route_demand,
+        "bus_counts": bus_counts,
+        "route_capacity": route_capacity,
+        "stop_wait": stop_wait,
+        "moves": moves,
+        "events": calendar,
+    }
+
+
+def run_network_simulation(seed=42, stops: Dict = PMPML_STOPS, routes: Dict = ALL_ROUTES,
+                           events: List[Dict] = PUNE_EVENTS, weather: List[str] = PUNE_WEATHER,
+                           axis: TimeAxis = DEFAULT_AXIS, rebalancer="greedy",
+                           topology: Optional[Topology] = None):
+    """
+    Simulate the network and return (result, rebalance_log, summary) for the
+    dashboard. result is a columnar SimulationResult; result[t] reads like the
+    old per-step history dict.
+    """
+    sim = simulate_network(seed, stops, routes, events, weather, axis, rebalancer, topology)
+    n_steps = axis.n_ticks
+    weather = axis.from_slots(weather)
+    net = sim["net"]
+    stop_names, route_ids = net["stop_names"], net["route_ids"]
+    rd, cap, sw = sim["route_demand"], sim["route_capacity"], sim["stop_wait"]
+    step_events = [[e["name"] for e in sim["events"].active(t)] for t in range(n_steps)]
+
+    rebalance_log = []
+    for t, dr, tr, tu in sim["moves"]:
+        frm, to = route_ids[dr], route_ids[tr]
+        rebalance_log.append({
+            "step": t, "time": axis.label(t), "hour": axis.hour(t),
+            "from_route": frm, "from_name": routes[frm]["name"],
+            "to_route": to, "to_name": routes[to]["name"],
+            "reason": f"{routes[to]['name']} at {tu*100:.0f}% capacity",
+            "weather": weather[t], "events": step_events[t],
+            "severity": "critical" if tu > 0.95 else "warning",
+        })
+
+    avg_wait = np.round(np.nanmean(sw, axis=1), 2)
+    total_demand = rd.sum(axis=1)
+    total_capacity = cap.sum(axis=1)
+    utilization = np.round(total_demand / np.maximum(total_capacity, 1), 3)
+    overcrowded = (rd > cap * 0.85).sum(axis=1)
+    idle = (rd < cap * 0.2).sum(axis=1)
+
+    result = SimulationResult(
+        axis=axis, stop_names=stop_names, route_ids=route_ids,
+        weather=weather, events=step_events,
+        stop_demand=sim["stop_demand"].astype(np.int32),
+        stop_wait=sw,
+        route_demand=rd.astype(np.int32),
+        route_capacity=cap.astype(np.int32),
+        bus_counts=sim["bus_counts"].astype(np.int32),
+        avg_wait_min=avg_wait,
+        overcrowded_routes=overcrowded.astype(np.int32),
+        idle_routes=idle.astype(np.int32),
+        total_demand=total_demand,
+        total_capacity=total_capacity,
+        utilization=utilization,
+    )
+
+    served = net["num_serving"] > 0
+    stop_avg = np.round(sw.mean(axis=0), 1)
+    avg_w = float(avg_wait.mean())
+    summary = {
+        "avg_wait_min": round(avg_w, 1),
+        "baseline_wait_min": round(avg_w*1.35, 1),
+        "total_rebalances": len(rebalance_log),
+        "total_demand_today": int(total_demand.sum() * axis.tick_minutes / SLOT_MINUTES),
+        "avg_utilization": round(float(utilization.mean())*100, 1),
+        "stop_avg_wait": {s: float(w) for s, w, ok in zip(stop_names, stop_avg, served) if ok},
+    }
+    return result, rebalance_log, summary
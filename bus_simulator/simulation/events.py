@@ -0,0 +1,192 @@
+"""
+events.py - Event calendar index shared by demand generation, training and the engine.
+
+An event spans steps [start, end), lists its "peak_steps", or gives its
+"intervals" directly; all are compiled to intervals once. Small calendars are expanded into a dense
+(steps × stops) multiplier array and a (steps × stops) mask; large sparse ones
+keep a centred interval tree, which answers "what is active at step t" in
+O(log n + hits) without any dense array.
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+# Above this many (step, stop) cells the index stays sparse unless told otherwise
+DENSE_CELL_LIMIT = 5_000_000
+
+
+def event_intervals(event: Dict) -> List[tuple]:
+    """[start, end) step intervals of one event."""
+    if "intervals" in event:
+        return [tuple(iv) for iv in event["intervals"]]
+    if "start" in event:
+        return [(event["start"], event["end"])]
+    steps = sorted(set(event["peak_steps"]))
+    runs, start = [], None
+    for prev, step in zip([None] + steps, steps):
+        if prev is None or step != prev + 1:
+            if start is not None:
+                runs.append((start, prev + 1))
+            start = step
+    if start is not None:
+        runs.append((start, steps[-1] + 1))
+    return runs
+
+
+class _IntervalTree:
+    """
+    Centred interval tree over [start, end) intervals tagged with an event id.
+
+    Each node keeps the intervals containing its centre twice, sorted by start
+    and by end; the rest go to the left or right subtree. A point query visits
+    one node per level and only reads intervals that contain the point.
+    """
+
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, intervals: List[tuple]):
+        points = sorted(p for start, end, _ in intervals for p in (start, end - 1))
+        self.center = points[len(points) // 2]
+        here, left, right = [], [], []
+        for iv in intervals:
+            if iv[1] <= self.center:
+                left.append(iv)
+            elif iv[0] > self.center:
+                right.append(iv)
+            else:
+                here.append(iv)
+        self.by_start = sorted(here, key=lambda iv: iv[0])
+        self.by_end = sorted(here, key=lambda iv: -iv[1])
+        self.left = _IntervalTree(left) if left else None
+        self.right = _IntervalTree(right) if right else None
+
+    def stab(self, point: int, out: set) -> None:
+        """Add the ids of intervals containing `point` to `out`."""
+        node = self
+        while node is not None:
+            if point < node.center:
+                for start, _, i in node.by_start:
+                    if start > point:
+                        break
+                    out.add(i)
+                node = node.left
+            else:
+                for _, end, i in node.by_end:
+                    if end <= point:
+                        break
+                    out.add(i)
+                node = node.right
+
+
+class EventIndex:
+    """
+    Compiled event calendar.
+
+    Args:
+        events: list of event dicts with "stops", "multiplier" and one of
+            "start"/"end", "peak_steps" or "intervals"
+        stop_keys: the stop identifiers events refer to (ids or names), in column order
+        n_steps: length of the time axis
+        route_stops: stop keys of every route, needed for route_mask / route_mask_at
+        dense: force the dense or sparse layout (default: by DENSE_CELL_LIMIT)
+    """
+
+    def __init__(self, events: List[Dict], stop_keys: Sequence, n_steps: int,
+                 route_stops: Optional[Sequence[Sequence]] = None, dense: Optional[bool] = None):
+        self.events = list(events)
+        self.n_steps = n_steps
+        self.num_stops = len(stop_keys)
+        stop_pos = {k: i for i, k in enumerate(stop_keys)}
+
+        self.event_stops = [
+            np.array(sorted({stop_pos[s] for s in e["stops"] if s in stop_pos}), dtype=np.int64)
+            for e in self.events
+        ]
+        self.event_mult = np.array([e["multiplier"] for e in self.events], dtype=float)
+
+        intervals = sorted(
+            (max(start, 0), min(end, n_steps), i)
+            for i, e in enumerate(self.events)
+            for start, end in event_intervals(e)
+            if start < n_steps and end > 0
+        )
+        nonempty = [iv for iv in intervals if iv[0] < iv[1]]
+        self._tree = _IntervalTree(nonempty) if nonempty else None
+
+        self.route_incidence = None
+        if route_stops is not None:
+            self.route_incidence = np.zeros((self.num_stops, len(route_stops)), dtype=bool)
+            for r, stops in enumerate(route_stops):
+                self.route_incidence[[stop_pos[s] for s in stops if s in stop_pos], r] = True
+
+        if dense is None:
+            dense = n_steps * self.num_stops <= DENSE_CELL_LIMIT
+        self.dense = dense
+        self._mult = self._mask = None
+        if dense:
+            self._mult = np.ones((n_steps, self.num_stops))
+            self._mask = np.zeros((n_steps, self.num_stops), dtype=bool)
+            for (start, end, i) in intervals:
+                cols = self.event_stops[i]
+                block = self._mult[start:end, cols]
+                self._mult[start:end, cols] = np.maximum(block, self.event_mult[i])
+                self._mask[start:end, cols] = True
+            self._mult.flags.writeable = False
+            self._mask.flags.writeable = False
+
+    # ----------------------------
+    # Per-step queries
+    # ----------------------------
+    def active_ids(self, step: int) -> List[int]:
+        """Ids of events active at `step`, in calendar order."""
+        hits = set()
+        if self._tree is not None:
+            self._tree.stab(step, hits)
+        return sorted(hits)
+
+    def active(self, step: int) -> List[Dict]:
+        return [self.events[i] for i in self.active_ids(step)]
+
+    def stop_multipliers(self, step: int) -> np.ndarray:
+        """(stops,) strongest active multiplier per stop (1.0 when none)."""
+        if self.dense:
+            return self._mult[step]
+        mult = np.ones(self.num_stops)
+        for i in self.active_ids(step):
+            cols = self.event_stops[i]
+            mult[cols] = np.maximum(mult[cols], self.event_mult[i])
+        return mult
+
+    def stop_mask(self, step: int) -> np.ndarray:
+        """(stops,) True where any event is active."""
+        if self.dense:
+            return self._mask[step]
+        mask = np.zeros(self.num_stops, dtype=bool)
+        for i in self.active_ids(step):
+            mask[self.event_stops[i]] = True
+        return mask
+
+    def _require_routes(self) -> np.ndarray:
+        if self.route_incidence is None:
+            raise ValueError("EventIndex was built without route_stops; route masks need them")
+        return self.route_incidence
+
+    def route_mask_at(self, step: int) -> np.ndarray:
+        """(routes,) True where an active event touches any stop of the route."""
+        return self.stop_mask(step) @ self._require_routes()
+
+    # ----------------------------
+    # Whole-horizon arrays
+    # ----------------------------
+    def multiplier_matrix(self) -> np.ndarray:
+        """(steps × stops) event multipliers."""
+        if self.dense:
+            return self._mult
+        return np.stack([self.stop_multipliers(t) for t in range(self.n_steps)])
+
+    def route_mask(self) -> np.ndarray:
+        """(steps × routes) event mask."""
+        incidence = self._require_routes()
+        if self.dense:
+            return self._mask @ incidence
+        return np.stack([self.route_mask_at(t) for t in range(self.n_steps)])
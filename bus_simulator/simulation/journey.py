@@ -0,0 +1,164 @@
+"""
+journey.py - Transfer-aware journey planner (frequency-based RAPTOR).
+
+JourneyPlanner is built once from the stop/route dicts. Each route is run as
+two patterns, one per direction, and each pattern stores its stop sequence and
+cumulative in-vehicle minutes (distance at the mode's speed plus a dwell per
+stop). Queries run RAPTOR rounds: round k finds the earliest arrival at every
+stop using k + 1 vehicles. Only patterns through a stop improved in the
+previous round are scanned, and arrivals no better than the best known for
+that stop or the destination are pruned.
+
+There is no timetable. Boarding a vehicle costs the live wait at the stop (the
+engine's stop_wait for the current step), and a transfer adds
+TRANSFER_PENALTY_MIN on top. plan() returns the Pareto set: the fastest
+itinerary for each number of transfers that beats all itineraries with fewer.
+"""
+
+import math
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from simulation.topology import Topology
+
+SPEED_KMH = {"bus": 18.0, "metro": 35.0}
+DWELL_MIN = 0.5              # per intermediate stop
+TRANSFER_PENALTY_MIN = 3.0   # walking between stands/platforms on top of the wait
+MAX_TRANSFERS = 2
+KM_PER_DEG = 111.0
+
+
+@dataclass
+class Leg:
+    route_id: str
+    board: str
+    alight: str
+    n_stops: int
+    reverse: bool       # travelling against the route's listed stop order
+    wait_min: float
+    ride_min: float
+
+
+@dataclass
+class Itinerary:
+    legs: List[Leg]
+    total_min: float
+
+    @property
+    def transfers(self) -> int:
+        return len(self.legs) - 1
+
+
+def _hop_km(a, b) -> float:
+    dlat = (b[0] - a[0]) * KM_PER_DEG
+    dlon = (b[1] - a[1]) * KM_PER_DEG * math.cos(math.radians((a[0] + b[0]) / 2))
+    return math.hypot(dlat, dlon)
+
+
+class JourneyPlanner:
+    def __init__(self, stops: Dict, routes: Dict, topology: Optional[Topology] = None):
+        topology = topology or Topology.from_network(stops, routes)
+        self.stop_names = topology.stop_names
+        self.stop_id = topology.stop_id
+        self.pattern_route: List[str] = []
+        self.pattern_reverse: List[bool] = []
+        self.pattern_stops: List[List[int]] = []
+        self.pattern_cum: List[List[float]] = []   # minutes from the pattern's first stop
+        self.stop_patterns: List[List[tuple]] = [[] for _ in self.stop_names]  # (pattern, position)
+
+        for r, rid in enumerate(topology.route_ids):
+            seq = topology.route_stops(r).tolist()
+            if len(seq) < 2:
+                continue
+            speed = SPEED_KMH.get(routes[rid]["type"], SPEED_KMH["bus"])
+            for reverse, order in ((False, seq), (True, seq[::-1])):
+                cum = [0.0]
+                for a, b in zip(order, order[1:]):
+                    hop = _hop_km(stops[self.stop_names[a]], stops[self.stop_names[b]]) / speed * 60
+                    cum.append(cum[-1] + hop + DWELL_MIN)
+                p = len(self.pattern_stops)
+                self.pattern_route.append(rid)
+                self.pattern_reverse.append(reverse)
+                self.pattern_stops.append(order)
+                self.pattern_cum.append(cum)
+                for i, s in enumerate(order):
+                    self.stop_patterns[s].append((p, i))
+
+    @classmethod
+    def from_network(cls, stops: Dict, routes: Dict, topology: Optional[Topology] = None) -> "JourneyPlanner":
+        return cls(stops, routes, topology)
+
+    def _waits(self, stop_wait) -> List[float]:
+        """Per-stop boarding wait from a name → minutes mapping or a (stops,) array; missing/NaN → 0."""
+        if isinstance(stop_wait, Mapping):
+            waits = [stop_wait.get(s) for s in self.stop_names]
+            return [0.0 if w is None else float(w) for w in waits]
+        return np.nan_to_num(np.asarray(stop_wait, dtype=float)).tolist()
+
+    def plan(self, origin: str, dest: str, stop_wait, max_transfers: int = MAX_TRANSFERS) -> List[Itinerary]:
+        """Pareto-optimal itineraries from `origin` to `dest`, fewest transfers first ([] if unreachable)."""
+        o, d = self.stop_id[origin], self.stop_id[dest]
+        if o == d:
+            return []
+        wait = self._waits(stop_wait)
+        inf = math.inf
+        best = [inf] * len(self.stop_names)   # best arrival over all rounds so far
+        prev = list(best)
+        prev[o] = best[o] = 0.0
+        marked = {o}
+        parents = []                          # per round: stop → (pattern, board pos, alight pos)
+        itineraries = []
+
+        for k in range(max_transfers + 1):
+            queue = {}
+            for s in marked:
+                for p, i in self.stop_patterns[s]:
+                    if i < queue.get(p, len(self.pattern_stops[p])):
+                        queue[p] = i
+            penalty = TRANSFER_PENALTY_MIN if k else 0.0
+            cur = list(prev)
+            parent = {}
+            marked = set()
+            for p, start in queue.items():
+                stops, cum = self.pattern_stops[p], self.pattern_cum[p]
+                board, base = None, inf       # base = departure time - cum at boarding
+                for i in range(start, len(stops)):
+                    s = stops[i]
+                    if board is not None:
+                        arr = base + cum[i]
+                        if arr < best[s] and arr < best[d]:
+                            cur[s] = best[s] = arr
+                            parent[s] = (p, board, i)
+                            marked.add(s)
+                    if prev[s] < inf:
+                        dep = prev[s] + wait[s] + penalty - cum[i]
+                        if dep < base:
+                            board, base = i, dep
+            parents.append(parent)
+            if d in parent:
+                itineraries.append(self._trace(parents, k, o, d, wait, cur[d]))
+            if not marked:
+                break
+            prev = cur
+        return itineraries
+
+    def _trace(self, parents, k: int, origin: int, s: int, wait: List[float], total: float) -> Itinerary:
+        """Walk parent pointers back from stop `s` in round `k` to the origin."""
+        legs = []
+        while s != origin:
+            while s not in parents[k]:        # label carried over from an earlier round
+                k -= 1
+            p, bi, ai = parents[k][s]
+            stops, cum = self.pattern_stops[p], self.pattern_cum[p]
+            b = stops[bi]
+            legs.append(Leg(
+                route_id=self.pattern_route[p],
+                board=self.stop_names[b], alight=self.stop_names[s],
+                n_stops=ai - bi, reverse=self.pattern_reverse[p],
+                wait_min=round(wait[b], 1), ride_min=round(cum[ai] - cum[bi], 1),
+            ))
+            s, k = b, k - 1
+        return Itinerary(legs=legs[::-1], total_min=round(total, 1))
@@ -0,0 +1,193 @@
+"""
+map_layers.py - GeoJSON layers for the dashboard maps.
+
+Route and stop geometry never changes during a run, so it is built once as
+static FeatureCollections (route_geometry, stop_geometry) and cached by the
+app. Each rerun only derives light per-step layers from them: the features
+are shallow copies that share the cached geometry and carry the step's style
+properties (utilization, wait colour, demand radius, tooltip) for the map's
+style function.
+
+For playback mode, stop_timeline and heatmap_frames serialize a whole
+SimulationResult into one time-indexed layer each (for folium's
+TimestampedGeoJson and HeatMapWithTime), so scrubbing through the day happens
+in the browser without rerunning the script.
+
+Coordinates follow GeoJSON order, [lon, lat]; the network dicts store [lat, lon].
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from simulation.topology import Topology
+
+# (upper bound on wait in minutes, colour, label) — first band the wait falls under
+WAIT_BANDS = [
+    (8, "#10b981", "Good"),
+    (15, "#f59e0b", "Moderate"),
+    (20, "#f97316", "High"),
+    (float("inf"), "#ef4444", "Critical"),
+]
+
+PLAYBACK_EPOCH = datetime(2024, 1, 1)  # arbitrary day the playback clock starts on
+HEATMAP_SCALE = 300                    # passengers per step at full heat
+
+
+def _lonlat(latlon):
+    return [latlon[1], latlon[0]]
+
+
+def wait_band(wait: float):
+    """(colour, label) for a stop wait in minutes."""
+    for bound, color, status in WAIT_BANDS:
+        if wait < bound:
+            return color, status
+
+
+def route_geometry(stops: Dict, routes: Dict, topology: Topology) -> Dict:
+    """Static LineString per route (routes with fewer than two known stops are left out)."""
+    features = []
+    for rid, rd in routes.items():
+        coords = [_lonlat(stops[s]) for s in topology.stops_on(rid)]
+        if len(coords) < 2:
+            continue
+        features.append({
+            "type": "Feature", "id": rid,
+            "geometry": {"type": "LineString", "coordinates": coords},
+            "properties": {"route_id": rid, "name": rd["name"], "color": rd["color"], "type": rd["type"]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def stop_geometry(stops: Dict) -> Dict:
+    """Static Point per stop."""
+    return {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "id": name,
+         "geometry": {"type": "Point", "coordinates": _lonlat(latlon)},
+         "properties": {"name": name}}
+        for name, latlon in stops.items()
+    ]}
+
+
+def _with(feature: Dict, **props) -> Dict:
+    """Copy of a feature sharing its geometry, with extra properties."""
+    return {**feature, "properties": {**feature["properties"], **props}}
+
+
+def route_layer(base: Dict, snapshot, route_ids: Optional[Iterable[str]] = None) -> Dict:
+    """Per-step route lines: utilization and tooltip, optionally limited to `route_ids`."""
+    keep = None if route_ids is None else set(route_ids)
+    features = []
+    for f in base["features"]:
+        rid = f["id"]
+        if keep is not None and rid not in keep:
+            continue
+        util = snapshot["route_demand"].get(rid, 0) / max(snapshot["route_capacity"].get(rid, 1), 1)
+        features.append(_with(f, util=round(util, 3),
+                              tooltip=f"{f['properties']['name']} — {util*100:.0f}% utilization"))
+    return {"type": "FeatureCollection", "features": features}
+
+
+def stop_layer(base: Dict, snapshot, names: Optional[Iterable[str]] = None) -> Dict:
+    """
+    Per-step stop markers for served stops: wait colour, a radius that grows
+    with demand, and a tooltip. Optionally limited to `names`.
+    """
+    keep = None if names is None else set(names)
+    features = []
+    for f in base["features"]:
+        stop = f["id"]
+        if keep is not None and stop not in keep:
+            continue
+        wait = snapshot["stop_wait"].get(stop)
+        if wait is None:
+            continue
+        demand = snapshot["stop_demand"].get(stop, 0)
+        color, status = wait_band(wait)
+        features.append(_with(f, wait=wait, demand=demand, color=color, status=status,
+                              radius=6 + min(demand // 40, 6),
+                              tooltip=f"<b>{stop}</b><br>Wait: {wait} min ({status})<br>Demand: {demand} pax"))
+    return {"type": "FeatureCollection", "features": features}
+
+
+def vehicle_layer(stops: Dict, routes: Dict, topology: Topology, snapshot,
+                  vehicle_type: str, route_ids: Optional[Iterable[str]] = None) -> Dict:
+    """
+    Per-step vehicle icons of one type ("bus" or "metro"): each route's fleet is
+    spread evenly over its stops, one icon per bus.
+    """
+    keep = None if route_ids is None else set(route_ids)
+    features = []
+    for rid, rd in routes.items():
+        if rd["type"] != vehicle_type or (keep is not None and rid not in keep):
+            continue
+        stops_list = topology.stops_on(rid)
+        if len(stops_list) < 2:
+            continue
+        n = snapshot["bus_counts"].get(rid, 2)
+        interval = max(1, len(stops_list) // max(n, 1))
+        for i, stop in enumerate(stops_list):
+            if i % interval == interval // 2:
+                features.append({"type": "Feature",
+                                 "geometry": {"type": "Point", "coordinates": _lonlat(stops[stop])},
+                                 "properties": {"route_id": rid}})
+    return {"type": "FeatureCollection", "features": features}
+
+
+# ----------------------------
+# Playback (client-side time scrubbing)
+# ----------------------------
+def playback_times(axis, start: datetime = PLAYBACK_EPOCH) -> List[str]:
+    """Local ISO timestamp of each step, as read by the browser's time slider."""
+    return [(start + timedelta(minutes=m)).isoformat(timespec="minutes") for m in axis.minutes().tolist()]
+
+
+def stop_timeline(stops: Dict, result, start: datetime = PLAYBACK_EPOCH) -> Dict:
+    """
+    Stop markers for every step of `result`, for TimestampedGeoJson.
+
+    A marker that keeps the same colour and radius over several steps is one
+    MultiPoint feature listing those steps' times, so the payload grows with
+    the number of style changes rather than steps × stops.
+    """
+    times = playback_times(result.axis, start)
+    waits, demand = result.stop_wait, result.stop_demand
+    radius = 6 + np.minimum(demand // 40, 6)
+    band = np.searchsorted([b for b, _, _ in WAIT_BANDS[:-1]], waits, side="right")
+    features = []
+    for s, stop in enumerate(result.stop_names):
+        served = ~np.isnan(waits[:, s])
+        groups = {}
+        for t in np.flatnonzero(served).tolist():
+            groups.setdefault((int(band[t, s]), int(radius[t, s])), []).append(t)
+        lonlat = _lonlat(stops[stop])
+        for (b, r), steps in groups.items():
+            _, color, status = WAIT_BANDS[b]
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "MultiPoint", "coordinates": [lonlat] * len(steps)},
+                "properties": {
+                    "times": [times[t] for t in steps],
+                    "icon": "circle",
+                    "iconstyle": {"fillColor": color, "fillOpacity": 0.9, "color": "white",
+                                  "weight": 1.5, "radius": r},
+                    "popup": f"<b>{stop}</b><br>{status} wait",
+                },
+            })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def heatmap_frames(stops: Dict, result):
+    """
+    Per-step [lat, lon, weight] lists for HeatMapWithTime (stops with no demand
+    left out) and the matching step labels.
+    """
+    coords = np.array([stops[s] for s in result.stop_names], dtype=float)
+    weight = np.round(result.stop_demand / HEATMAP_SCALE, 3)
+    frames = []
+    for row in weight:
+        nz = np.flatnonzero(row > 0)
+        frames.append(np.column_stack([coords[nz], row[nz]]).tolist())
+    return frames, [result.axis.label(t) for t in range(result.num_steps)]
@@ -7,10 +7,39 @@ Metrics:
   - Idle bus percentage (buses under 20% utilization)
   - Passenger frustration index (composite score 0-100)
   - % improvement vs baseline
+
+compute_all_metrics and compute_per_step_metrics run on the columnar engine
+below: snapshots are turned into (steps × routes) arrays once and every
+metric is computed from them with array ops. score_scenarios takes the arrays
+directly, with any number of leading scenario axes.
+
+For live runs, MetricAccumulator keeps the same metrics incrementally in
+constant memory, one O(routes) update per step.
 """
 
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional, Sequence
+
+OVERCROWDED_UTIL = 0.8
+IDLE_UTIL = 0.2
+MAX_TOLERABLE_WAIT_MIN = 30.0
+
+
+def route_wait(demand, capacity, num_buses):
+    """
+    Wait in minutes and unserved passengers of (route, step) cells, elementwise.
+    Formula: wait = headway * (1 + unserved / demand), headway = 60 / num_buses
+    """
+    demand, capacity, num_buses = (np.asarray(a, dtype=float) for a in (demand, capacity, num_buses))
+    unserved = np.maximum(demand - capacity, 0)
+    headway = 60.0 / np.maximum(num_buses, 1)  # minutes between buses
+    return headway * (1 + unserved / np.maximum(demand, 1)), unserved
+
+
+def frustration_score(avg_wait, overcrowding, idle_pct):
+    """Unrounded frustration index (see compute_frustration_index); works elementwise on arrays."""
+    normalized_wait = np.minimum(avg_wait / MAX_TOLERABLE_WAIT_MIN, 1.0) * 100.0
+    return np.minimum(0.4 * normalized_wait + 0.4 * overcrowding * 100.0 + 0.2 * idle_pct, 100.0)
 
 
 def compute_avg_wait_time(snapshots: List[Dict], routes: Dict) -> float:
@@ -24,12 +53,8 @@ def compute_avg_wait_time(snapshots: List[Dict], routes: Dict) -> float:
         for route_id, demand in snap["route_demand"].items():
             capacity = snap["route_capacity"].get(route_id, 1)
             num_buses = snap["route_num_buses"].get(route_id, 1)
-            if num_buses == 0:
-                num_buses = 1
-            headway = 60.0 / num_buses  # minutes between buses
-            unserved_ratio = max(0, (demand - capacity) / max(demand, 1))
-            wait = headway * (1 + unserved_ratio)  # base wait + overflow penalty
-            wait_times.append(wait)
+            wait, _ = route_wait(demand, capacity, num_buses)  # base wait + overflow penalty
+            wait_times.append(float(wait))
     return float(np.mean(wait_times)) if wait_times else 0.0
 
 
@@ -69,16 +94,11 @@ def compute_frustration_index(avg_wait: float, overcrowding: float, idle_pct: fl
     Formula:
       frustration = 0.4 * normalized_wait + 0.4 * overcrowding_penalty + 0.2 * idle_penalty
     Where:
-      normalized_wait       = min(avg_wait / 30, 1) * 100   [30 min = max tolerable wait]
+      normalized_wait       = min(avg_wait / MAX_TOLERABLE_WAIT_MIN, 1) * 100
       overcrowding_penalty  = overcrowding_ratio * 100
       idle_penalty          = idle_pct  (already 0-100)
     """
-    normalized_wait = min(avg_wait / 30.0, 1.0) * 100.0
-    overcrowding_penalty = overcrowding * 100.0
-    idle_penalty = idle_pct
-
-    frustration = (0.4 * normalized_wait) + (0.4 * overcrowding_penalty) + (0.2 * idle_penalty)
-    return round(min(frustration, 100.0), 2)
+    return round(float(frustration_score(avg_wait, overcrowding, idle_pct)), 2)
 
 
 def compute_unserved_passengers(snapshots: List[Dict]) -> int:
@@ -91,26 +111,166 @@ def compute_unserved_passengers(snapshots: List[Dict]) -> int:
     return total_unserved
 
 
-def compute_all_metrics(snapshots, routes, label=""):
+# ----------------------------
+# Columnar engine
+# ----------------------------
+def snapshots_to_arrays(snapshots: List[Dict], route_ids: Optional[Sequence] = None) -> Dict[str, np.ndarray]:
+    """
+    Stack snapshot dicts into (steps × routes) arrays "demand", "capacity",
+    "num_buses" and "utilization". Routes default to the keys of the first
+    snapshot's route_demand; a route missing from a snapshot counts as 0.
+    """
+    if route_ids is None:
+        route_ids = list(snapshots[0]["route_demand"]) if snapshots else []
+    fields = {"demand": "route_demand", "capacity": "route_capacity",
+              "num_buses": "route_num_buses", "utilization": "route_utilization"}
+    return {
+        name: np.array([[snap[key].get(r, 0) for r in route_ids] for snap in snapshots]
+                       ).reshape(len(snapshots), len(route_ids))
+        for name, key in fields.items()
+    }
+
+
+def score_scenarios(demand, capacity, num_buses, utilization) -> Dict[str, np.ndarray]:
+    """
+    Every summary metric in one vectorized pass over (..., steps, routes) arrays.
+    Leading axes are scenarios; each returned array has that leading shape
+    (0-d for a single run). Values are unrounded and on the same scales as
+    compute_all_metrics (wait in minutes, the rest in percent / passengers).
+    """
+    utilization = np.asarray(utilization, dtype=float)
+    cells = (-2, -1)
+    n_obs = max(utilization.shape[-2] * utilization.shape[-1], 1)
+
+    cell_wait, unserved = route_wait(demand, capacity, num_buses)
+    wait = cell_wait.sum(axis=cells) / n_obs
+    overcrowding = (utilization > OVERCROWDED_UTIL).sum(axis=cells) / n_obs
+    idle_pct = (utilization < IDLE_UTIL).sum(axis=cells) / n_obs * 100.0
+    return {
+        "avg_wait_time_min": wait,
+        "overcrowding_pct": overcrowding * 100,
+        "idle_bus_pct": idle_pct,
+        "frustration_index": frustration_score(wait, overcrowding, idle_pct),
+        "total_unserved_passengers": unserved.sum(axis=cells),
+    }
 
-    avg_wait = compute_avg_wait_time(snapshots, routes)
-    overcrowding = compute_overcrowding_ratio(snapshots)
-    idle_pct = compute_idle_bus_percentage(snapshots)
-    total_unserved = compute_unserved_passengers(snapshots)
 
-    frustration = compute_frustration_index(
-        avg_wait,
-        overcrowding,
-        idle_pct
-    )
+def score_steps(demand, capacity, utilization) -> Dict[str, np.ndarray]:
+    """Per-step aggregates of (..., steps, routes) arrays, each of shape (..., steps)."""
+    utilization = np.asarray(utilization, dtype=float)
+    n_routes = utilization.shape[-1]
+    return {
+        "avg_utilization": utilization.sum(axis=-1) / max(n_routes, 1),
+        "overcrowded_routes": (utilization > OVERCROWDED_UTIL).sum(axis=-1),
+        "total_demand": np.asarray(demand).sum(axis=-1),
+        "total_capacity": np.asarray(capacity).sum(axis=-1),
+    }
+
+
+# ----------------------------
+# Streaming accumulators
+# ----------------------------
+class RunningStat:
+    """Count, mean and variance of a stream, merged a batch at a time (Welford / Chan)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def push(self, values) -> None:
+        values = np.asarray(values, dtype=float).ravel()
+        n = values.size
+        if n == 0:
+            return
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += batch_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    @property
+    def variance(self) -> float:
+        """Population variance (0 until two values are seen)."""
+        return self._m2 / self.count if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+
+class MetricAccumulator:
+    """
+    Incremental version of compute_all_metrics for live runs.
+
+    Call update() once per step with that step's per-route arrays (or
+    update_snapshot() with a snapshot dict); summary() reports the metrics so
+    far at any moment. Memory stays constant however long the run is.
+    """
+
+    def __init__(self):
+        self.wait = RunningStat()           # per (step, route) wait, minutes
+        self.utilization = RunningStat()    # per (step, route) utilization
+        self.step_unserved = RunningStat()  # unserved passengers per step
+        self.overcrowded = 0
+        self.idle = 0
+        self.total_unserved = 0.0
+        self.steps = 0
+
+    def update(self, demand, capacity, num_buses, utilization) -> None:
+        utilization = np.asarray(utilization, dtype=float)
+        wait, unserved = route_wait(demand, capacity, num_buses)
+        self.wait.push(wait)
+        self.utilization.push(utilization)
+        self.step_unserved.push([unserved.sum()])
+        self.overcrowded += int((utilization > OVERCROWDED_UTIL).sum())
+        self.idle += int((utilization < IDLE_UTIL).sum())
+        self.total_unserved += float(unserved.sum())
+        self.steps += 1
+
+    def update_snapshot(self, snap: Dict) -> None:
+        route_ids = list(snap["route_demand"])
+        self.update(*(
+            [snap[key].get(r, 0) for r in route_ids]
+            for key in ("route_demand", "route_capacity", "route_num_buses", "route_utilization")
+        ))
+
+    def summary(self, label: str = "") -> Dict:
+        """Current metrics, with the same keys and rounding as compute_all_metrics plus spreads."""
+        n_obs = max(self.utilization.count, 1)
+        avg_wait = self.wait.mean
+        overcrowding = self.overcrowded / n_obs
+        idle_pct = self.idle / n_obs * 100.0
+        return {
+            "label": label,
+            "avg_wait_time_min": round(avg_wait, 2),
+            "overcrowding_pct": round(overcrowding * 100, 2),
+            "idle_bus_pct": round(idle_pct, 2),
+            "frustration_index": compute_frustration_index(avg_wait, overcrowding, idle_pct),
+            "total_unserved_passengers": int(self.total_unserved),
+            "wait_std_min": round(self.wait.std, 2),
+            "avg_utilization": round(self.utilization.mean, 3),
+            "utilization_std": round(self.utilization.std, 3),
+            "unserved_per_step_mean": round(self.step_unserved.mean, 2),
+            "unserved_per_step_std": round(self.step_unserved.std, 2),
+            "steps": self.steps,
+        }
+
+
+def compute_all_metrics(snapshots, routes, label=""):
+    """Summary metrics of one run (see score_scenarios), rounded for display."""
+    arrays = snapshots_to_arrays(snapshots)
+    m = {k: float(v) for k, v in score_scenarios(**arrays).items()}
 
     return {
     "label": label,
-    "avg_wait_time_min": round(avg_wait, 2),
-    "overcrowding_pct": round(overcrowding * 100, 2),  # convert to percent
-    "idle_bus_pct": round(idle_pct, 2),
-    "frustration_index": frustration,
-    "total_unserved_passengers": int(total_unserved),
+    "avg_wait_time_min": round(m["avg_wait_time_min"], 2),
+    "overcrowding_pct": round(m["overcrowding_pct"], 2),
+    "idle_bus_pct": round(m["idle_bus_pct"], 2),
+    "frustration_index": round(m["frustration_index"], 2),
+    "total_unserved_passengers": int(m["total_unserved_passengers"]),
 }
 
 
@@ -135,25 +295,23 @@ def compute_improvement(baseline: Dict, smart: Dict) -> Dict:
 
 def compute_per_step_metrics(snapshots: List[Dict]) -> List[Dict]:
     """Compute per-time-step aggregated metrics for time-series plotting."""
-    results = []
-    for snap in snapshots:
-        utils = list(snap["route_utilization"].values())
-        demands = list(snap["route_demand"].values())
-        capacities = list(snap["route_capacity"].values())
-
-        avg_util = np.mean(utils) if utils else 0
-        overcrowded_routes = sum(1 for u in utils if u > 0.8)
-        total_demand = sum(demands)
-        total_cap = sum(capacities)
+    arrays = snapshots_to_arrays(snapshots)
+    per_step = score_steps(arrays["demand"], arrays["capacity"], arrays["utilization"])
+    avg_util = np.round(per_step["avg_utilization"], 3).tolist()
+    overcrowded = per_step["overcrowded_routes"].tolist()
+    total_demand = per_step["total_demand"].tolist()
+    total_cap = per_step["total_capacity"].tolist()
 
-        results.append({
+    return [
+        {
             "step": snap["step"],
             "time_label": snap["time_label"],
-            "avg_utilization": round(avg_util, 3),
-            "overcrowded_routes": overcrowded_routes,
-            "total_demand": total_demand,
-            "total_capacity": total_cap,
+            "avg_utilization": avg_util[t],
+            "overcrowded_routes": overcrowded[t],
+            "total_demand": total_demand[t],
+            "total_capacity": total_cap[t],
             "weather": snap["weather"],
             "events": ", ".join(snap["active_events"]) if snap["active_events"] else "—",
-        })
-    return results
+        }
+        for t, snap in enumerate(snapshots)
+    ]
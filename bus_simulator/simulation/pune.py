@@ -0,0 +1,122 @@
+"""
+pune.py - Pune network data: PMPML + Metro stops, routes, events and weather.
+Shared by the Streamlit app and the simulation engine.
+Profiles and calendars are written in 15-minute slots of one day.
+"""
+
+import numpy as np
+
+from simulation.timeaxis import TimeAxis, DEFAULT_AXIS
+
+PUNE_CENTER = [18.5204, 73.8567]
+
+PMPML_STOPS = {
+    "Pune Railway Station":  [18.5280, 73.8742],
+    "Swargate":              [18.5018, 73.8580],
+    "Shivajinagar":          [18.5308, 73.8474],
+    "Deccan Gymkhana":       [18.5154, 73.8409],
+    "FC Road":               [18.5199, 73.8395],
+    "JM Road":               [18.5221, 73.8440],
+    "Nal Stop":              [18.5211, 73.8361],
+    "Kothrud Depot":         [18.5071, 73.8085],
+    "Hadapsar":              [18.5018, 73.9260],
+    "Magarpatta City":       [18.5105, 73.9278],
+    "Kharadi":               [18.5518, 73.9421],
+    "Viman Nagar":           [18.5672, 73.9143],
+    "Kalyani Nagar":         [18.5478, 73.9026],
+    "Koregaon Park":         [18.5362, 73.8929],
+    "Mundhwa":               [18.5200, 73.9270],
+    "Hinjewadi Phase 1":     [18.5915, 73.7389],
+    "Hinjewadi Phase 2":     [18.5966, 73.7205],
+    "Hinjewadi Phase 3":     [18.6010, 73.7082],
+    "Baner":                 [18.5590, 73.7870],
+    "Balewadi":              [18.5744, 73.7756],
+    "Aundh":                 [18.5580, 73.8081],
+    "Wakad":                 [18.5986, 73.7621],
+    "Pune Airport":          [18.5822, 73.9197],
+    "Vishrantwadi":          [18.5766, 73.8989],
+    "Yerwada":               [18.5535, 73.8929],
+    "Katraj":                [18.4535, 73.8647],
+    "Bibvewadi":             [18.4801, 73.8630],
+    "Warje":                 [18.4882, 73.8068],
+    "Dhankawadi":            [18.4666, 73.8503],
+    "Pimpri":                [18.6279, 73.8009],
+    "Chinchwad":             [18.6477, 73.7988],
+    "Akurdi":                [18.6504, 73.7730],
+    "PCMC":                  [18.6298, 73.8008],
+    "Nigdi":                 [18.6680, 73.7681],
+}
+
+PMPML_ROUTES = {
+    "PMPML-11": {
+        "name": "Swargate – Hinjewadi IT Park",
+        "stops": ["Swargate","Deccan Gymkhana","Shivajinagar","FC Road","Nal Stop","Baner","Balewadi","Wakad","Hinjewadi Phase 1","Hinjewadi Phase 2","Hinjewadi Phase 3"],
+        "color": "#3b82f6", "buses": 12, "type": "bus", "frequency_min": 8,
+    },
+    "PMPML-50": {
+        "name": "Pune Station – Hadapsar",
+        "stops": ["Pune Railway Station","Koregaon Park","Kalyani Nagar","Mundhwa","Magarpatta City","Hadapsar"],
+        "color": "#f59e0b", "buses": 9, "type": "bus", "frequency_min": 10,
+    },
+    "PMPML-152": {
+        "name": "Katraj – Vishrantwadi via Station",
+        "stops": ["Katraj","Dhankawadi","Bibvewadi","Swargate","Pune Railway Station","Yerwada","Vishrantwadi"],
+        "color": "#10b981", "buses": 8, "type": "bus", "frequency_min": 12,
+    },
+    "PMPML-72": {
+        "name": "Kothrud – Kharadi via Shivajinagar",
+        "stops": ["Kothrud Depot","Nal Stop","JM Road","Shivajinagar","Pune Railway Station","Kalyani Nagar","Kharadi"],
+        "color": "#8b5cf6", "buses": 7, "type": "bus", "frequency_min": 15,
+    },
+    "PMPML-Airport": {
+        "name": "Swargate – Pune Airport Express",
+        "stops": ["Swargate","Pune Railway Station","Viman Nagar","Vishrantwadi","Pune Airport"],
+        "color": "#ef4444", "buses": 6, "type": "bus", "frequency_min": 20,
+    },
+    "PMPML-PCMC": {
+        "name": "Shivajinagar – Nigdi (PCMC Corridor)",
+        "stops": ["Shivajinagar","Aundh","Baner","Balewadi","PCMC","Pimpri","Chinchwad","Akurdi","Nigdi"],
+        "color": "#06b6d4", "buses": 10, "type": "bus", "frequency_min": 10,
+    },
+}
+
+METRO_ROUTES = {
+    "METRO-L1": {
+        "name": "Metro Line 1 — PCMC to Swargate",
+        "stops": ["Nigdi","Akurdi","Chinchwad","Pimpri","PCMC","Aundh","Shivajinagar","Deccan Gymkhana","Swargate"],
+        "color": "#dc2626", "trains": 8, "type": "metro", "frequency_min": 5,
+    },
+    "METRO-L2": {
+        "name": "Metro Line 2 — Kothrud to Kharadi",
+        "stops": ["Kothrud Depot","Warje","Deccan Gymkhana","JM Road","Shivajinagar","Pune Railway Station","Yerwada","Viman Nagar","Kharadi"],
+        "color": "#7c3aed", "trains": 6, "type": "metro", "frequency_min": 7,
+    },
+}
+
+ALL_ROUTES = {**PMPML_ROUTES, **METRO_ROUTES}
+
+PUNE_EVENTS = [
+    {"name": "IT Rush — Hinjewadi",    "stops": ["Hinjewadi Phase 1","Hinjewadi Phase 2","Hinjewadi Phase 3","Wakad","Baner"], "peak_steps": list(range(28,34))+list(range(64,70)), "multiplier": 2.8},
+    {"name": "College Hours — FC/JM",  "stops": ["FC Road","JM Road","Deccan Gymkhana","Shivajinagar"],                        "peak_steps": list(range(34,40)),                     "multiplier": 2.2},
+    {"name": "Pune Station Rush",      "stops": ["Pune Railway Station","Swargate","Shivajinagar"],                            "peak_steps": list(range(28,32))+list(range(68,72)),  "multiplier": 2.5},
+    {"name": "Airport Evening Wave",   "stops": ["Pune Airport","Viman Nagar","Vishrantwadi"],                                 "peak_steps": list(range(64,70)),                     "multiplier": 2.0},
+    {"name": "Magarpatta Corp Hours",  "stops": ["Magarpatta City","Hadapsar","Mundhwa"],                                      "peak_steps": list(range(30,34))+list(range(64,68)),  "multiplier": 2.4},
+]
+
+PUNE_WEATHER = (
+    ["☀️ Clear"]*16 + ["🌤️ Partly Cloudy"]*8 + ["☀️ Clear"]*20 +
+    ["⛅ Overcast"]*8 + ["🌦️ Pre-Monsoon"]*12 + ["⛈️ Thunderstorm"]*8 +
+    ["🌧️ Light Rain"]*12 + ["🌤️ Clearing"]*12
+)
+WEATHER_MULT = {"☀️ Clear":1.0,"🌤️ Partly Cloudy":1.05,"⛅ Overcast":1.1,
+                "🌦️ Pre-Monsoon":1.2,"⛈️ Thunderstorm":0.7,"🌧️ Light Rain":1.25,"🌤️ Clearing":1.1}
+
+# Demand multiplier by hour of day: TIME_MULT_VALUES[i] applies up to TIME_MULT_BOUNDS[i]
+TIME_MULT_BOUNDS = [5, 7, 9, 11, 13, 15, 17, 20, 22]
+TIME_MULT_VALUES = [0.08, 0.5, 1.9, 1.3, 1.0, 0.9, 1.1, 1.85, 1.1, 0.4]
+
+def time_mult_profile(axis: TimeAxis = DEFAULT_AXIS) -> np.ndarray:
+    return axis.hourly_profile(TIME_MULT_BOUNDS, TIME_MULT_VALUES)
+
+def weather_mult_profile(axis: TimeAxis = DEFAULT_AXIS, weather=PUNE_WEATHER) -> np.ndarray:
+    return np.array([WEATHER_MULT[w] for w in axis.from_slots(weather)])
@@ -0,0 +1,177 @@
+"""
+result.py - Columnar output of a network simulation run.
+
+Every per-step quantity is one contiguous array, indexed (steps × stops) or
+(steps × routes), plus per-step scalar columns. Name ↔ index maps translate
+stop and route names to columns.
+
+result[t] is a StepSnapshot: a read-only mapping with the same keys as the old
+per-step history dicts ("stop_wait", "route_demand", "avg_wait_min", ...).
+Its per-stop and per-route entries are views over row t, so building one
+copies nothing. Iteration and len() work as before, so code written against
+the list of dicts keeps working, while charts can read the columns directly.
+"""
+
+import hashlib
+import numpy as np
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields
+from typing import Dict, List
+
+from simulation.timeaxis import TimeAxis
+
+
+class RowView(Mapping):
+    """Read-only name → value mapping over one row of a result array (NaN reads as None)."""
+
+    __slots__ = ("_index", "_row")
+
+    def __init__(self, index: Dict[str, int], row: np.ndarray):
+        self._index = index
+        self._row = row
+
+    def __getitem__(self, name):
+        v = self._row[self._index[name]].item()
+        return None if v != v else v
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return f"RowView({dict(self)!r})"
+
+
+class StepSnapshot(Mapping):
+    """Lazy view of one simulation step, keyed like the old history dicts."""
+
+    __slots__ = ("_result", "_t")
+
+    KEYS = ("step", "time", "hour", "weather", "events",
+            "stop_demand", "stop_wait", "route_demand", "route_capacity", "bus_counts",
+            "avg_wait_min", "overcrowded_routes", "idle_routes",
+            "total_demand", "total_capacity", "utilization")
+
+    def __init__(self, result: "SimulationResult", t: int):
+        self._result = result
+        self._t = t
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies this step of this run, for keying caches of per-step charts."""
+        return f"{self._result.fingerprint}:{self._t}"
+
+    def __getitem__(self, key):
+        r, t = self._result, self._t
+        if key == "step":
+            return t
+        if key == "time":
+            return r.axis.label(t)
+        if key == "hour":
+            return r.axis.hour(t)
+        if key == "weather":
+            return r.weather[t]
+        if key == "events":
+            return r.events[t]
+        if key in ("stop_demand", "stop_wait"):
+            return RowView(r.stop_index, getattr(r, key)[t])
+        if key in ("route_demand", "route_capacity", "bus_counts"):
+            return RowView(r.route_index, getattr(r, key)[t])
+        if key in self.KEYS:
+            return getattr(r, key)[t].item()
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+
+@dataclass
+class SimulationResult:
+    axis: TimeAxis
+    stop_names: List[str]
+    route_ids: List[str]
+    weather: List[str]                # (steps,)
+    events: List[List[str]]           # (steps,) names of the events active at each step
+    stop_demand: np.ndarray           # (steps × stops) int32
+    stop_wait: np.ndarray             # (steps × stops) float64, NaN where no route serves the stop
+    route_demand: np.ndarray          # (steps × routes) int32
+    route_capacity: np.ndarray        # (steps × routes) int32
+    bus_counts: np.ndarray            # (steps × routes) int32
+    avg_wait_min: np.ndarray          # (steps,)
+    overcrowded_routes: np.ndarray    # (steps,)
+    idle_routes: np.ndarray           # (steps,)
+    total_demand: np.ndarray          # (steps,)
+    total_capacity: np.ndarray        # (steps,)
+    utilization: np.ndarray           # (steps,)
+    stop_index: Dict[str, int] = field(init=False, repr=False)
+    route_index: Dict[str, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.stop_index = {s: i for i, s in enumerate(self.stop_names)}
+        self.route_index = {r: i for i, r in enumerate(self.route_ids)}
+
+    # The maps and fingerprint are rebuilt on load rather than pickled with the arrays
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["stop_index"], state["route_index"]
+        state.pop("_fingerprint", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__post_init__()
+
+    @property
+    def fingerprint(self) -> str:
+        """Content hash of the run, computed once; charts and other derived views are cached on it."""
+        fp = self.__dict__.get("_fingerprint")
+        if fp is None:
+            h = hashlib.blake2b(digest_size=16)
+            h.update(repr((self.axis, self.stop_names, self.route_ids, self.weather, self.events)).encode())
+            for f in fields(self):
+                value = getattr(self, f.name)
+                if isinstance(value, np.ndarray):
+                    h.update(f"{f.name}{value.dtype}{value.shape}".encode())
+                    h.update(np.ascontiguousarray(value).data)
+            fp = self._fingerprint = h.hexdigest()
+        return fp
+
+    @property
+    def num_steps(self) -> int:
+        return len(self.weather)
+
+    @property
+    def hours(self) -> np.ndarray:
+        """(steps,) hours since the start of the horizon, as in snapshot["hour"]."""
+        return self.axis.minutes() / 60
+
+    def __len__(self):
+        return self.num_steps
+
+    def __getitem__(self, t) -> StepSnapshot:
+        t = int(t)
+        if t < 0:
+            t += self.num_steps
+        if not 0 <= t < self.num_steps:
+            raise IndexError(f"step {t} out of range for {self.num_steps} steps")
+        return StepSnapshot(self, t)
+
+    def __iter__(self):
+        return (StepSnapshot(self, t) for t in range(self.num_steps))
+
+    def stop_series(self, stop: str, key: str = "stop_wait") -> np.ndarray:
+        """(steps,) column of a per-stop array for one stop."""
+        return getattr(self, key)[:, self.stop_index[stop]]
+
+    def route_series(self, route_id: str, key: str = "route_demand") -> np.ndarray:
+        """(steps,) column of a per-route array for one route."""
+        return getattr(self, key)[:, self.route_index[route_id]]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.__dict__.values() if isinstance(a, np.ndarray))
@@ -0,0 +1,55 @@
+"""
+spatial.py - Haversine spatial index over stop coordinates.
+
+StopIndex wraps a scikit-learn BallTree with the haversine metric, built once
+from a {name: [lat, lon]} dict. It answers k-nearest and radius queries in
+metres in O(log N) per query instead of scanning every stop. Queries take a
+stop name or a (lat, lon) point, and results come back as (name, metres)
+pairs, nearest first.
+"""
+
+import numpy as np
+from sklearn.neighbors import BallTree
+from typing import Dict, List, Tuple, Union
+
+EARTH_RADIUS_M = 6_371_000.0
+
+Point = Union[str, Tuple[float, float]]
+
+
+class StopIndex:
+    def __init__(self, stops: Dict):
+        self.stop_names: List[str] = list(stops)
+        self.stop_id = {s: i for i, s in enumerate(self.stop_names)}
+        self.latlon = np.array([stops[s] for s in self.stop_names], dtype=float).reshape(-1, 2)
+        self._tree = BallTree(np.radians(self.latlon), metric="haversine")
+
+    @classmethod
+    def from_stops(cls, stops: Dict) -> "StopIndex":
+        return cls(stops)
+
+    def _query_point(self, point: Point):
+        """(radians row, stop id or None) for a stop name or a (lat, lon) pair."""
+        if isinstance(point, str):
+            s = self.stop_id[point]
+            return np.radians(self.latlon[s:s + 1]), s
+        return np.radians(np.asarray(point, dtype=float).reshape(1, 2)), None
+
+    def nearest(self, point: Point, k: int = 1, exclude_self: bool = True) -> List[Tuple[str, float]]:
+        """The `k` stops closest to `point` (a stop itself is left out of its own results)."""
+        x, own = self._query_point(point)
+        k_query = min(k + (own is not None and exclude_self), len(self.stop_names))
+        dist, idx = self._tree.query(x, k=k_query)
+        hits = [(self.stop_names[i], float(d) * EARTH_RADIUS_M)
+                for d, i in zip(dist[0].tolist(), idx[0].tolist())
+                if not (exclude_self and i == own)]
+        return hits[:k]
+
+    def within(self, point: Point, radius_m: float, exclude_self: bool = True) -> List[Tuple[str, float]]:
+        """All stops within `radius_m` metres of `point`, nearest first."""
+        x, own = self._query_point(point)
+        idx, dist = self._tree.query_radius(x, r=radius_m / EARTH_RADIUS_M,
+                                            return_distance=True, sort_results=True)
+        return [(self.stop_names[i], float(d) * EARTH_RADIUS_M)
+                for d, i in zip(dist[0].tolist(), idx[0].tolist())
+                if not (exclude_self and i == own)]
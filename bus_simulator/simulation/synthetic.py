@@ -0,0 +1,165 @@
+"""
+synthetic.py - Reproducible synthetic cities for scale testing.
+
+generate_city() lays out N stops in spatial clusters around a centre,
+draws M routes of realistic length between them (routes start at under-served
+stops, head through a busy one and snap to the nearest stop along their
+corridor, so they overlap at hubs) and spreads K buses over the routes by load.
+
+The result uses the same Stop/Route/Bus dataclasses as build_city(), so it
+feeds CityState.from_city() directly; to_network() converts it into the
+stop/route dicts taken by the engine (simulate_network, run_network_simulation,
+run_monte_carlo).
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+from typing import Dict, List
+
+from simulation.city import Stop, Route, Bus, RANDOM_SEED, MIN_BUSES_PER_ROUTE
+from simulation.pune import PUNE_CENTER
+
+KM_PER_DEG_LAT = 111.0
+STOP_SPACING_KM = 0.6          # typical distance between consecutive stops
+ROUTE_LENGTH_KM = (4.0, 35.0)  # clip range of the log-normal route length
+MEDIAN_ROUTE_KM = 12.0
+BUS_SPEED_KMH = 18.0
+ROUTE_COLORS = ["#3b82f6", "#f59e0b", "#10b981", "#8b5cf6", "#ef4444",
+                "#06b6d4", "#dc2626", "#7c3aed", "#db2777", "#65a30d"]
+
+
+def _km_scale(center) -> np.ndarray:
+    """km per degree of (lat, lon) around `center`."""
+    return np.array([KM_PER_DEG_LAT, KM_PER_DEG_LAT * np.cos(np.radians(center[0]))])
+
+
+def _layout_stops(rng, n_stops: int, n_clusters: int, radius_km: float):
+    """Clustered stop positions in km around the origin and their cluster ids."""
+    r = radius_km * np.sqrt(rng.uniform(0, 1, n_clusters))
+    theta = rng.uniform(0, 2 * np.pi, n_clusters)
+    centers = np.column_stack([r * np.sin(theta), r * np.cos(theta)])
+    # A few big hubs and many small neighbourhoods
+    weights = rng.lognormal(0, 0.8, n_clusters)
+    cluster = rng.choice(n_clusters, size=n_stops, p=weights / weights.sum())
+    spread = radius_km / np.sqrt(n_clusters) * rng.uniform(0.3, 0.6, n_clusters)
+    pos = centers[cluster] + rng.normal(0, 1, (n_stops, 2)) * spread[cluster, None]
+    return pos, cluster, weights
+
+
+def _route_stops(rng, tree: cKDTree, pos: np.ndarray, origin: int, toward: int,
+                 length_km: float) -> List[int]:
+    """Stop ids along a straight corridor of `length_km` from stop `origin` through stop `toward`."""
+    offset = pos[toward] - pos[origin]
+    norm = np.linalg.norm(offset)
+    if norm == 0:
+        heading = rng.uniform(0, 2 * np.pi)
+        offset, norm = np.array([np.sin(heading), np.cos(heading)]), 1.0
+    direction = offset / norm
+    n_points = max(2, int(length_km / STOP_SPACING_KM))
+    along = np.linspace(0, length_km, n_points)
+    jitter = rng.normal(0, STOP_SPACING_KM / 3, (n_points, 2))
+    waypoints = pos[origin] + along[:, None] * direction + jitter
+    _, nearest = tree.query(waypoints)
+    stops = [origin]
+    for s in nearest.tolist():
+        if s not in stops:
+            stops.append(s)
+    return stops
+
+
+def _allocate_buses(load: np.ndarray, n_buses: int) -> np.ndarray:
+    """Largest-remainder split of n_buses proportional to load, with a per-route floor."""
+    n_routes = len(load)
+    spare = n_buses - MIN_BUSES_PER_ROUTE * n_routes
+    if spare < 0:
+        raise ValueError(f"{n_buses} buses cannot cover {n_routes} routes "
+                         f"with {MIN_BUSES_PER_ROUTE} bus(es) each")
+    share = spare * load / load.sum()
+    alloc = np.floor(share).astype(np.int64)
+    alloc[np.argsort(alloc - share)[:spare - alloc.sum()]] += 1
+    return alloc + MIN_BUSES_PER_ROUTE
+
+
+def generate_city(n_stops: int, n_routes: int, n_buses: int, seed: int = RANDOM_SEED,
+                  center=PUNE_CENTER, radius_km: float = None, n_clusters: int = None) -> Dict:
+    """
+    Build a reproducible synthetic city.
+
+    Stops are returned with x = longitude and y = latitude; base demand is
+    higher in the bigger clusters. Every route gets at least
+    MIN_BUSES_PER_ROUTE buses and its base_frequency is its bus count, as in
+    build_city().
+
+    Returns {"stops": [Stop], "routes": [Route], "buses": [Bus]}.
+    """
+    if n_stops < 2 or n_routes < 1:
+        raise ValueError("a city needs at least 2 stops and 1 route")
+    rng = np.random.default_rng(seed)
+    n_clusters = n_clusters or max(1, int(round(np.sqrt(n_stops) / 2)))
+    radius_km = radius_km or 5 + 0.35 * np.sqrt(n_stops)
+
+    pos, cluster, weights = _layout_stops(rng, n_stops, n_clusters, radius_km)
+    density = weights[cluster] / weights.mean()
+    base_demand = np.clip(rng.uniform(5, 25, n_stops) * density ** 0.5, 2, 80)
+    latlon = np.asarray(center) + pos / _km_scale(center)
+    stops = [
+        Stop(stop_id=i, name=f"Stop {i}", x=float(lon), y=float(lat), base_demand=float(d))
+        for i, ((lat, lon), d) in enumerate(zip(latlon, base_demand))
+    ]
+
+    tree = cKDTree(pos)
+    served = np.zeros(n_stops, dtype=bool)
+    lengths = np.clip(rng.lognormal(np.log(MEDIAN_ROUTE_KM), 0.4, n_routes), *ROUTE_LENGTH_KM)
+    route_stop_map = []
+    for length in lengths:
+        # Start unserved stops first so coverage grows with the route count
+        pool = np.flatnonzero(~served)
+        if not pool.size:
+            pool = np.arange(n_stops)
+        p = base_demand[pool] / base_demand[pool].sum()
+        origin = int(rng.choice(pool, p=p))
+        # Head for a busy stop, so routes cross the centre and share hubs
+        hub = int(rng.choice(n_stops, p=base_demand / base_demand.sum()))
+        members = _route_stops(rng, tree, pos, origin, hub, length)
+        served[members] = True
+        route_stop_map.append(members)
+
+    load = np.array([base_demand[m].sum() for m in route_stop_map])
+    alloc = _allocate_buses(load, n_buses)
+    routes = [
+        Route(route_id=r, name=f"Stop {m[0]} – Stop {m[-1]}", stops=m, base_frequency=int(alloc[r]))
+        for r, m in enumerate(route_stop_map)
+    ]
+    buses = [Bus(bus_id=b, route_id=int(r)) for b, r in enumerate(np.repeat(np.arange(n_routes), alloc))]
+    return {"stops": stops, "routes": routes, "buses": buses}
+
+
+def to_network(city: Dict) -> Dict:
+    """
+    Engine view of a city: {"stops": {name: [lat, lon]}, "routes": {route_id: {...}}}
+    in the same shape as PMPML_STOPS / ALL_ROUTES, ready to pass as keyword
+    arguments to simulate_network or run_network_simulation.
+    """
+    stops = city["stops"]
+    stop_xy = np.array([[s.y, s.x] for s in stops])
+    scale = _km_scale(stop_xy.mean(axis=0))
+    routes = {}
+    for r in city["routes"]:
+        path = stop_xy[r.stops]
+        length_km = float(np.linalg.norm(np.diff(path, axis=0) * scale, axis=1).sum())
+        round_trip_min = 2 * length_km / BUS_SPEED_KMH * 60
+        routes[f"R-{r.route_id}"] = {
+            "name": r.name,
+            "stops": [stops[s].name for s in r.stops],
+            "color": ROUTE_COLORS[r.route_id % len(ROUTE_COLORS)],
+            "buses": r.base_frequency,
+            "type": "bus",
+            "frequency_min": int(np.clip(round(round_trip_min / r.base_frequency), 4, 30)),
+        }
+    return {"stops": {s.name: [s.y, s.x] for s in stops}, "routes": routes}
+
+
+def generate_network(n_stops: int, n_routes: int, n_buses: int, seed: int = RANDOM_SEED,
+                     **kwargs) -> Dict:
+    """Shortcut for to_network(generate_city(...))."""
+    return to_network(generate_city(n_stops, n_routes, n_buses, seed, **kwargs))
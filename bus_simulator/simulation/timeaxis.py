@@ -0,0 +1,88 @@
+"""
+timeaxis.py - Simulation time axis: tick length and horizon.
+
+The original simulator ran 96 ticks of 15 minutes; a TimeAxis describes any
+resolution (down to 1-minute ticks) over any number of days. Time-of-day and
+weather profiles are turned into per-tick lookup arrays once, so every kernel
+stays linear in the number of ticks.
+"""
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+from simulation.events import event_intervals
+
+MINUTES_PER_DAY = 24 * 60
+SLOT_MINUTES = 15  # resolution of the hand-written Pune profiles and calendars
+
+
+@dataclass(frozen=True)
+class TimeAxis:
+    tick_minutes: int = SLOT_MINUTES
+    days: int = 1
+
+    def __post_init__(self):
+        if MINUTES_PER_DAY % self.tick_minutes:
+            raise ValueError(f"tick_minutes must divide a day, got {self.tick_minutes}")
+
+    @property
+    def ticks_per_day(self) -> int:
+        return MINUTES_PER_DAY // self.tick_minutes
+
+    @property
+    def n_ticks(self) -> int:
+        return self.ticks_per_day * self.days
+
+    def minutes(self) -> np.ndarray:
+        """Minute since the start of the horizon, per tick."""
+        return np.arange(self.n_ticks) * self.tick_minutes
+
+    def hour_of_day(self) -> np.ndarray:
+        return (self.minutes() % MINUTES_PER_DAY) / 60
+
+    def hour(self, tick: int) -> float:
+        """Hours since the start of the horizon."""
+        return tick * self.tick_minutes / 60
+
+    def label(self, tick: int) -> str:
+        day, minute = divmod(tick * self.tick_minutes, MINUTES_PER_DAY)
+        h, m = divmod(minute, 60)
+        return f"{h:02d}:{m:02d}" if self.days == 1 else f"D{day + 1} {h:02d}:{m:02d}"
+
+    def hourly_profile(self, bounds: Sequence[float], values: Sequence[float]) -> np.ndarray:
+        """
+        Per-tick lookup of a piecewise-constant time-of-day profile:
+        values[i] applies from bounds[i-1] (inclusive) to bounds[i] (exclusive) hours.
+        """
+        idx = np.searchsorted(np.asarray(bounds, dtype=float), self.hour_of_day(), side="right")
+        return np.asarray(values, dtype=float)[idx]
+
+    def slot_of_day(self, slot_minutes: int = SLOT_MINUTES) -> np.ndarray:
+        """Index of the time-of-day slot each tick falls in, e.g. the model's 15-minute step feature."""
+        return (self.minutes() % MINUTES_PER_DAY) // slot_minutes
+
+    def from_slots(self, per_slot: Sequence, slot_minutes: int = SLOT_MINUTES) -> List:
+        """Resample a one-day, per-slot sequence (e.g. weather) onto the ticks, repeating daily."""
+        return [per_slot[s] for s in self.slot_of_day(slot_minutes).tolist()]
+
+    def rescale_events(self, events: List[Dict], slot_minutes: int = SLOT_MINUTES) -> List[Dict]:
+        """
+        Map a one-day calendar given in slots onto the ticks, repeated every day.
+        Starts round down and ends round up, so an event shorter than a tick
+        still covers the tick it falls in.
+        """
+        out = []
+        for e in events:
+            intervals = [
+                ((day * MINUTES_PER_DAY + start * slot_minutes) // self.tick_minutes,
+                 -(-(day * MINUTES_PER_DAY + end * slot_minutes) // self.tick_minutes))
+                for day in range(self.days)
+                for start, end in event_intervals(e)
+            ]
+            rest = {k: v for k, v in e.items() if k not in ("start", "end", "peak_steps")}
+            out.append({**rest, "intervals": intervals})
+        return out
+
+
+DEFAULT_AXIS = TimeAxis()
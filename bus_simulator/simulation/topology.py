@@ -0,0 +1,118 @@
+"""
+topology.py - Static stop/route topology of a network, built once.
+
+Stops and routes get integer ids in dict order. Membership is stored both
+ways as CSR arrays:
+
+    routes of stop s:  stop_route_idx[stop_route_ptr[s]:stop_route_ptr[s+1]]
+    stops of route r:  route_stop_idx[route_stop_ptr[r]:route_stop_ptr[r+1]]  (in route order)
+
+plus, per route, the position of each stop along it. The UI, the engine and
+the journey planner answer "which routes serve this stop" and "how far apart
+are these stops on that route" from here instead of scanning route lists.
+"""
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass
+class Topology:
+    stop_names: List[str]
+    route_ids: List[str]
+    stop_id: Dict[str, int]
+    route_index: Dict[str, int]
+    stop_route_ptr: np.ndarray
+    stop_route_idx: np.ndarray
+    route_stop_ptr: np.ndarray
+    route_stop_idx: np.ndarray
+    route_stop_pos: List[Dict[int, int]]  # per route: stop id → first position along the route
+
+    @property
+    def num_stops(self) -> int:
+        return len(self.stop_names)
+
+    @property
+    def num_routes(self) -> int:
+        return len(self.route_ids)
+
+    @classmethod
+    def from_network(cls, stops: Dict, routes: Dict) -> "Topology":
+        """Build from stop and route dicts shaped like PMPML_STOPS / ALL_ROUTES; unknown stops are skipped."""
+        stop_names = list(stops)
+        route_ids = list(routes)
+        stop_id = {s: i for i, s in enumerate(stop_names)}
+
+        route_stops = [[stop_id[s] for s in routes[rid]["stops"] if s in stop_id] for rid in route_ids]
+        route_stop_ptr = np.zeros(len(route_ids) + 1, dtype=np.int64)
+        route_stop_ptr[1:] = np.cumsum([len(m) for m in route_stops])
+        route_stop_idx = np.array([s for m in route_stops for s in m], dtype=np.int64)
+
+        route_stop_pos = []
+        for members in route_stops:
+            pos = {}
+            for i, s in enumerate(members):
+                pos.setdefault(s, i)
+            route_stop_pos.append(pos)
+
+        # Each (stop, route) pair once, grouped by stop and ordered by route id
+        pairs = sorted({(s, r) for r, pos in enumerate(route_stop_pos) for s in pos})
+        stop_route_ptr = np.zeros(len(stop_names) + 1, dtype=np.int64)
+        np.add.at(stop_route_ptr, np.array([s for s, _ in pairs], dtype=np.int64) + 1, 1)
+        stop_route_ptr = np.cumsum(stop_route_ptr)
+
+        return cls(
+            stop_names=stop_names,
+            route_ids=route_ids,
+            stop_id=stop_id,
+            route_index={rid: r for r, rid in enumerate(route_ids)},
+            stop_route_ptr=stop_route_ptr,
+            stop_route_idx=np.array([r for _, r in pairs], dtype=np.int64),
+            route_stop_ptr=route_stop_ptr,
+            route_stop_idx=route_stop_idx,
+            route_stop_pos=route_stop_pos,
+        )
+
+    # ----------------------------
+    # Integer-id queries
+    # ----------------------------
+    def stop_routes(self, s: int) -> np.ndarray:
+        return self.stop_route_idx[self.stop_route_ptr[s]:self.stop_route_ptr[s + 1]]
+
+    def route_stops(self, r: int) -> np.ndarray:
+        return self.route_stop_idx[self.route_stop_ptr[r]:self.route_stop_ptr[r + 1]]
+
+    def num_serving(self) -> np.ndarray:
+        """(stops,) number of distinct routes serving each stop."""
+        return np.diff(self.stop_route_ptr)
+
+    def incidence(self) -> np.ndarray:
+        """(stops × routes) visit counts: incidence[s, r] = times route r calls at stop s."""
+        inc = np.zeros((self.num_stops, self.num_routes), dtype=np.int64)
+        route_of = np.repeat(np.arange(self.num_routes), np.diff(self.route_stop_ptr))
+        np.add.at(inc, (self.route_stop_idx, route_of), 1)
+        return inc
+
+    # ----------------------------
+    # Name-based queries for the UI and planner
+    # ----------------------------
+    def routes_at(self, stop: str) -> List[str]:
+        """Route ids serving `stop`, in network order ([] for unknown stops)."""
+        s = self.stop_id.get(stop)
+        if s is None:
+            return []
+        return [self.route_ids[r] for r in self.stop_routes(s).tolist()]
+
+    def stops_on(self, route_id: str) -> List[str]:
+        return [self.stop_names[s] for s in self.route_stops(self.route_index[route_id]).tolist()]
+
+    def position(self, route_id: str, stop: str) -> Optional[int]:
+        """Index of the first call at `stop` along the route, or None if it isn't on it."""
+        s = self.stop_id.get(stop)
+        return None if s is None else self.route_stop_pos[self.route_index[route_id]].get(s)
+
+    def common_routes(self, a: str, b: str) -> List[str]:
+        """Routes that serve both stops, in network order."""
+        both = set(self.routes_at(b))
+        return [rid for rid in self.routes_at(a) if rid in both]
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app imports its packages as top-level modules (simulation, ml, optimization)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,106 @@
+import os
+
+from ml import artifacts
+
+
+def _save(directory, tag):
+    paths = {role: artifacts.new_file(role, str(directory)) for role in artifacts.ROLES}
+    for role, path in paths.items():
+        with open(path, "w") as f:
+            f.write(f"{tag}:{role}")
+    return paths, artifacts.publish(paths, str(directory))
+
+
+def test_manifest_names_one_complete_set(tmp_path):
+    assert artifacts.read_manifest(str(tmp_path)) is None
+
+    first, v1 = _save(tmp_path, "a")
+    second, v2 = _save(tmp_path, "b")
+    assert (v1, v2) == (1, 2)
+    assert len({os.path.basename(p) for p in [*first.values(), *second.values()]}) == 6
+
+    current = artifacts.read_manifest(str(tmp_path))
+    assert current["version"] == 2
+    assert current["paths"] == second
+    for role, path in current["paths"].items():
+        with open(path) as f:
+            assert f.read() == f"b:{role}"
+
+
+def test_previous_set_kept_one_generation(tmp_path):
+    first, _ = _save(tmp_path, "a")
+    second, _ = _save(tmp_path, "b")
+    assert all(os.path.exists(p) for p in first.values())
+    third, _ = _save(tmp_path, "c")
+    assert not any(os.path.exists(p) for p in first.values())
+    assert all(os.path.exists(p) for p in [*second.values(), *third.values()])
+
+
+def test_write_atomic_leaves_no_temp_files(tmp_path):
+    path = str(tmp_path / "data.bin")
+    artifacts.write_atomic(path, b"one")
+    artifacts.write_atomic(path, b"two")
+    with open(path, "rb") as f:
+        assert f.read() == b"two"
+    assert os.listdir(tmp_path) == ["data.bin"]
+
+
+def test_published_files_get_the_umask_mode(tmp_path):
+    old = os.umask(0o022)
+    try:
+        paths, _ = _save(tmp_path, "a")
+        manifest = artifacts.manifest_path(str(tmp_path))
+        for path in [*paths.values(), manifest]:
+            assert os.stat(path).st_mode & 0o777 == 0o644, path
+    finally:
+        os.umask(old)
+
+
+def test_forest_and_training_files_get_the_umask_mode(tmp_path):
+    from sklearn.ensemble import RandomForestRegressor
+    from ml.forest import export_forest
+    from ml.train_model import write_training_data
+
+    old = os.umask(0o027)
+    try:
+        model = RandomForestRegressor(n_estimators=2, random_state=0).fit([[0.0], [1.0]], [0.0, 1.0])
+        export_forest(model, str(tmp_path / "forest.bin"))
+        write_training_data(1, str(tmp_path / "training.npz"), workers=1)
+        for name in ("forest.bin", "training.npz"):
+            assert os.stat(tmp_path / name).st_mode & 0o777 == 0o640, name
+    finally:
+        os.umask(old)
+
+
+def test_update_model_swaps_in_a_new_set(tmp_path, monkeypatch):
+    import numpy as np
+    from sklearn.ensemble import RandomForestRegressor
+    from ml import predict
+    from ml.train_model import FEATURE_COLS, load_artifacts, save_artifacts, update_model
+
+    # load_model keeps one module-level model; restore it after the test
+    for name in ("_model", "_meta", "_model_stamp"):
+        monkeypatch.setattr(predict, name, None)
+    directory = str(tmp_path)
+    rng = np.random.default_rng(0)
+    X = rng.random((300, len(FEATURE_COLS))) * 10
+    y = X[:, 0] * 5 + rng.normal(0, 1, 300)
+    model = RandomForestRegressor(n_estimators=10, max_depth=5, random_state=0).fit(X, y)
+    assert save_artifacts(model, {"feature_cols": FEATURE_COLS}, directory) == 1
+
+    flat, meta = predict.load_model(directory)
+    assert flat.n_trees == 10 and "updates" not in meta
+    assert predict.load_model(directory)[0] is flat
+
+    report = update_model(X[:100], y[:100] + 20, n_new_trees=5, max_trees=12, directory=directory)
+    assert report["n_trees"] == 12 and report["version"] == 2
+    assert artifacts.read_manifest(directory)["version"] == 2
+
+    updated, _ = load_artifacts(directory)
+    # the three oldest trees were retired, the rest kept in order
+    for old, new in zip(model.estimators_[3:], updated.estimators_[:7]):
+        np.testing.assert_array_equal(old.tree_.threshold, new.tree_.threshold)
+
+    flat2, meta2 = predict.load_model(directory)
+    assert flat2 is not flat and flat2.n_trees == 12 and meta2["updates"] == 1
+    np.testing.assert_allclose(flat2.predict(X[:50]), updated.predict(X[:50]), rtol=0, atol=1e-9)
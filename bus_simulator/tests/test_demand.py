@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from simulation.city import build_city_state
+from simulation.demand_generator import generate_demand, simulate_bus_service
+from simulation.timeaxis import DEFAULT_AXIS
+
+
+def _run_day(state, seed):
+    """Yield (demand, boarded from stops, capacity per route) for every tick of a day."""
+    rng = np.random.default_rng(seed)
+    for step in range(DEFAULT_AXIS.n_ticks):
+        demand = generate_demand(state, step, rng)
+        before = state.stop_waiting.copy()
+        simulate_bus_service(state)
+        yield demand, before - state.stop_waiting, state.route_capacity()
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("bus_capacity", [None, 5])
+def test_passengers_are_conserved(seed, bus_capacity):
+    state = build_city_state()
+    if bus_capacity is not None:       # starve the fleet so capacity is what binds
+        state.bus_capacity = np.full_like(state.bus_capacity, bus_capacity)
+    initial = state.stop_waiting.sum()
+    total_demand = total_boarded = 0
+    single = np.flatnonzero(np.diff(state.stop_route_ptr) == 1)   # stops on one route only
+    single_route = state.stop_route_idx[state.stop_route_ptr[single]]
+
+    for demand, boarded, capacity in _run_day(state, seed):
+        assert (demand >= 0).all()
+        assert (boarded >= 0).all()
+        assert (state.stop_waiting >= 0).all()
+        assert boarded.sum() <= capacity.sum()
+        assert (np.bincount(single_route, boarded[single], len(capacity)) <= capacity).all()
+        assert (state.bus_load >= 0).all() and (state.bus_load <= state.bus_capacity).all()
+        total_demand += demand.sum()
+        total_boarded += boarded.sum()
+        assert total_boarded + state.stop_waiting.sum() == initial + total_demand
+
+    assert total_demand > 0 and total_boarded > 0
+    if bus_capacity is not None:
+        assert state.stop_waiting.sum() > total_boarded   # the starved fleet leaves a backlog
+
+
+def test_routes_without_buses_board_nobody():
+    state = build_city_state()
+    state.bus_route[state.bus_route == 2] = 3          # route 2 loses its whole fleet
+    only_route_2 = np.diff(state.stop_route_ptr) == 1
+    only_route_2[only_route_2] = state.stop_route_idx[state.stop_route_ptr[:-1][only_route_2]] == 2
+    assert only_route_2.any()
+    waiting = np.zeros(state.num_stops, dtype=np.int64)
+    for demand, boarded, _ in _run_day(state, 0):
+        waiting[only_route_2] += demand[only_route_2]
+        assert (boarded[only_route_2] == 0).all()
+    np.testing.assert_array_equal(state.stop_waiting[only_route_2], waiting[only_route_2])
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from simulation.downsample import downsample_indices, lttb
+
+
+def _series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=float)
+    return x, np.cumsum(rng.normal(0, 1, n)) + 10 * np.sin(x / 50)
+
+
+@pytest.mark.parametrize("n, n_out", [(10, 3), (10, 9), (100, 7), (1000, 250), (10_080, 2000)])
+def test_lttb_keeps_endpoints_and_budget(n, n_out):
+    x, y = _series(n)
+    keep = lttb(x, y, n_out)
+    assert len(keep) == n_out
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_keeps_a_spike():
+    x, y = _series(5000, seed=1)
+    y[1234] = 1e3
+    assert 1234 in lttb(x, y, 100)
+
+
+@pytest.mark.parametrize("n_out", [10, 11, 50])
+def test_short_series_pass_through(n_out):
+    x, y = _series(10)
+    np.testing.assert_array_equal(lttb(x, y, n_out), np.arange(10))
+    np.testing.assert_array_equal(downsample_indices(x, [y], n_out), np.arange(10))
+
+
+@pytest.mark.parametrize("n_out, expected", [(2, [0, 9]), (1, [9]), (0, [])])
+def test_tiny_budgets_keep_endpoints_only(n_out, expected):
+    x, y = _series(10)
+    np.testing.assert_array_equal(lttb(x, y, n_out), expected)
+
+
+def test_shared_indices_stay_within_budget():
+    x, y = _series(5000)
+    np.testing.assert_array_equal(downsample_indices(x, [y], 500), lttb(x, y, 500))
+    ys = [_series(5000, seed)[1] for seed in range(4)]
+    keep = downsample_indices(x, ys, 800)
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert len(keep) <= 800 and (np.diff(keep) > 0).all()
+    for y in ys:
+        assert set(lttb(x, y, 200)) <= set(keep.tolist())
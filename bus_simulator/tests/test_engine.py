@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from simulation.engine import (
+    MIN_FLEET_PER_ROUTE, REBALANCERS, compile_network, run_network_simulation, simulate_network,
+)
+from simulation.monte_carlo import run_monte_carlo
+from simulation.pune import PMPML_STOPS, ALL_ROUTES
+from simulation.synthetic import generate_city, to_network
+from simulation.timeaxis import TimeAxis
+from simulation.topology import Topology
+
+
+@pytest.fixture(scope="module")
+def pune_run():
+    return run_network_simulation(5)
+
+
+def test_same_seed_same_run():
+    a, b = simulate_network(7), simulate_network(7)
+    for key in ("stop_demand", "route_demand", "bus_counts", "route_capacity"):
+        np.testing.assert_array_equal(a[key], b[key])
+    np.testing.assert_array_equal(np.isnan(a["stop_wait"]), np.isnan(b["stop_wait"]))
+    assert a["moves"] == b["moves"]
+
+
+def test_route_demand_aggregates_stop_demand():
+    sim = simulate_network(3)
+    np.testing.assert_array_equal(sim["route_demand"], sim["stop_demand"] @ sim["net"]["incidence"])
+
+
+@pytest.mark.parametrize("rebalancer", sorted(REBALANCERS))
+def test_rebalancers_conserve_fleet(rebalancer):
+    sim = simulate_network(11, rebalancer=rebalancer)
+    net = sim["net"]
+    counts = sim["bus_counts"]
+    assert (counts.sum(axis=1) == net["initial_fleet"].sum()).all()
+    # Routes only lose vehicles down to the floor (they may start below it)
+    floor = np.minimum(net["initial_fleet"], MIN_FLEET_PER_ROUTE)
+    assert (counts >= floor).all()
+    assert all(dr != tr for _, dr, tr, _ in sim["moves"])
+    # Greedy keeps a donor's pre-move capacity for the step of the move, as the
+    # original dashboard loop did; every other cell is counts × vehicle capacity
+    expected = counts * net["vehicle_capacity"]
+    if rebalancer == "greedy":
+        for t, dr, _, _ in sim["moves"]:
+            expected[t, dr] = sim["route_capacity"][t, dr]
+    np.testing.assert_array_equal(sim["route_capacity"], expected)
+
+
+def test_unserved_stops_have_no_wait():
+    sim = simulate_network(2)
+    unserved = sim["net"]["num_serving"] == 0
+    assert np.isnan(sim["stop_wait"][:, unserved]).all()
+    assert not np.isnan(sim["stop_wait"][:, ~unserved]).any()
+
+
+def test_snapshots_read_the_result_arrays(pune_run):
+    result, log, summary = pune_run
+    assert len(result) == result.axis.n_ticks
+    snap = result[40]
+    assert snap["step"] == 40
+    for r, rid in enumerate(result.route_ids):
+        assert snap["route_demand"][rid] == result.route_demand[40, r]
+        assert snap["bus_counts"][rid] == result.bus_counts[40, r]
+    assert snap["total_demand"] == result.route_demand[40].sum()
+    assert summary["total_rebalances"] == len(log)
+    assert all(entry["from_route"] != entry["to_route"] for entry in log)
+
+
+def test_finer_axis_covers_the_same_day():
+    axis = TimeAxis(5, 1)
+    result, _, _ = run_network_simulation(1, axis=axis)
+    assert result.route_demand.shape == (288, len(ALL_ROUTES))
+    assert result.hours[-1] == pytest.approx(24 - 5 / 60)
+
+
+def test_prebuilt_topology_gives_the_same_run():
+    topology = Topology.from_network(PMPML_STOPS, ALL_ROUTES)
+    a = simulate_network(4)
+    b = simulate_network(4, topology=topology)
+    np.testing.assert_array_equal(a["bus_counts"], b["bus_counts"])
+    assert compile_network(PMPML_STOPS, ALL_ROUTES, topology)["topology"] is topology
+
+
+def test_synthetic_city_runs():
+    network = to_network(generate_city(200, 12, 48, seed=1))
+    sim = simulate_network(0, **network)
+    assert sim["route_demand"].shape == (96, 12)
+    assert sim["bus_counts"].sum(axis=1).min() == sim["net"]["initial_fleet"].sum()
+
+
+def test_monte_carlo_independent_of_workers():
+    serial = run_monte_carlo(6, seed=3, workers=1)
+    pooled = run_monte_carlo(6, seed=3, workers=2)
+    for metric, bands in serial.items():
+        for name, values in bands.items():
+            np.testing.assert_array_equal(values, pooled[metric][name])
+
+
+@pytest.mark.parametrize("n_runs", [0, -3])
+def test_monte_carlo_needs_a_run(n_runs):
+    with pytest.raises(ValueError):
+        run_monte_carlo(n_runs, workers=1)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from simulation.engine import simulate_network
+from simulation.events import EventIndex, event_intervals
+
+N_STEPS, N_STOPS, N_ROUTES = 120, 30, 6
+
+
+def _calendar(seed):
+    rng = np.random.default_rng(seed)
+    events = []
+    for _ in range(rng.integers(0, 12)):
+        stops = rng.choice(N_STOPS, size=rng.integers(1, 5), replace=False).tolist()
+        mult = float(rng.uniform(1.1, 3.0))
+        kind = rng.integers(3)
+        if kind == 0:
+            start = int(rng.integers(-10, N_STEPS + 10))
+            events.append({"stops": stops, "multiplier": mult, "start": start,
+                           "end": start + int(rng.integers(0, 30))})
+        elif kind == 1:
+            events.append({"stops": stops, "multiplier": mult,
+                           "peak_steps": rng.integers(0, N_STEPS, size=6).tolist()})
+        else:
+            events.append({"stops": stops, "multiplier": mult, "intervals": [
+                (s, s + int(rng.integers(1, 8))) for s in rng.integers(0, N_STEPS, size=3).tolist()
+            ]})
+    route_stops = [rng.choice(N_STOPS, size=5, replace=False).tolist() for _ in range(N_ROUTES)]
+    return events, route_stops
+
+
+def _brute_force(events, route_stops):
+    active = [[i for i, e in enumerate(events) if any(a <= t < b for a, b in event_intervals(e))]
+              for t in range(N_STEPS)]
+    mult = np.ones((N_STEPS, N_STOPS))
+    for t, ids in enumerate(active):
+        for i in ids:
+            stops = events[i]["stops"]
+            mult[t, stops] = np.maximum(mult[t, stops], events[i]["multiplier"])
+    touched = np.array([[any(set(events[i]["stops"]) & set(stops) for i in ids) for stops in route_stops]
+                        for ids in active], dtype=bool)
+    return active, mult, touched
+
+
+@pytest.mark.parametrize("seed", range(25))
+@pytest.mark.parametrize("dense", [True, False])
+def test_index_matches_brute_force(seed, dense):
+    events, route_stops = _calendar(seed)
+    index = EventIndex(events, list(range(N_STOPS)), N_STEPS, route_stops=route_stops, dense=dense)
+    active, mult, touched = _brute_force(events, route_stops)
+
+    for t in range(N_STEPS):
+        assert index.active_ids(t) == active[t]
+        np.testing.assert_array_equal(index.route_mask_at(t), touched[t])
+    np.testing.assert_array_equal(index.multiplier_matrix(), mult)
+    np.testing.assert_array_equal(index.route_mask(), touched)
+
+
+def test_route_masks_need_route_stops():
+    events, _ = _calendar(3)
+    index = EventIndex(events, list(range(N_STOPS)), N_STEPS)
+    with pytest.raises(ValueError):
+        index.route_mask()
+    with pytest.raises(ValueError):
+        index.route_mask_at(0)
+
+
+def test_engine_calendar_has_route_masks():
+    sim = simulate_network(1)
+    mask = sim["events"].route_mask()
+    incidence = sim["net"]["incidence"]
+    assert mask.shape == (sim["route_demand"].shape[0], incidence.shape[1])
+    assert mask.any()
+    np.testing.assert_array_equal(mask, (sim["events"].multiplier_matrix() > 1) @ (incidence > 0))
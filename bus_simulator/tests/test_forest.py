@@ -0,0 +1,61 @@
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from ml import forest
+from ml.forest import FLAT_MAX_ROWS, FlatForest, export_forest
+
+
+@pytest.fixture(scope="module")
+def model():
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 20, size=(2000, 9)).astype(float)  # coarse grid: many rows sit on thresholds
+    X[:, 8] = rng.random(2000)
+    y = 3 * X[:, 0] + X[:, 1] * X[:, 2] + 50 * X[:, 8] + rng.normal(0, 2, 2000)
+    return RandomForestRegressor(n_estimators=25, max_depth=9, min_samples_leaf=3, random_state=0).fit(X, y)
+
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(1)
+    X = rng.integers(-2, 22, size=(3 * FLAT_MAX_ROWS, 9)).astype(float)
+    X[:, 8] = rng.random(len(X))
+    return X
+
+
+def test_small_batches_match_sklearn(model, rows, tmp_path):
+    path = str(tmp_path / "forest.bin")
+    export_forest(model, path)
+    flat = FlatForest(path)
+    assert flat.n_trees == 25
+    for n in (1, 7, FLAT_MAX_ROWS):
+        np.testing.assert_allclose(flat.predict(rows[:n]), model.predict(rows[:n]), rtol=0, atol=1e-9)
+
+
+def test_blocked_traversal_matches_sklearn(model, rows, tmp_path, monkeypatch):
+    monkeypatch.setattr(forest, "PREDICT_BLOCK_ROWS", 100)
+    path = str(tmp_path / "forest.bin")
+    export_forest(model, path)
+    flat = FlatForest(path)  # no fallback: large batches stay on the flat path
+    np.testing.assert_allclose(flat.predict(rows), model.predict(rows), rtol=0, atol=1e-9)
+
+
+def test_large_batches_use_the_fallback(model, rows, tmp_path):
+    path, pkl = str(tmp_path / "forest.bin"), str(tmp_path / "model.pkl")
+    export_forest(model, path)
+    with open(pkl, "wb") as f:
+        pickle.dump(model, f)
+    flat = FlatForest(path, fallback_path=pkl)
+    flat.predict(rows[:10])
+    assert flat._fallback is None
+    np.testing.assert_allclose(flat.predict(rows), model.predict(rows), rtol=0, atol=1e-9)
+    assert flat._fallback is not None
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a_forest.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        FlatForest(str(path))
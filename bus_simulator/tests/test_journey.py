@@ -0,0 +1,85 @@
+import math
+
+import pytest
+
+from simulation.engine import run_network_simulation
+from simulation.journey import MAX_TRANSFERS, TRANSFER_PENALTY_MIN, JourneyPlanner
+from simulation.pune import PMPML_STOPS, ALL_ROUTES
+
+
+@pytest.fixture(scope="module")
+def planner():
+    return JourneyPlanner.from_network(PMPML_STOPS, ALL_ROUTES)
+
+
+@pytest.fixture(scope="module")
+def stop_wait():
+    result, _, _ = run_network_simulation(5)
+    return result[40]["stop_wait"]
+
+
+def _best_by_legs(planner, origin, wait, max_legs):
+    """best[l][s]: earliest arrival at s using at most l vehicles, by exhaustive relaxation."""
+    n = len(planner.stop_names)
+    best = [[math.inf] * n]
+    best[0][origin] = 0.0
+    for legs in range(1, max_legs + 1):
+        prev, cur = best[-1], list(best[-1])
+        penalty = TRANSFER_PENALTY_MIN if legs > 1 else 0.0
+        for stops, cum in zip(planner.pattern_stops, planner.pattern_cum):
+            for i, s in enumerate(stops):
+                if prev[s] == math.inf:
+                    continue
+                dep = prev[s] + wait[s] + penalty
+                for j in range(i + 1, len(stops)):
+                    cur[stops[j]] = min(cur[stops[j]], dep + cum[j] - cum[i])
+        best.append(cur)
+    return best
+
+
+def test_plans_match_exhaustive_search(planner, stop_wait):
+    wait = planner._waits(stop_wait)
+    names = planner.stop_names
+    checked = 0
+    for o, origin in enumerate(names):
+        best = _best_by_legs(planner, o, wait, MAX_TRANSFERS + 1)
+        for d, dest in enumerate(names):
+            if o == d:
+                continue
+            plans = planner.plan(origin, dest, stop_wait)
+            # Pareto set: an itinerary with k transfers iff it beats every one with fewer
+            expected, fastest = [], math.inf
+            for k in range(MAX_TRANSFERS + 1):
+                if best[k + 1][d] < fastest - 1e-9:
+                    expected.append((k, best[k + 1][d]))
+                    fastest = best[k + 1][d]
+            assert [it.transfers for it in plans] == [k for k, _ in expected], (origin, dest)
+            for it, (_, total) in zip(plans, expected):
+                assert it.total_min == pytest.approx(total, abs=0.051)
+            checked += len(plans)
+    assert checked > len(names)
+
+
+def test_itineraries_are_connected(planner, stop_wait):
+    names = planner.stop_names
+    for origin in names[:8]:
+        for dest in names[-8:]:
+            for it in planner.plan(origin, dest, stop_wait):
+                assert it.legs[0].board == origin and it.legs[-1].alight == dest
+                for a, b in zip(it.legs, it.legs[1:]):
+                    assert a.alight == b.board and a.route_id != b.route_id
+                assert all(leg.n_stops > 0 and leg.ride_min > 0 for leg in it.legs)
+                legs_min = sum(leg.wait_min + leg.ride_min for leg in it.legs)
+                total = legs_min + TRANSFER_PENALTY_MIN * it.transfers
+                assert it.total_min == pytest.approx(total, abs=0.05 * (2 * len(it.legs) + 1))
+
+
+def test_same_stop_has_no_plan(planner, stop_wait):
+    stop = planner.stop_names[0]
+    assert planner.plan(stop, stop, stop_wait) == []
+
+
+def test_waits_from_mapping_or_array(planner, stop_wait):
+    as_array = [stop_wait[s] if stop_wait[s] is not None else float("nan") for s in planner.stop_names]
+    origin, dest = planner.stop_names[0], planner.stop_names[-1]
+    assert planner.plan(origin, dest, stop_wait) == planner.plan(origin, dest, as_array)
@@ -0,0 +1,43 @@
+import copy
+
+import pytest
+
+from simulation.engine import run_network_simulation
+from simulation.map_layers import route_geometry, route_layer, stop_geometry, stop_layer
+from simulation.pune import ALL_ROUTES, PMPML_STOPS
+from simulation.topology import Topology
+
+
+@pytest.fixture(scope="module")
+def base():
+    topology = Topology.from_network(PMPML_STOPS, ALL_ROUTES)
+    return {"routes": route_geometry(PMPML_STOPS, ALL_ROUTES, topology),
+            "stops": stop_geometry(PMPML_STOPS)}
+
+
+@pytest.fixture(scope="module")
+def result():
+    return run_network_simulation(2)[0]
+
+
+def test_base_feature_ids_are_stable(base):
+    topology = Topology.from_network(PMPML_STOPS, ALL_ROUTES)
+    again = {"routes": route_geometry(PMPML_STOPS, ALL_ROUTES, topology),
+             "stops": stop_geometry(PMPML_STOPS)}
+    assert again == base
+    assert [f["id"] for f in base["stops"]["features"]] == list(PMPML_STOPS)
+    route_ids = [f["id"] for f in base["routes"]["features"]]
+    assert route_ids == [rid for rid in ALL_ROUTES if len(topology.stops_on(rid)) >= 2]
+
+
+def test_per_step_layers_reuse_the_base(base, result):
+    before = copy.deepcopy(base)
+    for step in (0, 40, 80):
+        snap = result[step]
+        routes, stops = route_layer(base["routes"], snap), stop_layer(base["stops"], snap)
+        by_id = {f["id"]: f for f in base["routes"]["features"] + base["stops"]["features"]}
+        for f in routes["features"] + stops["features"]:
+            assert f["geometry"] is by_id[f["id"]]["geometry"]   # shared, never rebuilt
+        assert [f["id"] for f in routes["features"]] == [f["id"] for f in base["routes"]["features"]]
+        assert {f["id"] for f in stops["features"]} <= set(PMPML_STOPS)
+    assert base == before                                       # steps never write into the base
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from simulation import metrics
+from simulation.metrics import (
+    MetricAccumulator, compute_all_metrics, compute_avg_wait_time, compute_frustration_index,
+    compute_idle_bus_percentage, compute_overcrowding_ratio, compute_per_step_metrics,
+    compute_unserved_passengers, score_scenarios, snapshots_to_arrays,
+)
+
+ROUTES = [f"R{i}" for i in range(7)]
+
+
+def _snapshots(seed, n_steps=48):
+    rng = np.random.default_rng(seed)
+    snapshots = []
+    for t in range(n_steps):
+        buses = rng.integers(0, 6, len(ROUTES))          # includes routes with no buses
+        capacity = buses * 50
+        demand = rng.integers(0, 400, len(ROUTES))
+        demand[rng.random(len(ROUTES)) < 0.1] = 0
+        util = demand / np.maximum(capacity, 1)
+        util[:2] = rng.choice([0.2, 0.8, 0.5], size=2)   # values exactly on the thresholds
+        snapshots.append({
+            "step": t, "time_label": f"{t // 4:02d}:{t % 4 * 15:02d}",
+            "weather": "clear", "active_events": ["Expo"] if t % 5 == 0 else [],
+            "route_demand": dict(zip(ROUTES, demand.tolist())),
+            "route_capacity": dict(zip(ROUTES, capacity.tolist())),
+            "route_num_buses": dict(zip(ROUTES, buses.tolist())),
+            "route_utilization": dict(zip(ROUTES, util.tolist())),
+        })
+    return snapshots
+
+
+def _baseline_summary(snapshots, routes, label=""):
+    """compute_all_metrics as it was written over the snapshot dicts."""
+    avg_wait = compute_avg_wait_time(snapshots, routes)
+    overcrowding = compute_overcrowding_ratio(snapshots)
+    idle_pct = compute_idle_bus_percentage(snapshots)
+    return {
+        "label": label,
+        "avg_wait_time_min": round(avg_wait, 2),
+        "overcrowding_pct": round(overcrowding * 100, 2),
+        "idle_bus_pct": round(idle_pct, 2),
+        "frustration_index": compute_frustration_index(avg_wait, overcrowding, idle_pct),
+        "total_unserved_passengers": int(compute_unserved_passengers(snapshots)),
+    }
+
+
+def _baseline_per_step(snap):
+    utils = list(snap["route_utilization"].values())
+    return {
+        "avg_utilization": round(np.mean(utils), 3),
+        "overcrowded_routes": sum(1 for u in utils if u > 0.8),
+        "total_demand": sum(snap["route_demand"].values()),
+        "total_capacity": sum(snap["route_capacity"].values()),
+    }
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_summary_matches_dict_path(seed):
+    snapshots = _snapshots(seed)
+    assert compute_all_metrics(snapshots, {}, "run") == _baseline_summary(snapshots, {}, "run")
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_unrounded_scores_match_dict_helpers(seed):
+    snapshots = _snapshots(seed)
+    m = score_scenarios(**snapshots_to_arrays(snapshots))
+    assert m["avg_wait_time_min"] == pytest.approx(compute_avg_wait_time(snapshots, {}), rel=1e-12)
+    assert m["overcrowding_pct"] == pytest.approx(compute_overcrowding_ratio(snapshots) * 100, rel=1e-12)
+    assert m["idle_bus_pct"] == pytest.approx(compute_idle_bus_percentage(snapshots), rel=1e-12)
+    assert m["total_unserved_passengers"] == compute_unserved_passengers(snapshots)
+
+
+def test_per_step_matches_dict_path():
+    snapshots = _snapshots(7)
+    for snap, row in zip(snapshots, compute_per_step_metrics(snapshots)):
+        assert {k: row[k] for k in ("avg_utilization", "overcrowded_routes", "total_demand",
+                                    "total_capacity")} == _baseline_per_step(snap)
+        assert row["step"] == snap["step"] and row["time_label"] == snap["time_label"]
+        assert row["events"] == (", ".join(snap["active_events"]) or "—")
+
+
+def test_stacked_scenarios_score_like_single_runs():
+    runs = [snapshots_to_arrays(_snapshots(seed)) for seed in range(4)]
+    stacked = score_scenarios(**{k: np.stack([r[k] for r in runs]) for k in runs[0]})
+    for i, arrays in enumerate(runs):
+        for key, value in score_scenarios(**arrays).items():
+            assert stacked[key][i] == pytest.approx(float(value), rel=1e-12)
+
+
+def test_missing_route_counts_as_zero():
+    snapshots = _snapshots(1, n_steps=3)
+    del snapshots[1]["route_demand"]["R3"]
+    arrays = snapshots_to_arrays(snapshots)
+    assert arrays["demand"].shape == (3, len(ROUTES))
+    assert arrays["demand"][1, ROUTES.index("R3")] == 0
+
+
+def test_accumulator_matches_batch_summary():
+    snapshots = _snapshots(3)
+    acc = MetricAccumulator()
+    for snap in snapshots:
+        acc.update_snapshot(snap)
+    summary = acc.summary("run")
+    batch = compute_all_metrics(snapshots, {}, "run")
+    assert {k: summary[k] for k in batch} == batch
+    utils = np.array([list(s["route_utilization"].values()) for s in snapshots])
+    assert summary["avg_utilization"] == round(utils.mean(), 3)
+    assert summary["utilization_std"] == round(utils.std(), 3)
+    assert summary["steps"] == len(snapshots)
+
+
+def test_max_tolerable_wait_drives_every_frustration_path(monkeypatch):
+    snapshots = _snapshots(5)
+    before = compute_all_metrics(snapshots, {})["frustration_index"]
+    monkeypatch.setattr(metrics, "MAX_TOLERABLE_WAIT_MIN", 300.0)
+    batch = compute_all_metrics(snapshots, {})
+    acc = MetricAccumulator()
+    for snap in snapshots:
+        acc.update_snapshot(snap)
+    assert batch["frustration_index"] != before
+    assert acc.summary()["frustration_index"] == batch["frustration_index"]
+    assert _baseline_summary(snapshots, {})["frustration_index"] == batch["frustration_index"]
@@ -0,0 +1,139 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from ml import predict
+from ml.forest import FLAT_MAX_ROWS
+from ml.predict import (
+    FEATURE_COLS, ROUTE_LIST, WEATHER_ENCODING, build_feature_tensor, predict_demand_tensor,
+    predict_route_demands,
+)
+from ml.train_model import save_artifacts
+
+N_STEPS, N_ROUTES = 96, len(ROUTE_LIST)
+
+
+@pytest.fixture
+def published(tmp_path, monkeypatch):
+    """A small model set published in tmp_path; load_model's module cache is restored afterwards."""
+    for name in ("_model", "_meta", "_model_stamp", "_cache"):
+        monkeypatch.setattr(predict, name, None)
+    rng = np.random.default_rng(0)
+    X = rng.random((2000, len(FEATURE_COLS))) * [N_STEPS, 24, N_ROUTES, 10, 4, 1, 1, 300, 1]
+    y = 2 * X[:, 7] + 20 * X[:, 3] * X[:, 8] + 30 * X[:, 5] + rng.normal(0, 3, len(X))
+    model = RandomForestRegressor(n_estimators=15, max_depth=8, random_state=0).fit(X, y)
+    save_artifacts(model, {"feature_cols": FEATURE_COLS}, str(tmp_path))
+    return str(tmp_path), model
+
+
+def _day(seed):
+    rng = np.random.default_rng(seed)
+    return {
+        "weather": rng.choice(list(WEATHER_ENCODING), N_STEPS),
+        "num_buses": rng.integers(1, 10, (N_STEPS, N_ROUTES)),
+        "is_event": rng.random((N_STEPS, N_ROUTES)) < 0.2,
+        "prev_demand": rng.integers(0, 300, (N_STEPS, N_ROUTES)),
+        "avg_utilization": rng.random((N_STEPS, N_ROUTES)).round(3),
+    }
+
+
+def test_day_tensor_matches_per_step_predictions(published):
+    directory, _ = published
+    day = _day(1)
+    X = build_feature_tensor(np.arange(N_STEPS), [WEATHER_ENCODING[w] for w in day["weather"]],
+                             day["num_buses"], day["is_event"], day["prev_demand"], day["avg_utilization"])
+    assert X.shape == (1, N_STEPS, N_ROUTES, len(FEATURE_COLS))
+    assert N_STEPS * N_ROUTES <= FLAT_MAX_ROWS
+    tensor = predict_demand_tensor(X, directory)[0]
+    # a whole day stays on the flat forest, the pickled model is never loaded
+    assert predict.load_model(directory)[0]._fallback is None
+
+    for t in range(N_STEPS):
+        routes = {
+            rid: SimpleNamespace(num_buses=int(day["num_buses"][t, r]), stop_indices=[r],
+                                 avg_utilization=float(day["avg_utilization"][t, r]))
+            for r, rid in enumerate(ROUTE_LIST)
+        }
+        step = predict_route_demands(
+            t, routes, day["weather"][t], np.flatnonzero(day["is_event"][t]).tolist(),
+            dict(zip(ROUTE_LIST, day["prev_demand"][t].tolist())), directory,
+        )
+        np.testing.assert_allclose([step[rid] for rid in ROUTE_LIST], tensor[t], rtol=0, atol=1e-9)
+
+
+def test_multi_scenario_tensor_matches_sklearn(published):
+    directory, model = published
+    days = [_day(seed) for seed in range(3)]
+    stack = {key: np.stack([d[key] for d in days]) for key in days[0] if key != "weather"}
+    weather = [[WEATHER_ENCODING[w] for w in d["weather"]] for d in days]
+    X = build_feature_tensor(np.arange(N_STEPS), weather, stack["num_buses"], stack["is_event"],
+                             stack["prev_demand"], stack["avg_utilization"])
+    assert X[..., 0].size > FLAT_MAX_ROWS
+    expected = np.maximum(0.0, model.predict(X.reshape(-1, len(FEATURE_COLS)))).reshape(X.shape[:-1])
+    np.testing.assert_allclose(predict_demand_tensor(X, directory), expected, rtol=0, atol=1e-9)
+
+
+# ----------------------------
+# Prediction cache
+# ----------------------------
+class _CountingModel:
+    """Stand-in model that records every row it is asked to predict."""
+
+    def __init__(self):
+        self.rows = []
+
+    def predict(self, X):
+        self.rows.extend(map(tuple, X))
+        return X.sum(axis=1)
+
+
+def _rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 5, (n, len(FEATURE_COLS))).astype(float)
+    X[:, FEATURE_COLS.index("prev_demand")] = rng.integers(0, 50, n) * 2.0
+    X[:, FEATURE_COLS.index("avg_utilization")] = rng.integers(0, 50, n) * 0.02
+    return X
+
+
+def test_cache_counts_hits_and_misses():
+    cache, model = predict.PredictionCache(), _CountingModel()
+    X = _rows(20)
+    X[10:] = X[:10]                               # second half repeats the first
+    cache.predict(model, X)
+    assert (cache.hits, cache.misses) == (0, 20)  # repeats within a batch are misses too
+    assert len(model.rows) == 10                  # but the model sees each distinct key once
+    cache.predict(model, X)
+    assert cache.stats() == {"hits": 20, "misses": 20, "size": 10, "hit_rate": 0.5}
+    cache.clear()
+    assert cache.stats()["size"] == cache.hits == cache.misses == 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache, model = predict.PredictionCache(maxsize=3), _CountingModel()
+    a, b, c, d = _rows(4)[:, None]
+    for row in (a, b, c, a, d):                   # a is refreshed, so b is the oldest when d arrives
+        cache.predict(model, row)
+    assert cache.stats()["size"] == 3
+    model.rows.clear()
+    for row in (a, c, d):
+        cache.predict(model, row)
+    assert model.rows == []
+    cache.predict(model, b)
+    assert len(model.rows) == 1
+
+
+def test_cache_hit_equals_model_on_the_snapped_row(published):
+    directory, _ = published
+    flat, _ = predict.load_model(directory)
+    cache = predict.PredictionCache(demand_bin=2.0, util_bin=0.02)
+    X = _rows(50, seed=3)
+    jitter = np.zeros_like(X)
+    jitter[:, FEATURE_COLS.index("prev_demand")] = 0.4
+    jitter[:, FEATURE_COLS.index("avg_utilization")] = -0.004
+    first = cache.predict(flat, X + jitter)
+    again = cache.predict(flat, X - jitter)       # different raw rows, same bins
+    assert cache.hits == len(X)
+    np.testing.assert_array_equal(again, first)
+    np.testing.assert_allclose(again, flat.predict(cache.quantize(X)), rtol=0, atol=1e-9)
@@ -0,0 +1,233 @@
+import copy
+
+import numpy as np
+import pytest
+
+from optimization.rebalance import (
+    CAPACITY_THRESHOLD_RATIO, MAX_REALLOCATIONS_PER_STEP, FleetIndex, get_fleet_summary,
+    plan_lookahead, rebalance_fleet, solve_reallocation,
+)
+from simulation.city import MIN_BUSES_PER_ROUTE, Bus, Route
+from simulation.engine import (
+    MAX_MOVES_PER_STEP, MIN_FLEET_PER_ROUTE, OVERLOAD_THRESHOLD, rebalance_greedy, rebalance_lookahead,
+)
+
+VEHICLE = 50.0
+
+
+def _probe(rng):
+    n = int(rng.integers(2, 9))
+    counts = rng.integers(1, 9, n)
+    demand = rng.random(n) * counts * VEHICLE * 1.6
+    ready = rng.random(n) < 0.8
+    return demand, counts, np.full(n, VEHICLE), ready
+
+
+def _solve(demand, counts, vehicle_capacity, ready=None, **kwargs):
+    kwargs = {"min_fleet": MIN_FLEET_PER_ROUTE, "max_moves": MAX_MOVES_PER_STEP,
+              "target_util": OVERLOAD_THRESHOLD, **kwargs}
+    return solve_reallocation(demand, counts, vehicle_capacity, ready, **kwargs)
+
+
+@pytest.fixture(scope="module")
+def probes():
+    rng = np.random.default_rng(0)
+    out = []
+    for _ in range(3000):
+        demand, counts, capacity, ready = _probe(rng)
+        max_moves = int(rng.integers(1, 5))
+        out.append((demand, counts, capacity, ready, max_moves,
+                    _solve(demand, counts, capacity, ready, max_moves=max_moves)))
+    return out
+
+
+def test_no_route_both_gives_and_receives(probes):
+    assert any(moves for *_, moves in probes)
+    for *_, moves in probes:
+        donors, targets = {d for d, _ in moves}, {t for _, t in moves}
+        assert not donors & targets, moves
+
+
+def test_routes_in_cooldown_never_move(probes):
+    for _, _, _, ready, _, moves in probes:
+        for d, t in moves:
+            assert ready[d] and ready[t]
+
+
+def test_fleet_floor_and_move_budget(probes):
+    for _, counts, _, _, max_moves, moves in probes:
+        assert len(moves) <= max_moves
+        after = counts.copy()
+        for d, t in moves:
+            after[d] -= 1
+            after[t] += 1
+        given = np.bincount([d for d, _ in moves], minlength=len(counts)) > 0
+        assert (after[given] >= MIN_FLEET_PER_ROUTE).all()
+
+
+def test_no_moves_without_overload():
+    counts = np.array([4, 6, 3, 8])
+    demand = counts * VEHICLE * np.array([0.8, 0.1, 0.5, 0.82])
+    assert _solve(demand, counts, np.full(4, VEHICLE)) == []
+
+
+def test_relieves_the_overloaded_route_from_the_idlest():
+    counts = np.array([4, 6, 4])
+    demand = np.array([4 * VEHICLE * 1.5, 10.0, 4 * VEHICLE * 0.5])
+    moves = _solve(demand, counts, np.full(3, VEHICLE), move_cost=0.0)
+    assert moves and all(t == 0 for _, t in moves)
+    assert moves[0][0] == 1
+    assert len(moves) <= MAX_MOVES_PER_STEP
+
+
+def test_floor_blocks_donors_at_minimum():
+    counts = np.array([4, MIN_FLEET_PER_ROUTE])
+    demand = np.array([4 * VEHICLE * 2, 0.0])
+    assert _solve(demand, counts, np.full(2, VEHICLE)) == []
+
+
+# ----------------------------
+# Lookahead
+# ----------------------------
+def _plan(forecast, counts, **kwargs):
+    kwargs = {"min_fleet": MIN_FLEET_PER_ROUTE, "max_moves": MAX_MOVES_PER_STEP,
+              "target_util": OVERLOAD_THRESHOLD, **kwargs}
+    return plan_lookahead(forecast, counts, np.full(len(counts), VEHICLE), **kwargs)
+
+
+def test_flat_forecast_plans_like_a_single_step():
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        demand, counts, capacity, ready = _probe(rng)
+        window = np.tile(demand, (5, 1))
+        assert sorted(_plan(window, counts, ready=ready)) == sorted(_solve(demand, counts, capacity, ready))
+
+
+def test_lookahead_no_moves_when_window_is_calm():
+    counts = np.array([4, 6, 4])
+    window = np.tile(counts * VEHICLE * 0.6, (5, 1))
+    assert _plan(window, counts) == []
+
+
+def test_distant_peak_is_discounted():
+    counts = np.array([4, 8])
+    window = np.tile([100.0, 40.0], (5, 1))
+    window[-1, 0] = 400.0                       # overload only at the far end of the window
+    moves = _plan(window, counts, discount=1.0)
+    assert moves and all(m == (1, 0) for m in moves)
+    assert _plan(window, counts, discount=0.1) == []
+
+
+def _peak_net():
+    """Route 0 peaks from step 20 to 30; route 1 is idle all day with spare buses."""
+    demand = np.tile([100, 60, 100], (40, 1)).astype(np.int64)
+    demand[20:30, 0] = 400
+    net = {
+        "vehicle_capacity": np.array([50, 50, 50]),
+        "initial_fleet": np.array([4, 8, 4]),
+        "route_center": np.zeros((3, 2)),
+        "demand_profile": demand.astype(float),   # a perfect forecast
+    }
+    return demand, net
+
+
+def _first_move(rebalancer):
+    demand, net = _peak_net()
+    moves = []
+    rebalancer(demand, net, on_move=lambda t, dr, tr, u: moves.append((t, dr, tr)))
+    assert moves
+    return moves[0]
+
+
+def test_lookahead_moves_before_the_peak_greedy_after():
+    t_look, donor, target = _first_move(rebalance_lookahead)
+    t_greedy, _, greedy_target = _first_move(rebalance_greedy)
+    assert (donor, target) == (1, 0) and greedy_target == 0
+    assert t_look < 20 <= t_greedy
+
+
+# ----------------------------
+# Fleet index
+# ----------------------------
+def _linear_rebalance(route_ids, buses, predicted, log, step):
+    """The rebalancer as a scan of the whole fleet for every lookup."""
+    def capacity(rid):
+        return sum(b.capacity for b in buses if b.route_id == rid)
+
+    def utilization(rid):
+        return predicted.get(rid, 0) / capacity(rid) if capacity(rid) > 0 else 1.0
+
+    moves = 0
+    for util, target in sorted(((utilization(rid), rid) for rid in route_ids), reverse=True):
+        if moves >= MAX_REALLOCATIONS_PER_STEP:
+            break
+        if util <= CAPACITY_THRESHOLD_RATIO:
+            continue
+        donors = [(utilization(rid), rid) for rid in route_ids if rid != target
+                  and sum(b.route_id == rid for b in buses) > MIN_BUSES_PER_ROUTE]
+        if not donors:
+            continue
+        donor = min(donors)[1]
+        bus = next(b for b in buses if b.route_id == donor)
+        bus.route_id, bus.current_load = target, 0
+        moves += 1
+        log.append({"step": step, "from_route": donor, "to_route": target, "bus_id": bus.bus_id})
+
+
+def _linear_summary(route_ids, buses):
+    out = {}
+    for rid in route_ids:
+        on_route = [b for b in buses if b.route_id == rid]
+        out[rid] = {
+            "num_buses": len(on_route),
+            "total_capacity": sum(b.capacity for b in on_route),
+            "avg_utilization": round(np.mean([b.current_load / b.capacity for b in on_route])
+                                     if on_route else 0, 3),
+        }
+    return out
+
+
+def _fleet(seed, n_routes=6):
+    rng = np.random.default_rng(seed)
+    routes = [Route(r, f"R{r}", [], 0) for r in range(n_routes)]
+    buses = []
+    for r in range(n_routes):
+        for _ in range(int(rng.integers(1, 6))):
+            buses.append(Bus(len(buses), r, capacity=int(rng.choice([40, 60, 80])),
+                             current_load=int(rng.integers(0, 40))))
+    rng.shuffle(buses)               # bus order on a route differs from id order
+    demand = [{r: float(rng.random() * 400) for r in range(n_routes)} for _ in range(30)]
+    return routes, buses, demand
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("shape", ["list", "dict"])
+def test_indexed_rebalance_matches_linear_scan(seed, shape):
+    routes, buses, demand = _fleet(seed)
+    route_ids = [r.route_id for r in routes]
+    if shape == "dict":
+        routes = {r.route_id: r for r in routes}
+    ref_buses = copy.deepcopy(buses)
+    index, log, ref_log = FleetIndex(buses), [], []
+    for step, predicted in enumerate(demand):
+        rebalance_fleet(routes, buses, predicted, log, step, "", index=index)
+        _linear_rebalance(route_ids, ref_buses, predicted, ref_log, step)
+        assert get_fleet_summary(routes, buses, index) == _linear_summary(route_ids, ref_buses)
+        assert get_fleet_summary(routes, buses) == _linear_summary(route_ids, ref_buses)
+    assert log and [{k: e[k] for k in ref_log[0]} for e in log] == ref_log
+    assert [b.route_id for b in buses] == [b.route_id for b in ref_buses]
+
+
+def test_index_counts_stay_consistent_under_moves():
+    _, buses, _ = _fleet(3)
+    index = FleetIndex(buses)
+    rng = np.random.default_rng(4)
+    for _ in range(200):
+        bus = buses[int(rng.integers(len(buses)))]
+        index.move(bus, int(rng.integers(6)))
+        for rid in range(6):
+            on_route = [b for b in buses if b.route_id == rid]
+            assert index.num_buses(rid) == len(on_route)
+            assert index.capacity[rid] == sum(b.capacity for b in on_route)
+            assert set(index.route_buses[rid]) == {b.bus_id for b in on_route}
+    assert sum(index.num_buses(rid) for rid in range(6)) == len(buses)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from simulation.pune import PMPML_STOPS, PUNE_CENTER
+from simulation.spatial import EARTH_RADIUS_M, StopIndex
+
+
+def _haversine_m(a, b):
+    (lat1, lon1), (lat2, lon2) = np.radians(a), np.radians(b)
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(h))
+
+
+def _brute_force(stops, point, own=None):
+    """(name, metres) of every stop but `own`, nearest first."""
+    return sorted(((name, _haversine_m(point, latlon)) for name, latlon in stops.items() if name != own),
+                  key=lambda hit: hit[1])
+
+
+@pytest.fixture(scope="module")
+def city():
+    rng = np.random.default_rng(0)
+    stops = dict(PMPML_STOPS)
+    for i, offset in enumerate(rng.normal(0, 0.08, (300, 2))):
+        stops[f"Synthetic {i}"] = (np.asarray(PUNE_CENTER) + offset).tolist()
+    return stops, StopIndex.from_stops(stops)
+
+
+def _assert_hits(hits, expected):
+    assert [name for name, _ in hits] == [name for name, _ in expected]
+    np.testing.assert_allclose([d for _, d in hits], [d for _, d in expected], rtol=1e-9, atol=1e-6)
+
+
+def test_nearest_matches_brute_force(city):
+    stops, index = city
+    rng = np.random.default_rng(1)
+    for name in rng.choice(list(stops), 20, replace=False).tolist():
+        _assert_hits(index.nearest(name, k=5), _brute_force(stops, stops[name], own=name)[:5])
+        _assert_hits(index.nearest(name, k=3, exclude_self=False), _brute_force(stops, stops[name])[:3])
+    for point in (np.asarray(PUNE_CENTER) + rng.normal(0, 0.1, (20, 2))).tolist():
+        _assert_hits(index.nearest(tuple(point), k=4), _brute_force(stops, point)[:4])
+
+
+@pytest.mark.parametrize("radius_m", [300, 1500, 5000])
+def test_within_matches_brute_force(city, radius_m):
+    stops, index = city
+    rng = np.random.default_rng(2)
+    for name in rng.choice(list(stops), 20, replace=False).tolist():
+        expected = [hit for hit in _brute_force(stops, stops[name], own=name) if hit[1] <= radius_m]
+        _assert_hits(index.within(name, radius_m), expected)
+    point = tuple(PUNE_CENTER)
+    _assert_hits(index.within(point, radius_m), [h for h in _brute_force(stops, point) if h[1] <= radius_m])
+
+
+def test_nearest_caps_k_at_the_stop_count():
+    stops = {"A": [18.50, 73.80], "B": [18.51, 73.80], "C": [18.52, 73.80]}
+    index = StopIndex(stops)
+    assert [name for name, _ in index.nearest("A", k=10)] == ["B", "C"]
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from simulation.city import MIN_BUSES_PER_ROUTE
+from simulation.synthetic import generate_city, generate_network, to_network
+
+
+def _summary(city):
+    return ([(s.name, s.x, s.y, s.base_demand) for s in city["stops"]],
+            [(r.route_id, r.name, r.stops, r.base_frequency) for r in city["routes"]],
+            [(b.bus_id, b.route_id, b.capacity) for b in city["buses"]])
+
+
+def test_same_seed_same_city():
+    assert _summary(generate_city(300, 15, 60, seed=4)) == _summary(generate_city(300, 15, 60, seed=4))
+    assert _summary(generate_city(300, 15, 60, seed=4)) != _summary(generate_city(300, 15, 60, seed=5))
+    assert generate_network(120, 6, 20, seed=2) == to_network(generate_city(120, 6, 20, seed=2))
+
+
+@pytest.mark.parametrize("n_stops, n_routes, n_buses", [
+    (50, 5, 5 * MIN_BUSES_PER_ROUTE), (200, 12, 48), (1000, 40, 400),
+])
+def test_every_route_meets_the_bus_floor(n_stops, n_routes, n_buses):
+    city = generate_city(n_stops, n_routes, n_buses, seed=1)
+    per_route = np.bincount([b.route_id for b in city["buses"]], minlength=n_routes)
+    assert len(city["buses"]) == n_buses
+    assert (per_route >= MIN_BUSES_PER_ROUTE).all()
+    assert per_route.tolist() == [r.base_frequency for r in city["routes"]]
+    assert all(len(r.stops) >= 2 and len(set(r.stops)) == len(r.stops) for r in city["routes"])
+
+
+def test_too_few_buses_is_an_error():
+    with pytest.raises(ValueError):
+        generate_city(100, 10, 10 * MIN_BUSES_PER_ROUTE - 1)
@@ -0,0 +1,55 @@
+import numpy as np
+
+from ml.train_model import (
+    COLUMN_DTYPES, FEATURE_COLS, iter_training_chunks, load_training_arrays,
+    read_training_chunks, simulate_day, write_training_data,
+)
+
+NUM_DAYS = 4
+CHUNK_ROWS = 1000  # smaller than a day, so days straddle chunk boundaries
+
+
+def _chunks(workers):
+    return list(iter_training_chunks(NUM_DAYS, chunk_rows=CHUNK_ROWS, workers=workers))
+
+
+def test_chunks_identical_for_any_worker_count():
+    serial = _chunks(1)
+    pooled = _chunks(3)
+    assert len(serial) == len(pooled)
+    for a, b in zip(serial, pooled):
+        assert a.keys() == b.keys()
+        for col in a:
+            assert a[col].dtype == b[col].dtype
+            np.testing.assert_array_equal(a[col], b[col])
+
+
+def test_chunks_concatenate_to_the_days():
+    chunks = _chunks(1)
+    assert all(len(c["day"]) == CHUNK_ROWS for c in chunks[:-1])
+    for col, dtype in COLUMN_DTYPES.items():
+        joined = np.concatenate([c[col] for c in chunks])
+        days = np.concatenate([simulate_day(d)[col] for d in range(NUM_DAYS)])
+        assert joined.dtype == dtype
+        np.testing.assert_array_equal(joined, days)
+
+
+def test_days_are_independent_streams():
+    a, b = simulate_day(0), simulate_day(1)
+    assert not np.array_equal(a["demand"], b["demand"])
+    np.testing.assert_array_equal(simulate_day(1)["demand"], b["demand"])
+
+
+def test_file_round_trip(tmp_path):
+    path = str(tmp_path / "training.npz")
+    n_rows = write_training_data(NUM_DAYS, path, chunk_rows=CHUNK_ROWS, workers=1)
+    chunks = _chunks(1)
+    assert n_rows == sum(len(c["day"]) for c in chunks)
+    for read, made in zip(read_training_chunks(path), chunks):
+        for col in made:
+            np.testing.assert_array_equal(read[col], made[col])
+
+    X, y = load_training_arrays(path)
+    assert X.shape == (n_rows, len(FEATURE_COLS))
+    np.testing.assert_array_equal(y, np.concatenate([c["demand"] for c in chunks]))
+    assert [p.name for p in tmp_path.iterdir()] == ["training.npz"]